@@ -0,0 +1,113 @@
+"""
+Micro-benchmark: `TextChunker` vs. the previous `RecursiveCharacterTextSplitter(1000, 200)`.
+
+Reports throughput and the spread of chunk sizes in tokens for extracted HTML
+text, the same text with its line breaks flattened, and for PDF pages (split
+page by page before, as one stream now), plus `split_many` scaling over
+worker processes.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_chunking.py [--repeat N] [--scale N] [--workers 1,2,4]
+"""
+import os
+import glob
+import time
+import argparse
+
+import numpy as np
+
+from TrinityBot.components.chunking import TextChunker
+from TrinityBot.components.htmlextraction import extract_page
+from TrinityBot.components.pdfextraction import iter_pdf_pages
+from TrinityBot.utils.tokens import count_tokens
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_splitter():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+
+
+def run(name, split, documents, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        chunks = [chunk for document in documents for chunk in split(document)]
+    elapsed = (time.perf_counter() - start) / repeat
+    # A document is either a text or a list of (page_number, text) pages
+    chars = sum(len(document) if isinstance(document, str) else sum(len(text) for _, text in document)
+                for document in documents)
+    tokens = np.array([count_tokens(chunk) for chunk in chunks]) if chunks else np.zeros(1)
+    return {
+        "name": name,
+        "ms": elapsed * 1000,
+        "mb_per_sec": chars / elapsed / 1e6 if elapsed else 0.0,
+        "chunks": len(chunks),
+        "tokens_mean": float(tokens.mean()),
+        "tokens_cv": float(tokens.std() / tokens.mean()) if tokens.mean() else 0.0,
+        "tokens_max": int(tokens.max()),
+    }
+
+
+def report(title, results):
+    print(f"\n{title}")
+    baseline = results[0]["ms"]
+    for result in results:
+        print(
+            f"  {result['name']:<28} {result['ms']:9.1f} ms {result['mb_per_sec']:6.2f} MB/s  x{baseline / result['ms']:4.1f}"
+            f"  {result['chunks']:6d} chunks  tokens mean {result['tokens_mean']:6.1f}"
+            f" cv {result['tokens_cv']:.2f} max {result['tokens_max']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=int, default=20, help="Copies of each fixture text, to get big documents")
+    parser.add_argument("--workers", default="1,2,4")
+    args = parser.parse_args()
+
+    texts = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "html", "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            texts.append("\n\n".join([extract_page(f.read(), "http://127.0.0.1/").text] * args.scale))
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "pdf", "*.pdf"))):
+        pages.extend(iter_pdf_pages(path, workers=1))
+    pages = pages * args.scale
+    print(f"{len(texts)} HTML texts, {sum(map(len, texts)) / 1e6:.1f} MB; "
+          f"{len(pages)} PDF pages, {sum(len(text) for _, text in pages) / 1e6:.1f} MB; {args.repeat} repeats")
+
+    legacy = legacy_splitter()
+    chunker = TextChunker()
+    report("HTML text", [
+        run("RecursiveCharacterTextSplitter", legacy.split_text, texts, args.repeat),
+        run("TextChunker", chunker.split_text, texts, args.repeat),
+    ])
+    # Whitespace-normalized text, as PDF extraction produces: no paragraph breaks to split on
+    flat = [" ".join(text.split()) for text in texts]
+    report("Flattened text (no newlines)", [
+        run("RecursiveCharacterTextSplitter", legacy.split_text, flat, args.repeat),
+        run("TextChunker", chunker.split_text, flat, args.repeat),
+    ])
+    page_texts = [text for _, text in pages]
+    report("PDF pages", [
+        run("Recursive... per page", legacy.split_text, page_texts, args.repeat),
+        run("TextChunker stream", lambda document: [chunk.text for chunk in chunker.iter_chunks(document)],
+            [pages], args.repeat),
+    ])
+
+    documents = texts * 8
+    print(f"\nsplit_many over {len(documents)} documents")
+    baseline = None
+    for workers in (int(value) for value in args.workers.split(",")):
+        start = time.perf_counter()
+        chunker.split_many(documents, workers=workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"  workers={workers:<3} {elapsed * 1000:9.1f} ms  x{baseline / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
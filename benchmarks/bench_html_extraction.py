@@ -0,0 +1,89 @@
+"""
+Micro-benchmark: single-pass HTML extraction vs. the previous two-tree BeautifulSoup code.
+
+Usage:
+    python benchmarks/bench_html_extraction.py [--fixtures DIR] [--repeat N]
+"""
+import os
+import glob
+import time
+import argparse
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+from TrinityBot.components.htmlextraction import extract_page, BACKENDS
+
+
+BASE_URL = "https://token.trakx.io/"
+
+
+def legacy_extract(html: str, base_url: str):
+    # Previous SSRScraper._extract_text + _extract_links: two separate parses
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(["script", "style", "nav", "footer", "header"]):
+        element.decompose()
+    text = ' '.join(soup.get_text(separator=' ').split())
+
+    soup = BeautifulSoup(html, 'html.parser')
+    base_domain = urlparse(base_url).netloc
+    links = []
+    for link in soup.find_all('a', href=True):
+        url = urljoin(base_url, link['href'])
+        if urlparse(url).netloc == base_domain:
+            links.append(url)
+    return text, list(set(links))
+
+
+def run(name, func, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            func(html, BASE_URL)
+    elapsed = time.perf_counter() - start
+    count = repeat * len(pages)
+    return {"name": name, "ms_per_page": elapsed / count * 1000, "pages_per_sec": count / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(__file__), "fixtures", "html"))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append(f.read())
+    if not pages:
+        raise SystemExit(f"No HTML fixtures found in {args.fixtures}")
+
+    size_kb = sum(len(page) for page in pages) / 1024
+    print(f"{len(pages)} fixtures, {size_kb:.0f} KiB, {args.repeat} repeats")
+
+    results = [run("legacy (bs4 x2)", legacy_extract, pages, args.repeat)]
+    for backend in BACKENDS:
+        results.append(run(
+            f"extract_page[{backend}]",
+            lambda html, url, backend=backend: extract_page(html, url, backend=backend),
+            pages,
+            args.repeat
+        ))
+
+    baseline = results[0]["ms_per_page"]
+    for result in results:
+        print(
+            f"{result['name']:<24} {result['ms_per_page']:8.2f} ms/page "
+            f"{result['pages_per_sec']:8.1f} pages/s  x{baseline / result['ms_per_page']:.1f}"
+        )
+
+    # Same words and links as before, only paragraph boundaries differ
+    for html in pages:
+        old_text, old_links = legacy_extract(html, BASE_URL)
+        new = extract_page(html, BASE_URL)
+        assert old_text.split() == new.text.split(), "extracted text differs from legacy output"
+        assert {link.split("#")[0] for link in old_links} == set(new.links), "extracted links differ"
+
+
+if __name__ == "__main__":
+    main()
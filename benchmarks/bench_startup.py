@@ -0,0 +1,127 @@
+"""
+Cold-start benchmark for the FastAPI app.
+
+Measures, in fresh interpreter processes:
+
+* how long `import main` takes and which heavy optional modules it pulls in
+* time from spawning uvicorn to the first successful `GET /`
+* the `/ready` status once the app is up
+
+`QDRANT_URL` defaults to an unreachable address so the numbers also show that
+the app boots (and reports not-ready) without Qdrant.
+
+Usage:
+    PYTHONPATH=src:. python benchmarks/bench_startup.py [--runs 5] [--qdrant-url http://127.0.0.1:1]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+import httpx
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("selenium", "langchain", "pdfplumber", "tiktoken")
+
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+try:
+    import main
+    error = None
+except Exception as e:
+    error = f"{type(e).__name__}: {e}"
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "error": error,
+    "heavy_modules": sorted(m for m in %r if m in sys.modules),
+}))
+""" % (HEAVY_MODULES,)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env):
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def measure_first_request(env, timeout: float = 60.0):
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                return {"seconds": None, "error": process.stderr.read()[-500:]}
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0)
+                if response.status_code == 200:
+                    first = time.perf_counter() - start
+                    ready = httpx.get(f"http://127.0.0.1:{port}/ready", timeout=10.0)
+                    return {"seconds": first, "ready_status": ready.status_code, "ready": ready.json()}
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+        return {"seconds": None, "error": "timed out"}
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--qdrant-url", default="http://127.0.0.1:1")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="trinitybot-startup-")
+    env = dict(os.environ)
+    # Keep the SQLite stores the app opens on startup out of the real artifacts directory
+    for name, filename in (("EMBEDDING_CACHE_PATH", "embeddings"), ("INGEST_MANIFEST_PATH", "manifest"),
+                           ("LEXICAL_INDEX_PATH", "lexical"), ("PDF_JOBS_PATH", "pdf_jobs")):
+        env[name] = os.path.join(work_dir, f"{filename}.sqlite3")
+    env.setdefault("OPENAI_API_KEY", "bench")
+    env.setdefault("QDRANT_COLLECTION_NAME", "bench")
+    env["QDRANT_URL"] = args.qdrant_url
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.join(REPO_DIR, "src"), REPO_DIR, env.get("PYTHONPATH")]))
+
+    try:
+        imports = [measure_import(env) for _ in range(args.runs)]
+        requests = [measure_first_request(env) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    import_times = [run["seconds"] for run in imports]
+    request_times = [run["seconds"] for run in requests if run["seconds"] is not None]
+    print(json.dumps({
+        "qdrant_url": args.qdrant_url,
+        "import_main": {
+            "median_ms": round(statistics.median(import_times) * 1000, 1),
+            "error": imports[-1]["error"],
+            "heavy_modules": imports[-1]["heavy_modules"],
+        },
+        "first_request": {
+            "median_ms": round(statistics.median(request_times) * 1000, 1) if request_times else None,
+            "booted": f"{len(request_times)}/{len(requests)}",
+            "last": requests[-1],
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+Offline end-to-end benchmark suite.
+
+Everything runs locally: a stand-in OpenAI-compatible server with configurable
+latency (`fake_openai.py`), Qdrant in `:memory:` mode, a static site served from
+the saved HTML fixtures and the PDFs under `fixtures/pdf`. Measured:
+
+* scraper   - `SSRScraper` pages/sec over the local site
+* chunking  - characters and chunks/sec for scraped text and PDF pages
+* ingest    - `QdrantDumper` chunks/sec for scraped documents and `dump_pdf`
+* chatbot   - `/chatbot/` p50/p95/p99 latency and throughput at several concurrency levels
+
+Results are printed (or written with `--output`) as JSON tagged with the
+current commit, so runs can be diffed between commits.
+
+Usage:
+    PYTHONPATH=src:. python benchmarks/bench_suite.py [--output results.json]
+        [--pages 60] [--concurrency 1,4,16,64] [--requests 200]
+        [--embedding-latency-ms 40] [--completion-latency-ms 300]
+"""
+import os
+import sys
+import re
+import glob
+import json
+import time
+import shutil
+import asyncio
+import logging
+import platform
+import argparse
+import tempfile
+import functools
+import subprocess
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(BENCH_DIR, "fixtures")
+COLLECTION = "bench"
+
+
+def percentiles(samples_ms):
+    samples = np.array(samples_ms) if samples_ms else np.zeros(1)
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)), 2),
+        "p95_ms": round(float(np.percentile(samples, 95)), 2),
+        "p99_ms": round(float(np.percentile(samples, 99)), 2),
+        "max_ms": round(float(samples.max()), 2),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def build_site(directory: str, pages: int, links_per_page: int = 4) -> None:
+    # Each page is a saved fixture plus links to the next pages, so a crawl from
+    # index.html reaches the whole site within a couple of levels
+    templates = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "html", "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            templates.append(f.read())
+    for number in range(pages):
+        targets = [f"/page{(number * links_per_page + offset) % pages}.html" for offset in range(1, links_per_page + 1)]
+        links = "".join(f'<a href="{target}">page</a>' for target in targets)
+        # The fixtures' own links point at the original sites; keep the markup but aim them at this one
+        html = re.sub(r'href="[^"]*"', f'href="{targets[0]}"', templates[number % len(templates)])
+        html = html.replace("</body>", f"<nav>{links}</nav><p>Page {number}</p></body>")
+        name = "index.html" if number == 0 else f"page{number}.html"
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(html)
+    shutil.copy(os.path.join(directory, "index.html"), os.path.join(directory, "page0.html"))
+
+
+def serve_directory(directory: str) -> ThreadingHTTPServer:
+    handler = functools.partial(_QuietHandler, directory=directory)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def bench_scraper(site_url: str, pages: int):
+    from TrinityBot.components.datascraping import SSRScraper
+
+    scraper = SSRScraper(render_mode="static", max_pages=pages, concurrent_requests=8,
+                         per_host_concurrency=8, per_host_delay=0.0)
+    start = time.perf_counter()
+    documents = asyncio.run(scraper.scrape_site_async(site_url, max_depth=10))
+    elapsed = time.perf_counter() - start
+    crawled = len(scraper.visited_urls)
+    scraper.cleanup()
+    return documents, {
+        "pages": crawled,
+        "documents": len(documents),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(crawled / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def bench_chunking(site_dir: str, dumper, repeat: int = 5):
+    from TrinityBot.components.datascraping import SSRScraper
+    from TrinityBot.components.htmlextraction import extract_page
+    from TrinityBot.components.pdfextraction import iter_pdf_pages
+
+    scraper = SSRScraper(render_mode="static")
+    texts = []
+    for path in sorted(glob.glob(os.path.join(site_dir, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            texts.append(extract_page(f.read(), "http://127.0.0.1/").text)
+    chars = sum(len(text) for text in texts) * repeat
+    start = time.perf_counter()
+    chunks = 0
+    for _ in range(repeat):
+        for number, text in enumerate(texts):
+            chunks += len(scraper._create_langchain_documents(text, f"http://127.0.0.1/page{number}.html", "bench"))
+    html_elapsed = time.perf_counter() - start
+    scraper.cleanup()
+
+    pdf_pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "pdf", "*.pdf"))):
+        pdf_pages.extend(iter_pdf_pages(path, workers=1))
+    pdf_chars = sum(len(text) for _, text in pdf_pages) * repeat
+    start = time.perf_counter()
+    pdf_chunks = 0
+    for _ in range(repeat):
+        pdf_chunks += len(dumper._pdf_items(pdf_pages, "bench.pdf", "bench"))
+    pdf_elapsed = time.perf_counter() - start
+
+    return {
+        "html": {
+            "chars": chars,
+            "chunks": chunks,
+            "seconds": round(html_elapsed, 4),
+            "chars_per_sec": round(chars / html_elapsed) if html_elapsed else 0,
+            "chunks_per_sec": round(chunks / html_elapsed, 1) if html_elapsed else 0.0,
+        },
+        "pdf": {
+            "pages": len(pdf_pages) * repeat,
+            "chars": pdf_chars,
+            "chunks": pdf_chunks,
+            "seconds": round(pdf_elapsed, 4),
+            "chars_per_sec": round(pdf_chars / pdf_elapsed) if pdf_elapsed else 0,
+            "chunks_per_sec": round(pdf_chunks / pdf_elapsed, 1) if pdf_elapsed else 0.0,
+        },
+    }
+
+
+def bench_ingest(dumper, documents):
+    payload = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+    documents_result = dumper.dump_documents(payload)
+
+    pdf_results = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "pdf", "*.pdf"))):
+        start = time.perf_counter()
+        result = dumper.dump_pdf(path, "bench", source=os.path.basename(path))
+        elapsed = time.perf_counter() - start
+        inserted = result.get("inserted", 0) if isinstance(result, dict) else 0
+        pdf_results.append({
+            "file": os.path.basename(path),
+            "chunks": inserted,
+            "seconds": round(elapsed, 3),
+            "chunks_per_sec": round(inserted / elapsed, 2) if elapsed else 0.0,
+        })
+    return {"documents": documents_result, "pdf": pdf_results}
+
+
+async def _copy_collection(source, target):
+    from qdrant_client.models import PointStruct
+
+    info = source.get_collection(COLLECTION)
+    await target.create_collection(COLLECTION, vectors_config=info.config.params.vectors)
+    offset = None
+    while True:
+        points, offset = source.scroll(COLLECTION, limit=256, offset=offset, with_payload=True, with_vectors=True)
+        if points:
+            await target.upsert(COLLECTION, points=[
+                PointStruct(id=point.id, vector=point.vector, payload=point.payload) for point in points
+            ])
+        if offset is None:
+            break
+
+
+async def _load(port: int, concurrency: int, total: int, run: int):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(client, number):
+        nonlocal errors
+        async with semaphore:
+            # Unique queries so the answer cache never short-circuits a request
+            query = f"run {run} question {number}: how are index rebalancing fees reported?"
+            start = time.perf_counter()
+            try:
+                response = await client.post("/chatbot/", params={"query": query})
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, number) for number in range(total)))
+        elapsed = time.perf_counter() - start
+    return dict(percentiles(latencies), concurrency=concurrency, requests=total, errors=errors,
+                seconds=round(elapsed, 3), requests_per_sec=round(len(latencies) / elapsed, 2))
+
+
+def bench_chatbot(sync_client, work_dir: str, concurrency_levels, requests_per_level: int):
+    import uvicorn
+    from fastapi import FastAPI
+    from qdrant_client import AsyncQdrantClient
+    from routes import chatbot_route
+    from routes.dependencies import get_chatbot
+    from TrinityBot.components.queryingqdrant import AsyncChatbot
+    from TrinityBot.components.answercache import AnswerCache
+    from TrinityBot.components.embeddingcache import EmbeddingCache
+    from TrinityBot.components.lexicalindex import LexicalIndex
+
+    async_client = AsyncQdrantClient(location=":memory:")
+    asyncio.run(_copy_collection(sync_client, async_client))
+    chatbot = AsyncChatbot(
+        collection_name=COLLECTION,
+        qdrant_client=async_client,
+        embedding_cache=EmbeddingCache(os.path.join(work_dir, "query_embeddings.sqlite3")),
+        # Never match semantically; queries are unique so exact hits cannot happen either
+        answer_cache=AnswerCache(similarity_threshold=2.0),
+        lexical_index=LexicalIndex(os.path.join(work_dir, "lexical.sqlite3")),
+        max_concurrency=max(concurrency_levels)
+    )
+    app = FastAPI()
+    app.include_router(chatbot_route.router)
+    app.dependency_overrides[get_chatbot] = lambda: chatbot
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off"))
+
+    results = []
+    loop_ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop_ready.set()
+        loop.run_until_complete(server.serve())
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    loop_ready.wait()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        for run, concurrency in enumerate(concurrency_levels):
+            results.append(asyncio.run(_load(port, concurrency, requests_per_level, run)))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+    return results
+
+
+def build_dumper(qdrant, work_dir):
+    """The suite's dumper: every store under `work_dir`, vectors in `qdrant`."""
+    from TrinityBot.components.qdrantdumping import QdrantDumper
+    from TrinityBot.components.embeddingcache import EmbeddingCache
+    from TrinityBot.components.ingestmanifest import IngestManifest
+    from TrinityBot.components.lexicalindex import LexicalIndex
+
+    return QdrantDumper(
+        collection_name=COLLECTION,
+        qdrant_client=qdrant,
+        embedding_cache=EmbeddingCache(os.path.join(work_dir, "embeddings.sqlite3")),
+        manifest=IngestManifest(os.path.join(work_dir, "manifest.sqlite3")),
+        lexical_index=LexicalIndex(os.path.join(work_dir, "lexical.sqlite3"))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--embedding-latency-ms", type=float, default=40.0)
+    parser.add_argument("--completion-latency-ms", type=float, default=300.0)
+    parser.add_argument("--token-latency-ms", type=float, default=5.0)
+    parser.add_argument("--skip", default="", help="Comma-separated sections to skip: scraper,chunking,ingest,chatbot")
+    args = parser.parse_args()
+    skip = set(filter(None, args.skip.split(",")))
+    concurrency_levels = [int(level) for level in args.concurrency.split(",") if level]
+
+    logging.disable(logging.WARNING)
+    work_dir = tempfile.mkdtemp(prefix="trinitybot-bench-")
+    # Keep every cache and index the components open out of the real artifacts directory
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "EMBEDDING_PROVIDER": "openai",
+        "EMBEDDING_CACHE_PATH": os.path.join(work_dir, "embeddings.sqlite3"),
+        "INGEST_MANIFEST_PATH": os.path.join(work_dir, "manifest.sqlite3"),
+        "LEXICAL_INDEX_PATH": os.path.join(work_dir, "lexical.sqlite3"),
+        "CRAWL_STATE_PATH": os.path.join(work_dir, "crawl_state.sqlite3"),
+        "PIPELINE_CONFIG": os.path.join(work_dir, "missing.yaml"),
+    })
+
+    from fake_openai import FakeOpenAIServer
+    from qdrant_client import QdrantClient
+
+    fake = FakeOpenAIServer(
+        embedding_latency_ms=args.embedding_latency_ms,
+        completion_latency_ms=args.completion_latency_ms,
+        token_latency_ms=args.token_latency_ms
+    ).start()
+    os.environ["OPENAI_BASE_URL"] = fake.base_url
+
+    site_dir = os.path.join(work_dir, "site")
+    os.makedirs(site_dir)
+    build_site(site_dir, args.pages)
+    site = serve_directory(site_dir)
+    site_url = f"http://127.0.0.1:{site.server_address[1]}/index.html"
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "results": {},
+    }
+    results = report["results"]
+    try:
+        qdrant = QdrantClient(location=":memory:")
+        dumper = build_dumper(qdrant, work_dir)
+
+        documents = []
+        if "scraper" not in skip:
+            documents, results["scraper"] = bench_scraper(site_url, args.pages)
+        if "chunking" not in skip:
+            results["chunking"] = bench_chunking(site_dir, dumper)
+        if "ingest" not in skip:
+            results["ingest"] = bench_ingest(dumper, documents)
+        if "chatbot" not in skip:
+            results["chatbot"] = bench_chatbot(qdrant, work_dir, concurrency_levels, args.requests)
+        results["fake_openai_requests"] = dict(fake.requests)
+    finally:
+        fake.stop()
+        site.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, BENCH_DIR)
+    main()
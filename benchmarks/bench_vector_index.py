@@ -0,0 +1,160 @@
+"""
+Recall-vs-latency benchmark for the Qdrant collection settings in `VectorIndexConfig`.
+
+Builds a synthetic clustered corpus, computes exact top-k neighbours with NumPy,
+then for every index variant (HNSW m / ef_construct, quantization) and every
+query-time `hnsw_ef` reports recall@k, p50/p95 latency and the projected memory
+footprint at `--plan-vectors` points.
+
+The default target is the embedded in-memory Qdrant (`:memory:`), which always
+searches exhaustively: recall is 1.0 there and the numbers are a latency
+baseline. Point `--url` at a Qdrant server (e.g. a throwaway
+`docker run -p 6333:6333 qdrant/qdrant`) to measure the real HNSW/quantization
+trade-off.
+
+Usage:
+    python benchmarks/bench_vector_index.py [--url :memory:] [--vectors 20000] [--dim 1536]
+        [--queries 200] [--top-k 10] [--ef 16,32,64,128,256] [--plan-vectors 5000000]
+"""
+import json
+import time
+import argparse
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct, OptimizersConfigDiff
+
+from TrinityBot.components.vectorindex import VectorIndexConfig
+
+
+VARIANTS = [
+    {"name": "hnsw-m16", "hnsw_m": 16, "hnsw_ef_construct": 100},
+    {"name": "hnsw-m32", "hnsw_m": 32, "hnsw_ef_construct": 200},
+    {"name": "scalar-int8", "hnsw_m": 16, "hnsw_ef_construct": 100, "quantization": "scalar"},
+    {"name": "binary", "hnsw_m": 16, "hnsw_ef_construct": 100, "quantization": "binary", "oversampling": 3.0},
+    {"name": "scalar-on-disk", "hnsw_m": 16, "hnsw_ef_construct": 100, "quantization": "scalar", "on_disk": True},
+]
+
+
+def make_corpus(num_vectors: int, dim: int, num_queries: int, seed: int = 7):
+    # Clustered data looks more like real embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(8, num_vectors // 500), dim)).astype(np.float32)
+    assignment = rng.integers(0, len(centers), size=num_vectors + num_queries)
+    data = centers[assignment] + 0.35 * rng.normal(size=(num_vectors + num_queries, dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data[:num_vectors], data[num_vectors:]
+
+
+def exact_neighbours(vectors, queries, top_k):
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :top_k]
+
+
+def wait_until_indexed(client, collection_name, timeout=600):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        info = client.get_collection(collection_name)
+        if str(getattr(info.status, "value", info.status)) == "green":
+            return
+        time.sleep(0.5)
+
+
+def build_collection(client, collection_name, config, vectors, batch_size=512):
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    hnsw = config.hnsw_config()
+    # Build the graph even for small benchmark corpora instead of falling back to full scan
+    hnsw.full_scan_threshold = 10
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=config.vectors_config(),
+        hnsw_config=hnsw,
+        quantization_config=config.quantization_config(),
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=1)
+    )
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), batch_size):
+        batch = vectors[offset:offset + batch_size]
+        client.upsert(
+            collection_name=collection_name,
+            points=[PointStruct(id=offset + i, vector=v.tolist()) for i, v in enumerate(batch)],
+            wait=True
+        )
+    wait_until_indexed(client, collection_name)
+    return time.perf_counter() - start
+
+
+def measure(client, collection_name, config, queries, truth, top_k, hnsw_ef, exact=False):
+    params = config.search_params(hnsw_ef=hnsw_ef, exact=exact)
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = client.search(
+            collection_name=collection_name,
+            query_vector=query.tolist(),
+            search_params=params,
+            limit=top_k
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({point.id for point in result} & set(expected.tolist()))
+    latencies = np.array(latencies)
+    return {
+        "hnsw_ef": "exact" if exact else hnsw_ef,
+        "recall": round(hits / (len(queries) * top_k), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "qps": round(len(queries) / (latencies.sum() / 1000), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=":memory:")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--ef", default="16,32,64,128,256")
+    parser.add_argument("--plan-vectors", type=int, default=5_000_000)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file as well")
+    args = parser.parse_args()
+
+    client = QdrantClient(location=":memory:") if args.url == ":memory:" else QdrantClient(url=args.url)
+    vectors, queries = make_corpus(args.vectors, args.dim, args.queries)
+    truth = exact_neighbours(vectors, queries, args.top_k)
+    ef_values = [int(value) for value in args.ef.split(",") if value]
+
+    report = {"target": args.url, "vectors": args.vectors, "dim": args.dim,
+              "queries": args.queries, "top_k": args.top_k, "variants": []}
+    for variant in VARIANTS:
+        variant = dict(variant)
+        name = variant.pop("name")
+        config = VectorIndexConfig(vector_size=args.dim, **variant)
+        collection_name = f"bench_{name.replace('-', '_')}"
+        build_seconds = build_collection(client, collection_name, config, vectors)
+        runs = [measure(client, collection_name, config, queries, truth, args.top_k, ef) for ef in ef_values]
+        runs.append(measure(client, collection_name, config, queries, truth, args.top_k, None, exact=True))
+        report["variants"].append({
+            "name": name,
+            "build_seconds": round(build_seconds, 2),
+            "memory_at_plan": config.estimate_memory(args.plan_vectors),
+            "runs": runs,
+        })
+        client.delete_collection(collection_name)
+
+        print(f"{name:<16} build {build_seconds:7.2f}s  "
+              f"RAM @ {args.plan_vectors:,} vectors: {config.estimate_memory(args.plan_vectors)['ram_bytes'] / 2**30:6.2f} GiB")
+        for run in runs:
+            print(f"    ef={str(run['hnsw_ef']):>6}  recall@{args.top_k}={run['recall']:.3f}  "
+                  f"p50={run['p50_ms']:7.3f}ms  p95={run['p95_ms']:7.3f}ms  {run['qps']:8.1f} q/s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
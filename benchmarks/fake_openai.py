@@ -0,0 +1,195 @@
+"""
+Local stand-in for the OpenAI API, for offline benchmarks.
+
+Serves `/v1/embeddings` and `/v1/chat/completions` (including `stream=true`)
+with deterministic output and configurable latency, so a benchmark run measures
+our code rather than the network. Point the official client at it with
+`OPENAI_BASE_URL=http://127.0.0.1:<port>/v1`.
+
+Usage:
+    python benchmarks/fake_openai.py [--port 8799] [--embedding-latency-ms 40]
+        [--completion-latency-ms 300] [--token-latency-ms 5] [--dimension 1536]
+"""
+import json
+import time
+import base64
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from TrinityBot.components.embeddings import LocalEmbeddingProvider
+
+
+ANSWER_WORDS = (
+    "Based on the provided context, the project offers tokenized index products "
+    "with transparent rebalancing, audited reserves and weekly reporting for holders."
+).split()
+
+
+class FakeOpenAIServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 embedding_latency_ms: float = 40.0,
+                 embedding_latency_per_input_ms: float = 0.2,
+                 completion_latency_ms: float = 300.0,
+                 token_latency_ms: float = 5.0,
+                 jitter: float = 0.1,
+                 dimension: int = 1536,
+                 completion_tokens: int = 24):
+        self.embedding_latency_ms = embedding_latency_ms
+        self.embedding_latency_per_input_ms = embedding_latency_per_input_ms
+        self.completion_latency_ms = completion_latency_ms
+        self.token_latency_ms = token_latency_ms
+        self.jitter = jitter
+        self.completion_tokens = completion_tokens
+        self.embedder = LocalEmbeddingProvider(dimension=dimension)
+        self.requests = {"embeddings": 0, "embedding_inputs": 0, "chat": 0}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _sleep(self, milliseconds: float):
+        if milliseconds > 0:
+            time.sleep(milliseconds * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.requests[key] += amount
+
+    def _answer_words(self, messages) -> list:
+        # Deterministic per prompt so repeated runs produce identical output
+        prompt = json.dumps(messages, sort_keys=True)
+        rng = random.Random(prompt)
+        return [rng.choice(ANSWER_WORDS) for _ in range(self.completion_tokens)]
+
+    def embeddings(self, body: dict) -> dict:
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        self._count("embeddings")
+        self._count("embedding_inputs", len(inputs))
+        self._sleep(self.embedding_latency_ms + self.embedding_latency_per_input_ms * len(inputs))
+        vectors = self.embedder.embed(inputs)
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for index, vector in enumerate(vectors):
+            embedding = (base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+                         if as_base64 else vector)
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        tokens = sum(len(text.split()) for text in inputs)
+        return {"object": "list", "data": data, "model": body.get("model", "fake"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload: dict, status: int = 200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _chat(self, body: dict):
+                server._count("chat")
+                messages = body.get("messages", [])
+                words = server._answer_words(messages)
+                prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                         "total_tokens": prompt_tokens + len(words)}
+                base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body.get("model", "fake")}
+                server._sleep(server.completion_latency_ms)
+
+                if not body.get("stream"):
+                    server._sleep(server.token_latency_ms * len(words))
+                    self._send_json(dict(base, object="chat.completion", usage=usage, choices=[{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": " ".join(words)},
+                        "finish_reason": "stop",
+                    }]))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for index, word in enumerate(words):
+                    server._sleep(server.token_latency_ms)
+                    chunk = dict(base, object="chat.completion.chunk", choices=[{
+                        "index": 0,
+                        "delta": {"content": word if index == 0 else f" {word}"},
+                        "finish_reason": None,
+                    }])
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                final = dict(base, object="chat.completion.chunk",
+                             choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+                self._write_chunk(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self._write_chunk(b"")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.endswith("/embeddings"):
+                    self._send_json(server.embeddings(body))
+                elif self.path.endswith("/chat/completions"):
+                    self._chat(body)
+                else:
+                    self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--embedding-latency-ms", type=float, default=40.0)
+    parser.add_argument("--completion-latency-ms", type=float, default=300.0)
+    parser.add_argument("--token-latency-ms", type=float, default=5.0)
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        host=args.host, port=args.port,
+        embedding_latency_ms=args.embedding_latency_ms,
+        completion_latency_ms=args.completion_latency_ms,
+        token_latency_ms=args.token_latency_ms,
+        dimension=args.dimension
+    )
+    print(f"Fake OpenAI API listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,29 @@
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from routes import pdf_dump_route, chatbot_route
+from routes.dependencies import Services
 from fastapi.middleware.cors import CORSMiddleware
+from TrinityBot.utils.metrics import REGISTRY, MetricsMiddleware
+from TrinityBot.components.ratelimiter import rate_limiter_stats
 import uvicorn
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients are built once here and shared by every request; nothing touches the network yet
+    app.state.services = Services()
+    try:
+        yield
+    finally:
+        await app.state.services.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = ["*"]
 app.add_middleware(
@@ -16,13 +33,59 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    MetricsMiddleware,
+    timing_headers=os.getenv("TIMING_HEADERS", "false").lower() in ("1", "true", "yes")
+)
 
 app.include_router(pdf_dump_route.router)
 app.include_router(chatbot_route.router)
 
+
+def _cache_stats():
+    # Read at scrape time so the values always reflect the live caches
+    chatbot = app.state.services.chatbot
+    answer = chatbot.answer_cache.stats()
+    embedding = chatbot.embedding_cache.stats()
+    return {
+        ("answer", "hit_rate"): answer["hit_rate"],
+        ("answer", "hits"): answer["exact_hits"] + answer["semantic_hits"],
+        ("answer", "misses"): answer["misses"],
+        ("embedding", "hit_rate"): embedding["hit_rate"],
+        ("embedding", "hits"): embedding["hits"],
+        ("embedding", "misses"): embedding["misses"],
+    }
+
+
+REGISTRY.gauge_callback("trinitybot_cache", "Answer and embedding cache hits, misses and hit rate.",
+                        ("cache", "stat"), _cache_stats)
+REGISTRY.gauge_callback("trinitybot_rate_limiter", "OpenAI throttle state per model: bucket levels, bulk concurrency, 429s.",
+                        ("model", "stat"),
+                        lambda: {(model, stat): value
+                                 for model, stats in rate_limiter_stats().items()
+                                 for stat, value in stats.items()})
+
+
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to the PDF Dump API"}
 
+
+@app.get("/ready")
+async def ready(request: Request):
+    """
+    Readiness probe: 200 once Qdrant answers and the collection exists, 503 otherwise.
+    """
+    status = await request.app.state.services.ready()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus text-format metrics: stage and request latency histograms, token usage and cache hit rates.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,33 +1,21 @@
-import subprocess
-import sys
 import os
+import json
+import yaml
 from TrinityBot.utils.logging import logger
+from TrinityBot.components.qdrantdumping import QdrantDumper
+from TrinityBot.components.crawlstate import CrawlState
+from TrinityBot.components.dedup import ContentDeduplicator
+from TrinityBot.components.artifacts import ArtifactStore
+from TrinityBot.pipeline.streaming import StreamingPipeline
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def run_stage(stage_script: str):
-    """
-    Executes a pipeline stage script and ensures errors are properly logged and raised.
 
-    Args:
-        stage_script (str): The path to the stage script.
-    """
-    try:
-        result = subprocess.run(
-            [sys.executable, stage_script],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        if result.returncode != 0:
-            print(f"Error running {stage_script}:\n{result.stderr}")
-            raise RuntimeError(f"{stage_script} failed with return code {result.returncode}")
-        else:
-            print(f"{stage_script} completed successfully.\nOutput:\n{result.stdout}")
-    except Exception as e:
-        print(f"An error occurred while running {stage_script}: {str(e)}")
-        raise
+def load_config(path: str = "config.yaml") -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
 
 def main():
     """
@@ -36,18 +24,33 @@ def main():
     print("<<<< Started Pipeline Execution ... >>>>")
     logger.info("<<<< Started Pipeline Execution ... >>>>")
 
-    stage_scripts = [
-        "src/TrinityBot/pipeline/stage01_DataScraping.py",
-        "src/TrinityBot/pipeline/stage02_QdrantDumping.py"
-    ]
-
-    for script in stage_scripts:
-        if not os.path.exists(script):
-            print(f"Error: Script {script} not found.")
-            sys.exit(1)
-        run_stage(script)
-
-    print("<<<< Started Pipeline Execution ... >>>>")
+    config = load_config(os.getenv("PIPELINE_CONFIG", "config.yaml"))
+    scrape_config = dict(config.get("scrape_config", {}))
+    pipeline_config = config.get("pipeline_config", {})
+    workers = pipeline_config.get("workers", {})
+
+    targets = scrape_config.pop("urls_to_scrape")
+    max_depth = scrape_config.pop("max_depth", 1)
+
+    dumper = QdrantDumper(collection_name=os.getenv("QDRANT_COLLECTION_NAME"))
+    pipeline = StreamingPipeline(
+        dumper=dumper,
+        targets=targets,
+        max_depth=max_depth,
+        scraper_options=scrape_config,
+        crawl_workers=workers.get("crawl", 2),
+        embed_workers=workers.get("embed"),
+        upsert_workers=workers.get("upsert", 1),
+        queue_size=pipeline_config.get("queue_size", 64),
+        flush_interval=pipeline_config.get("flush_interval", 1.0),
+        artifact_store=ArtifactStore(os.getenv("SCRAPPED_DATA_DIRECTORY", "artifacts/ScrappedData")),
+        crawl_state=CrawlState(),
+        deduplicator=ContentDeduplicator()
+    )
+    stats = pipeline.run()
+
+    print(f"Pipeline stats:\n{json.dumps(stats, indent=2)}")
+    print("<<<< Pipeline Completed ... >>>>")
     logger.info("<<<< Pipeline Completed ... >>>>")
 
 if __name__ == "__main__":
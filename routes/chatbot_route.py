@@ -1,27 +1,103 @@
-import os
-from fastapi import APIRouter, HTTPException
-from TrinityBot.components.queryingqdrant import Chatbot
+import json
+import time
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from TrinityBot.components.queryingqdrant import AsyncChatbot, describe_sources
+from routes.dependencies import get_chatbot
 from dotenv import load_dotenv
 load_dotenv()
 
-collection_name = os.getenv("QDRANT_COLLECTION_NAME")
-
 router = APIRouter()
 
-chatbot = Chatbot(collection_name=collection_name)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 
 @router.post("/chatbot/")
-async def chatbot_query(query: str):
+async def chatbot_query(query: str, token: Optional[str] = None,
+                        chatbot: AsyncChatbot = Depends(get_chatbot)):
     """
-    Handle user queries and return concise responses.
+    Handle user queries and return concise responses, optionally scoped to one token's documents.
     """
     try:
-        results = chatbot.search_qdrant(query)
-        if not results:
+        result = await chatbot.answer(query, token=token)
+        if not result:
             return {"message": "No relevant information found in the database."}
 
-        response = chatbot.generate_response(query, results)
-        return {"answer": response}
+        return {"answer": result["answer"], "cached": result["cached"]}
 
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out while processing query.")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+
+
+@router.post("/chatbot/stream/")
+async def chatbot_stream(query: str, token: Optional[str] = None,
+                         chatbot: AsyncChatbot = Depends(get_chatbot)):
+    """
+    Stream the answer as Server-Sent Events: `sources`, then `token` events, then `done` with timings.
+    """
+    async def events():
+        start = time.perf_counter()
+        try:
+            cached, embedding = await chatbot.lookup_cached(query, token=token)
+            if cached:
+                yield _sse("sources", cached["sources"])
+                yield _sse("token", {"text": cached["answer"]})
+                yield _sse("done", {
+                    "cached": cached["cached"],
+                    "total_ms": round((time.perf_counter() - start) * 1000, 1),
+                })
+                return
+
+            results = await chatbot.search_qdrant(query, embedding=embedding, token=token)
+            retrieval_ms = (time.perf_counter() - start) * 1000
+            if not results:
+                yield _sse("message", {"message": "No relevant information found in the database."})
+                return
+
+            sources = describe_sources(results)
+            yield _sse("sources", sources)
+
+            first_token_ms = None
+            pieces = []
+            async for text in chatbot.generate_response_stream(query, results):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                pieces.append(text)
+                yield _sse("token", {"text": text})
+
+            total = time.perf_counter() - start
+            chatbot.answer_cache.store(query, embedding, "".join(pieces).strip(), sources, total, scope=token)
+            yield _sse("done", {
+                "cached": None,
+                "retrieval_ms": round(retrieval_ms, 1),
+                "first_token_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+                "total_ms": round(total * 1000, 1),
+            })
+        except asyncio.TimeoutError:
+            yield _sse("error", {"detail": "Timed out while processing query."})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Error processing query: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/chatbot/cache-stats/")
+async def chatbot_cache_stats(chatbot: AsyncChatbot = Depends(get_chatbot)):
+    """
+    Report answer and embedding cache hit rates, the latency saved by cached answers and query embedding batching.
+    """
+    return {
+        "answer_cache": chatbot.answer_cache.stats(),
+        "embedding_cache": chatbot.embedding_cache.stats(),
+        "embedding_batcher": chatbot.embedding_batcher.stats(),
+    }
@@ -0,0 +1,98 @@
+import os
+import asyncio
+import threading
+from typing import Optional
+
+from fastapi import Depends, Request
+from openai import AsyncOpenAI, OpenAI
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+from TrinityBot.components.embeddings import default_embedding_provider
+from TrinityBot.components.pdfjobs import PdfJobStore
+from TrinityBot.components.queryingqdrant import AsyncChatbot
+
+
+class Services:
+    """
+    Clients shared by every route, created once per process by the app lifespan.
+
+    Constructing them never touches the network, so the app boots even when
+    Qdrant or OpenAI are unreachable; `ready()` reports whether they are usable.
+    The ingest-side `QdrantDumper` (which checks the collection on construction
+    and pulls in the PDF and text-splitting stack) is only built on first use,
+    on the sync clients created here, so every client is closed by `close()`.
+    """
+
+    def __init__(self, collection_name: Optional[str] = None):
+        self.collection_name = collection_name or os.getenv("QDRANT_COLLECTION_NAME")
+        self.timeout = float(os.getenv("CHATBOT_TIMEOUT", "30"))
+        self.qdrant = AsyncQdrantClient(
+            url=os.getenv("QDRANT_URL"),
+            api_key=os.getenv("QDRANT_API_KEY"),
+            timeout=int(self.timeout)
+        )
+        # Blocking counterparts for ingestion (PDF jobs run in worker threads)
+        self.qdrant_sync = QdrantClient(
+            url=os.getenv("QDRANT_URL"),
+            api_key=os.getenv("QDRANT_API_KEY"),
+            timeout=int(self.timeout)
+        )
+        # Retries are handled by the shared rate limiter, not the client
+        self.openai = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=self.timeout, max_retries=0)
+        self.openai_sync = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=float(os.getenv("EMBEDDING_TIMEOUT", "60")),
+            max_retries=0
+        )
+        self.embedding_provider = default_embedding_provider(client=self.openai_sync, async_client=self.openai)
+        self.chatbot = AsyncChatbot(
+            collection_name=self.collection_name,
+            embedding_provider=self.embedding_provider,
+            qdrant_client=self.qdrant,
+            openai_client=self.openai,
+            timeout=self.timeout,
+            max_concurrency=int(os.getenv("CHATBOT_MAX_CONCURRENCY", "32"))
+        )
+        self.pdf_jobs = PdfJobStore()
+        self._dumper = None
+        self._dumper_lock = threading.Lock()
+
+    def dumper(self):
+        with self._dumper_lock:
+            if self._dumper is None:
+                from TrinityBot.components.qdrantdumping import QdrantDumper
+
+                self._dumper = QdrantDumper(
+                    collection_name=self.collection_name,
+                    embedding_provider=self.embedding_provider,
+                    embedding_cache=self.chatbot.embedding_cache,
+                    lexical_index=self.chatbot.lexical_index,
+                    qdrant_client=self.qdrant_sync
+                )
+            return self._dumper
+
+    async def ready(self, timeout: float = 2.0) -> dict:
+        status = {"qdrant": "ok", "collection": self.collection_name, "collection_exists": False}
+        try:
+            status["collection_exists"] = await asyncio.wait_for(
+                self.qdrant.collection_exists(self.collection_name), timeout
+            )
+        except Exception as e:
+            status["qdrant"] = f"unreachable: {str(e) or type(e).__name__}"
+        status["ready"] = status["qdrant"] == "ok" and status["collection_exists"]
+        return status
+
+    async def close(self):
+        await asyncio.to_thread(self.chatbot.embedding_cache.flush_access_times)
+        await self.qdrant.close()
+        await self.openai.close()
+        self.qdrant_sync.close()
+        self.openai_sync.close()
+
+
+def get_services(request: Request) -> Services:
+    return request.app.state.services
+
+
+def get_chatbot(services: Services = Depends(get_services)) -> AsyncChatbot:
+    return services.chatbot
@@ -1,30 +1,68 @@
-from fastapi import FastAPI, UploadFile, Form, APIRouter
+from fastapi import FastAPI, UploadFile, Form, APIRouter, BackgroundTasks, Depends
 from fastapi.responses import JSONResponse
-from TrinityBot.components.qdrantdumping import QdrantDumper
+from routes.dependencies import Services, get_services
 import os
+import tempfile
 
 router = APIRouter()
-CollectionName = os.getenv("QDRANT_COLLECTION_NAME")
 
-qdrant_dumper = QdrantDumper(collection_name=CollectionName)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def run_pdf_job(services: Services, job_id: str, pdf_path: str, filename: str, token: str):
+    pdf_jobs = services.pdf_jobs
+
+    def progress(stats):
+        pdf_jobs.update(
+            job_id,
+            pages_total=stats["pages_total"],
+            pages_done=stats["pages_done"],
+            chunks_inserted=stats["inserted"],
+            chunks_failed=stats["failed"],
+        )
+
+    try:
+        pdf_jobs.update(job_id, status="running")
+        result = services.dumper().dump_pdf(pdf_path, token, source=filename, progress=progress)
+        if "pages_total" in result:
+            pdf_jobs.update(job_id, status="completed")
+        else:
+            pdf_jobs.update(job_id, status="failed", error=result["message"])
+    except Exception as e:
+        pdf_jobs.update(job_id, status="failed", error=str(e))
+    finally:
+        os.remove(pdf_path)
+
 
 @router.post("/upload-pdf/")
-async def upload_pdf(file: UploadFile, token: str = Form(...)):
+async def upload_pdf(background_tasks: BackgroundTasks, file: UploadFile, token: str = Form(...),
+                     services: Services = Depends(get_services)):
     try:
         if file.content_type != "application/pdf":
             return JSONResponse(
                 content={"message": "Only PDF files are supported."}, status_code=400
             )
 
-        pdf_path = f"/tmp/{file.filename}"
-        with open(pdf_path, "wb") as f:
-            f.write(await file.read())
+        # Stream the upload to disk so large PDFs never sit in memory
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            pdf_path = f.name
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                f.write(chunk)
 
-        result = qdrant_dumper.dump_pdf(pdf_path, token)
-        os.remove(pdf_path)
+        filename = os.path.basename(file.filename or pdf_path)
+        job_id = services.pdf_jobs.create(filename, token)
+        background_tasks.add_task(run_pdf_job, services, job_id, pdf_path, filename, token)
 
-        return JSONResponse(content=result, status_code=200)
+        return JSONResponse(content={"job_id": job_id, "status": "queued"}, status_code=202)
     except Exception as e:
         return JSONResponse(
             content={"message": f"Error processing PDF: {str(e)}"}, status_code=500
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/upload-pdf/{job_id}")
+async def pdf_job_status(job_id: str, services: Services = Depends(get_services)):
+    job = services.pdf_jobs.get(job_id)
+    if not job:
+        return JSONResponse(content={"message": "Job not found."}, status_code=404)
+    return JSONResponse(content=job, status_code=200)
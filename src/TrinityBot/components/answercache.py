@@ -0,0 +1,139 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+class AnswerCache:
+    """
+    In-process cache of generated answers with an exact and a semantic tier.
+
+    The exact tier matches on the normalized query text. The semantic tier reuses
+    an answer whose query embedding has cosine similarity of at least
+    `similarity_threshold` with the new query. Entries expire after `ttl` seconds,
+    the oldest are evicted past `max_entries`, and everything is dropped when
+    `generation_fn` reports that the collection was re-ingested. An optional
+    `scope` (such as a token) partitions the cache so answers never cross scopes.
+    """
+
+    def __init__(self,
+                 max_entries: int = 1000,
+                 ttl: float = 3600.0,
+                 similarity_threshold: float = 0.95,
+                 generation_fn: Optional[Callable[[], int]] = None,
+                 generation_check_interval: float = 10.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.generation_fn = generation_fn
+        self.generation_check_interval = generation_check_interval
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = generation_fn() if generation_fn else 0
+        self._last_generation_check = time.monotonic()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    @classmethod
+    def _key(cls, query: str, scope: Optional[str]) -> str:
+        return f"{scope or ''}\x00{cls.normalize(query)}"
+
+    def _check_generation(self):
+        if not self.generation_fn:
+            return
+        now = time.monotonic()
+        if now - self._last_generation_check < self.generation_check_interval:
+            return
+        self._last_generation_check = now
+        generation = self.generation_fn()
+        if generation != self._generation:
+            self._generation = generation
+            self._entries.clear()
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry["created"] >= cutoff:
+                break
+            del self._entries[key]
+
+    def _hit(self, entry: Dict, semantic: bool) -> Dict:
+        if semantic:
+            self.semantic_hits += 1
+        else:
+            self.exact_hits += 1
+        self.seconds_saved += entry["latency"]
+        return entry
+
+    def lookup_exact(self, query: str, scope: Optional[str] = None) -> Optional[Dict]:
+        key = self._key(query, scope)
+        with self._lock:
+            self._check_generation()
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._hit(entry, semantic=False)
+        return None
+
+    def lookup_similar(self, embedding: List[float], scope: Optional[str] = None) -> Optional[Dict]:
+        """
+        Returns the closest cached entry above the similarity threshold, counting a miss otherwise.
+        """
+        with self._lock:
+            self._check_generation()
+            self._expire()
+            entries = [entry for entry in self._entries.values() if entry["scope"] == scope]
+            if entries:
+                matrix = np.stack([entry["embedding"] for entry in entries])
+                scores = matrix @ self._unit(embedding)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    return self._hit(entries[best], semantic=True)
+            self.misses += 1
+        return None
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def store(self, query: str, embedding: List[float], answer: str, sources: List[Dict], latency: float,
+              scope: Optional[str] = None):
+        key = self._key(query, scope)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = {
+                "answer": answer,
+                "sources": sources,
+                "scope": scope,
+                "embedding": self._unit(embedding),
+                "latency": latency,
+                "created": time.monotonic(),
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            total = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "seconds_saved": round(self.seconds_saved, 3),
+            }
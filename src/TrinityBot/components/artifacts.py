@@ -0,0 +1,172 @@
+import os
+import io
+import json
+import gzip
+import time
+import zlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+
+def removed_record(source: str, token: str) -> Dict:
+    """
+    Record saying `source` no longer has content of its own (e.g. it became a
+    duplicate of another page), so whatever was stored for it must be deleted.
+    """
+    return {"page_content": "", "metadata": {"source": source, "token": token, "removed": True}}
+
+
+def is_removed_record(document: Dict) -> bool:
+    return bool(document.get("metadata", {}).get("removed"))
+
+
+class ArtifactWriter:
+    """
+    Appends scraped documents to one JSONL (optionally gzip) file, one document per line.
+
+    Each `write` is flushed, so every completed page survives a crash. The file is
+    marked complete in the store's index on `close`.
+    """
+
+    def __init__(self, store: "ArtifactStore", filename: str, token: str, compress: bool):
+        self.store = store
+        self.filename = filename
+        self.token = token
+        self.count = 0
+        self._lock = threading.Lock()
+        path = os.path.join(store.directory, filename)
+        self._file = gzip.open(path, "at", encoding="utf-8") if compress else open(path, "a", encoding="utf-8")
+
+    def write(self, documents: List[Dict]):
+        if not documents:
+            return
+        lines = "".join(json.dumps(document, ensure_ascii=False) + "\n" for document in documents)
+        with self._lock:
+            self._file.write(lines)
+            if isinstance(self._file, io.TextIOWrapper) and isinstance(self._file.buffer, gzip.GzipFile):
+                self._file.flush()
+                self._file.buffer.flush(zlib.Z_SYNC_FLUSH)
+            else:
+                self._file.flush()
+            self.count += len(documents)
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+        self.store._update(self.filename, documents=self.count, complete=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArtifactStore:
+    """
+    Directory of append-only JSONL artifacts plus a small `index.json` manifest.
+
+    The index records each file's token, document count, whether its writer
+    finished and whether stage 2 has already consumed it.
+    """
+
+    INDEX = "index.json"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _read_index(self) -> Dict[str, Dict]:
+        path = os.path.join(self.directory, self.INDEX)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_index(self, index: Dict[str, Dict]):
+        path = os.path.join(self.directory, self.INDEX)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _update(self, filename: str, **fields):
+        with self._lock:
+            index = self._read_index()
+            index.setdefault(filename, {}).update(fields, updated_at=time.time())
+            self._write_index(index)
+
+    def writer(self, token: str, compress: bool = True) -> ArtifactWriter:
+        """
+        Opens a new artifact for `token`. Earlier unfinished files of the same token
+        (left by a crashed run) are closed out so stage 2 can consume what they hold.
+        """
+        with self._lock:
+            index = self._read_index()
+            for entry in index.values():
+                if entry.get("token") == token and not entry.get("complete"):
+                    entry["complete"] = True
+            filename = f"{token}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl" + (".gz" if compress else "")
+            index[filename] = {
+                "token": token,
+                "documents": 0,
+                "complete": False,
+                "consumed": False,
+                "created_at": time.time(),
+            }
+            self._write_index(index)
+        return ArtifactWriter(self, filename, token, compress)
+
+    def pending_files(self) -> List[str]:
+        """
+        Complete, not yet consumed artifacts, oldest first.
+        """
+        index = self._read_index()
+        pending = [
+            (entry.get("created_at", 0), filename)
+            for filename, entry in index.items()
+            if entry.get("complete") and not entry.get("consumed")
+        ]
+        return [filename for _, filename in sorted(pending)]
+
+    def mark_consumed(self, filename: str):
+        self._update(filename, consumed=True)
+
+    def iter_documents(self, filename: str) -> Iterator[Dict]:
+        path = os.path.join(self.directory, filename)
+        opener = gzip.open if filename.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crashed writer can leave a truncated last line
+                        self.logger.warning(f"Skipping malformed line in {filename}")
+        except (EOFError, gzip.BadGzipFile) as e:
+            self.logger.warning(f"{filename} ends early ({str(e)}); using the documents read so far")
+
+    def iter_batches(self, filename: str, batch_size: int = 500) -> Iterator[List[Dict]]:
+        """
+        Yields documents of `filename` in batches of about `batch_size`.
+
+        A batch only ends between sources, so every source's chunks arrive
+        together and stale-chunk detection sees the complete set for a page.
+        """
+        batch: List[Dict] = []
+        last_source: Optional[str] = None
+        for document in self.iter_documents(filename):
+            source = document.get("metadata", {}).get("source")
+            if len(batch) >= batch_size and source != last_source:
+                yield batch
+                batch = []
+            batch.append(document)
+            last_source = source
+        if batch:
+            yield batch
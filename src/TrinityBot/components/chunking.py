@@ -0,0 +1,220 @@
+import os
+import re
+import multiprocessing
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from TrinityBot.utils.tokens import token_starts
+
+# A blank line ends a paragraph; a sentence ends at terminal punctuation (plus
+# closing quotes/brackets) followed by whitespace, or at a line break
+_PARAGRAPH = re.compile(r"\n[ \t]*\n")
+_SENTENCE_END = re.compile(r"[.!?…][.!?…\"'”’)\]]*(\s)")
+_LINE_BREAK = re.compile(r"\n")
+
+
+class Chunk(NamedTuple):
+    text: str
+    tokens: int
+    # Labels of the first and last segment the chunk covers, e.g. PDF page numbers
+    start: Any = None
+    end: Any = None
+
+
+class _Buffer:
+    """
+    Text not yet chunked, tokenized once, with the token positions where a
+    sentence or a paragraph begins.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.text = ""
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.sentences = np.zeros(0, dtype=np.int64)
+        self.paragraphs = np.zeros(0, dtype=np.int64)
+        # (offset, label) of every segment in `text`
+        self.labels: List[Tuple[int, Any]] = []
+
+    def append(self, label: Any, text: str):
+        offset = len(self.text) + 1 if self.text else 0
+        # Breaks are looked for again from the last token, as one may straddle the join
+        rescan = int(self.starts[-1]) if len(self.starts) else 0
+        self.text = f"{self.text} {text}" if self.text else text
+        self.starts = np.concatenate((self.starts, token_starts(text, self.model) + offset))
+        self.labels.append((offset, label))
+
+        sentences = [match.start(1) for match in _SENTENCE_END.finditer(self.text, rescan)]
+        sentences.extend(match.start() for match in _LINE_BREAK.finditer(self.text, rescan))
+        self.sentences = self._extend(self.sentences, sentences)
+        self.paragraphs = self._extend(
+            self.paragraphs, [match.start() for match in _PARAGRAPH.finditer(self.text, rescan)]
+        )
+
+    def _extend(self, breaks: np.ndarray, offsets: List[int]) -> np.ndarray:
+        # Token index of each break, i.e. of the first token at or after its character offset
+        found = np.unique(np.searchsorted(self.starts, np.array(offsets, dtype=np.int64)))
+        last = breaks[-1] if len(breaks) else 0
+        return np.concatenate((breaks, found[(found > last) & (found < len(self.starts))]))
+
+    def drop(self, count: int):
+        """Forgets the first `count` tokens, which are already chunked."""
+        if count <= 0:
+            return
+        cut = int(self.starts[count]) if count < len(self.starts) else len(self.text)
+        self.text = self.text[cut:]
+        self.starts = self.starts[count:] - cut
+        self.sentences = self.sentences[self.sentences > count] - count
+        self.paragraphs = self.paragraphs[self.paragraphs > count] - count
+        first = max(bisect_right([offset for offset, _ in self.labels], cut) - 1, 0)
+        self.labels = [(max(offset - cut, 0), label) for offset, label in self.labels[first:]]
+
+    def label_at(self, offset: int) -> Any:
+        index = bisect_right([start for start, _ in self.labels], offset) - 1
+        return self.labels[max(index, 0)][1]
+
+    def chunk(self, first: int, stop: int) -> Chunk:
+        begin = int(self.starts[first])
+        end = int(self.starts[stop]) if stop < len(self.starts) else len(self.text)
+        raw = self.text[begin:end]
+        text = raw.strip()
+        begin += len(raw) - len(raw.lstrip())
+        return Chunk(text, stop - first, self.label_at(begin), self.label_at(begin + max(len(text) - 1, 0)))
+
+
+class TextChunker:
+    """
+    Token-aware chunker that tokenizes each document once.
+
+    Token offsets come from a single tokenization, and paragraph and sentence
+    ends are mapped onto token positions, so chunks are cut on token offsets
+    without counting anything twice. A chunk ends at the last paragraph break
+    within `max_tokens` if that leaves it at least `paragraph_fill` full,
+    otherwise at the last sentence end, and text with neither is cut at
+    `max_tokens`. When a chunk ends mid-paragraph its last sentences, up to
+    `overlap_tokens`, are repeated at the start of the next; a cut inside a
+    sentence overlaps by `overlap_tokens` tokens.
+
+    `iter_chunks` consumes labelled segments (e.g. PDF pages) as a stream:
+    chunks are cut as soon as more than a chunk's worth of text is buffered,
+    run across segment breaks, and record the labels of the segments they span.
+    """
+
+    def __init__(self, max_tokens: int = 256, overlap_tokens: int = 40, paragraph_fill: float = 0.5,
+                 model: str = "gpt-4o"):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.paragraph_fill = paragraph_fill
+        self.model = model
+
+    @staticmethod
+    def _last_break(breaks: np.ndarray, after: int, limit: int) -> int:
+        """The last break in (after, limit], or -1."""
+        index = int(np.searchsorted(breaks, limit, side="right")) - 1
+        return int(breaks[index]) if index >= 0 and breaks[index] > after else -1
+
+    def _cut(self, buffer: _Buffer, first: int) -> Tuple[int, int]:
+        """
+        Where the chunk starting at token `first` ends, and where the next one starts.
+        """
+        limit = first + self.max_tokens
+        paragraph = self._last_break(buffer.paragraphs, first, limit)
+        if paragraph >= 0 and paragraph - first >= self.max_tokens * self.paragraph_fill:
+            return paragraph, paragraph
+
+        stop = self._last_break(buffer.sentences, first, limit)
+        if stop < 0:
+            # One sentence longer than a chunk
+            return limit, limit - self.overlap_tokens
+        # Repeat the trailing sentences of an unfinished paragraph, never crossing its start
+        floor = max(stop - self.overlap_tokens, self._last_break(buffer.paragraphs, first, stop), first + 1)
+        index = int(np.searchsorted(buffer.sentences, floor))
+        overlap = int(buffer.sentences[index]) if index < len(buffer.sentences) else stop
+        return stop, min(overlap, stop)
+
+    def iter_chunks(self, segments: Iterable[Tuple[Any, str]]) -> Iterator[Chunk]:
+        """
+        Yields chunks over `(label, text)` segments, lazily, in order.
+        """
+        buffer = _Buffer(self.model)
+        first = 0
+        for label, text in segments:
+            if not text:
+                continue
+            buffer.append(label, text)
+            # A cut is final once text past the longest possible chunk is buffered
+            while len(buffer.starts) - first > self.max_tokens:
+                stop, following = self._cut(buffer, first)
+                yield buffer.chunk(first, stop)
+                first = following
+            buffer.drop(first)
+            first = 0
+
+        while first < len(buffer.starts):
+            if len(buffer.starts) - first <= self.max_tokens:
+                chunk = buffer.chunk(first, len(buffer.starts))
+                if chunk.text:
+                    yield chunk
+                return
+            stop, following = self._cut(buffer, first)
+            yield buffer.chunk(first, stop)
+            first = following
+
+    def chunk_text(self, text: str) -> List[Chunk]:
+        return list(self.iter_chunks([(None, text)]))
+
+    def split_text(self, text: str) -> List[str]:
+        return [chunk.text for chunk in self.iter_chunks([(None, text)])]
+
+    def split_many(self, texts: List[str], workers: Optional[int] = None) -> List[List[str]]:
+        """
+        Splits independent documents, across `workers` processes when more than one.
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(texts) < 2:
+            return [self.split_text(text) for text in texts]
+        pool = ParallelChunker(self, workers)
+        try:
+            return pool.split_many(texts)
+        finally:
+            pool.close()
+
+
+class ParallelChunker:
+    """
+    Runs a `TextChunker` in a pool of worker processes.
+
+    Chunking is pure Python and holds the GIL, so documents chunked from
+    several threads (e.g. the scraper's page workers) only run in parallel in
+    separate processes. Workers are spawned, not forked, and start on first use.
+    """
+
+    def __init__(self, chunker: TextChunker, workers: int):
+        self.chunker = chunker
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self.workers = workers
+
+    def split_text(self, text: str) -> List[str]:
+        return self.executor.submit(self.chunker.split_text, text).result()
+
+    def split_many(self, texts: List[str]) -> List[List[str]]:
+        return list(self.executor.map(self.chunker.split_text, texts,
+                                      chunksize=max(1, len(texts) // (self.workers * 4))))
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def default_chunker() -> TextChunker:
+    """
+    Chunker configured by `CHUNK_MAX_TOKENS` and `CHUNK_OVERLAP_TOKENS`.
+    """
+    return TextChunker(
+        max_tokens=int(os.getenv("CHUNK_MAX_TOKENS", "256")),
+        overlap_tokens=int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+    )
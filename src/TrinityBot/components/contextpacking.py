@@ -0,0 +1,139 @@
+import logging
+from typing import Dict, List, Set, Tuple
+
+from TrinityBot.utils.tokens import count_tokens, truncate_tokens
+
+
+def _overlap(left: str, right: str, min_overlap: int, max_overlap: int) -> int:
+    """
+    Length of the longest suffix of `left` that is also a prefix of `right`.
+    """
+    tail = left[-max_overlap:]
+    probe = right[:min_overlap]
+    if len(probe) < min_overlap:
+        return 0
+    index = tail.find(probe)
+    while index != -1:
+        if right.startswith(tail[index:]):
+            return len(tail) - index
+        index = tail.find(probe, index + 1)
+    return 0
+
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    words = text.lower().split()
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+class ContextPacker:
+    """
+    Assembles retrieved chunks into a compact prompt context.
+
+    Chunks from the same source are stitched together when they are adjacent
+    (consecutive positions) or overlap textually, passages that are near-duplicates
+    of a better-ranked passage are dropped, and passages are added in relevance
+    order until `max_tokens` is reached, truncating the last one to fit exactly.
+    """
+
+    def __init__(self, max_tokens: int = 1500, model: str = "gpt-4o",
+                 duplicate_threshold: float = 0.8, min_overlap: int = 20,
+                 max_overlap: int = 400, min_passage_tokens: int = 40):
+        self.max_tokens = max_tokens
+        self.model = model
+        self.duplicate_threshold = duplicate_threshold
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+        self.min_passage_tokens = min_passage_tokens
+        self.logger = logging.getLogger(__name__)
+
+    def _merge_source(self, members: List[Tuple[int, object]]) -> List[Dict]:
+        # members: (relevance rank, point) for one source
+        def order(member):
+            payload = member[1].payload
+            return (payload.get("page") or 0, payload.get("position", member[0]))
+
+        passages = []
+        for rank, point in sorted(members, key=order):
+            payload = point.payload
+            content = payload.get("content", "")
+            if passages:
+                last = passages[-1]
+                # Chunks with a `page_end` are numbered across the whole document,
+                # older PDF chunks restart their positions on every page
+                adjacent = (
+                    payload.get("position") is not None
+                    and last["position"] is not None
+                    and ("page_end" in payload or payload.get("page") == last["page"])
+                    and payload["position"] == last["position"] + 1
+                )
+                overlap = _overlap(last["content"], content, self.min_overlap, self.max_overlap)
+                if overlap or adjacent:
+                    separator = "" if overlap else " "
+                    last["content"] = last["content"] + separator + content[overlap:]
+                    last["position"] = payload.get("position")
+                    last["rank"] = min(last["rank"], rank)
+                    continue
+            passages.append({
+                "content": content,
+                "rank": rank,
+                "page": payload.get("page"),
+                "position": payload.get("position"),
+            })
+        return passages
+
+    def pack(self, documents: list) -> Tuple[str, Dict]:
+        """
+        Returns the packed context and token statistics.
+
+        Args:
+            documents (list): Retrieved points, best first, each with a `payload`.
+        """
+        naive = "\n".join(doc.payload.get("content", "") for doc in documents)
+        naive_tokens = count_tokens(naive, self.model)
+
+        by_source: Dict[str, List[Tuple[int, object]]] = {}
+        for rank, doc in enumerate(documents):
+            by_source.setdefault(doc.payload.get("source", ""), []).append((rank, doc))
+
+        passages = [passage for members in by_source.values() for passage in self._merge_source(members)]
+        passages.sort(key=lambda passage: passage["rank"])
+
+        selected: List[str] = []
+        selected_shingles: List[Set] = []
+        separator_tokens = count_tokens("\n\n", self.model)
+        used = 0
+        dropped = 0
+        for passage in passages:
+            shingles = _shingles(passage["content"])
+            if any(
+                len(shingles & other) / max(1, min(len(shingles), len(other))) >= self.duplicate_threshold
+                for other in selected_shingles
+            ):
+                dropped += 1
+                continue
+
+            remaining = self.max_tokens - used - (separator_tokens if selected else 0)
+            tokens = count_tokens(passage["content"], self.model)
+            if tokens > remaining:
+                if remaining < self.min_passage_tokens:
+                    break
+                passage["content"] = truncate_tokens(passage["content"], remaining, self.model)
+                tokens = count_tokens(passage["content"], self.model)
+            used += tokens + (separator_tokens if selected else 0)
+            selected.append(passage["content"])
+            selected_shingles.append(shingles)
+
+        context = "\n\n".join(selected)
+        stats = {
+            "chunks": len(documents),
+            "passages": len(selected),
+            "duplicates_dropped": dropped,
+            "naive_tokens": naive_tokens,
+            "packed_tokens": count_tokens(context, self.model),
+        }
+        stats["tokens_saved"] = stats["naive_tokens"] - stats["packed_tokens"]
+        self.logger.info(
+            f"Context packed: {stats['naive_tokens']} -> {stats['packed_tokens']} tokens "
+            f"({stats['tokens_saved']} saved, {len(documents)} chunks -> {len(selected)} passages)"
+        )
+        return context, stats
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class CrawlState:
+    """
+    Crawl progress and per-URL revalidation data persisted in SQLite.
+
+    A crawl (identified by its start URL) keeps its frontier and visited set on
+    disk while it runs, so a crashed run resumes where it stopped. Per-URL
+    ETag/Last-Modified, content hashes and outgoing links survive across runs
+    for conditional recrawls, and failed URLs are retried with exponential
+    backoff instead of being dropped for good.
+    """
+
+    def __init__(self, path: Optional[str] = None, retry_base_delay: float = 300.0,
+                 retry_max_delay: float = 86400.0):
+        self.path = path or os.getenv("CRAWL_STATE_PATH", "artifacts/crawl_state.sqlite3")
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " crawl TEXT PRIMARY KEY,"
+            " in_progress INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS frontier ("
+            " crawl TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " depth INTEGER NOT NULL,"
+            " PRIMARY KEY (crawl, url));"
+            "CREATE TABLE IF NOT EXISTS visited ("
+            " crawl TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " PRIMARY KEY (crawl, url));"
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " html_hash TEXT,"
+            " text_hash TEXT,"
+            " links TEXT,"
+            " failures INTEGER NOT NULL DEFAULT 0,"
+            " next_retry_at REAL NOT NULL DEFAULT 0);"
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def begin(self, crawl: str, start_url: str) -> Tuple[List[Tuple[str, int]], Set[str]]:
+        """
+        Starts or resumes a crawl.
+
+        Returns:
+            Tuple: The frontier as (url, depth) pairs and the set of URLs already visited.
+        """
+        conn = self._connection()
+        row = conn.execute("SELECT in_progress FROM runs WHERE crawl = ?", (crawl,)).fetchone()
+        if row and row[0]:
+            frontier = conn.execute(
+                "SELECT url, depth FROM frontier WHERE crawl = ? ORDER BY rowid", (crawl,)
+            ).fetchall()
+            visited = {r[0] for r in conn.execute("SELECT url FROM visited WHERE crawl = ?", (crawl,))}
+            if frontier:
+                return [(url, depth) for url, depth in frontier], visited
+
+        conn.execute("DELETE FROM frontier WHERE crawl = ?", (crawl,))
+        conn.execute("DELETE FROM visited WHERE crawl = ?", (crawl,))
+        conn.execute("INSERT INTO frontier (crawl, url, depth) VALUES (?, ?, 0)", (crawl, start_url))
+        conn.execute("INSERT OR REPLACE INTO runs (crawl, in_progress) VALUES (?, 1)", (crawl,))
+        conn.commit()
+        return [(start_url, 0)], set()
+
+    def enqueue(self, crawl: str, items: Iterable[Tuple[str, int]]):
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR IGNORE INTO frontier (crawl, url, depth) VALUES (?, ?, ?)",
+            [(crawl, url, depth) for url, depth in items],
+        )
+        conn.commit()
+
+    def mark_visited(self, crawl: str, url: str):
+        conn = self._connection()
+        conn.execute("DELETE FROM frontier WHERE crawl = ? AND url = ?", (crawl, url))
+        conn.execute("INSERT OR IGNORE INTO visited (crawl, url) VALUES (?, ?)", (crawl, url))
+        conn.commit()
+
+    def finish(self, crawl: str):
+        conn = self._connection()
+        conn.execute("DELETE FROM frontier WHERE crawl = ?", (crawl,))
+        conn.execute("DELETE FROM visited WHERE crawl = ?", (crawl,))
+        conn.execute("INSERT OR REPLACE INTO runs (crawl, in_progress) VALUES (?, 0)", (crawl,))
+        conn.commit()
+
+    def page(self, url: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT etag, last_modified, html_hash, text_hash, links, failures, next_retry_at"
+            " FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "html_hash": row[2],
+            "text_hash": row[3],
+            "links": json.loads(row[4]) if row[4] else [],
+            "failures": row[5],
+            "next_retry_at": row[6],
+        }
+
+    def record_page(self, url: str, etag: Optional[str], last_modified: Optional[str],
+                    html_hash: str, text_hash: Optional[str], links: List[str]):
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO pages (url, etag, last_modified, html_hash, text_hash, links, failures, next_retry_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, 0, 0)"
+            " ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified,"
+            " html_hash = excluded.html_hash, text_hash = COALESCE(excluded.text_hash, pages.text_hash),"
+            " links = excluded.links, failures = 0, next_retry_at = 0",
+            (url, etag, last_modified, html_hash, text_hash, json.dumps(links)),
+        )
+        conn.commit()
+
+    def invalidate(self, urls: Iterable[str]):
+        """
+        Forgets the validators and content hashes of `urls`, so the next crawl
+        extracts and chunks them again even if they did not change.
+        """
+        conn = self._connection()
+        conn.executemany(
+            "UPDATE pages SET etag = NULL, last_modified = NULL, html_hash = NULL, text_hash = NULL WHERE url = ?",
+            [(url,) for url in urls],
+        )
+        conn.commit()
+
+    def record_failure(self, url: str):
+        conn = self._connection()
+        row = conn.execute("SELECT failures FROM pages WHERE url = ?", (url,)).fetchone()
+        failures = (row[0] if row else 0) + 1
+        delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (failures - 1))
+        conn.execute(
+            "INSERT INTO pages (url, failures, next_retry_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(url) DO UPDATE SET failures = excluded.failures, next_retry_at = excluded.next_retry_at",
+            (url, failures, time.time() + delay),
+        )
+        conn.commit()
+
+    def retry_blocked(self, url: str) -> bool:
+        """
+        True while a previously failed URL is still inside its backoff window.
+        """
+        row = self._connection().execute(
+            "SELECT failures, next_retry_at FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        return bool(row and row[0] and row[1] > time.time())
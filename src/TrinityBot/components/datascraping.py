@@ -1,22 +1,32 @@
-import os
-import json
-from typing import Optional, List, Dict
+import hashlib
+from typing import Optional, List, Dict, AsyncIterator, NamedTuple
+import asyncio
 import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+import httpx
 import time
 import logging
-import uuid
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
+from collections import deque, defaultdict
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
+from TrinityBot.utils.hashing import make_chunk_id, content_hash
+from TrinityBot.utils.metrics import timed
+from TrinityBot.components.chunking import ParallelChunker, TextChunker
+from TrinityBot.components.crawlstate import CrawlState
+from TrinityBot.components.dedup import ContentDeduplicator
+from TrinityBot.components.artifacts import ArtifactWriter, removed_record
+from TrinityBot.components.driverpool import DriverPool, wait_for_stable_dom
+from TrinityBot.components.htmlextraction import ExtractedPage, extract_page
+
+
+class FetchResult(NamedTuple):
+    html: Optional[str]
+    not_modified: bool = False
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # `html` already extracted while fetching (hybrid mode's text-length check)
+    page: Optional[ExtractedPage] = None
 
 
 class SSRScraper:
@@ -26,23 +36,48 @@ class SSRScraper:
                  timeout: int = 30,
                  max_retries: int = 3,
                  concurrent_requests: int = 5,
-                 chunk_size: int = 1000,
-                 chunk_overlap: int = 200):
-        self.use_selenium = use_selenium
+                 chunk_size: int = 256,
+                 chunk_overlap: int = 40,
+                 per_host_concurrency: int = 2,
+                 per_host_delay: float = 0.5,
+                 render_mode: Optional[str] = None,
+                 min_static_text_chars: int = 500,
+                 driver_pool_size: Optional[int] = None,
+                 max_loads_per_driver: int = 50,
+                 dom_settle_timeout: float = 5.0,
+                 html_backend: str = "auto",
+                 chunk_workers: int = 0,
+                 crawl_state: Optional[CrawlState] = None,
+                 artifact_writer: Optional[ArtifactWriter] = None,
+                 deduplicator: Optional[ContentDeduplicator] = None):
+        # render_mode: "static" (requests only), "selenium" (always a browser) or
+        # "hybrid" (requests first, browser only when the static page has too little text)
+        self.render_mode = render_mode or ("selenium" if use_selenium else "static")
+        if self.render_mode not in ("static", "selenium", "hybrid"):
+            raise ValueError(f"Unknown render_mode: {self.render_mode}")
+        self.use_selenium = self.render_mode != "static"
+        self.min_static_text_chars = min_static_text_chars
+        self.dom_settle_timeout = dom_settle_timeout
+        self.html_backend = html_backend
+        self.crawl_state = crawl_state
+        # Strips content repeated across a site; `dedup_stats` holds the last crawl's numbers
+        self.deduplicator = deduplicator
+        self.dedup_stats: Dict = {}
+        # Scraped documents are appended here page by page as they are produced
+        self.artifact_writer = artifact_writer
         self.max_pages = max_pages
         self.timeout = timeout
         self.max_retries = max_retries
         self.concurrent_requests = concurrent_requests
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_delay = per_host_delay
         
-        # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        # chunk_size and chunk_overlap are measured in tokens
+        self.chunker = TextChunker(max_tokens=chunk_size, overlap_tokens=chunk_overlap)
+        # With chunk_workers > 1, pages processed concurrently are chunked in that many processes
+        self.parallel_chunker = ParallelChunker(self.chunker, chunk_workers) if chunk_workers > 1 else None
         
         # Setup logging
         logging.basicConfig(
@@ -69,14 +104,19 @@ class SSRScraper:
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
         
-        if use_selenium:
-            self._setup_selenium()
+        self.driver_pool = None
+        if self.use_selenium:
+            self.driver_pool = DriverPool(
+                factory=self._create_driver,
+                size=driver_pool_size or concurrent_requests,
+                max_loads=max_loads_per_driver
+            )
 
-        # Ensure artifacts directory exists
-        self.artifacts_dir = "artifacts"
-        os.makedirs(self.artifacts_dir, exist_ok=True)
+    def _create_driver(self):
+        # Selenium is only needed for browser rendering; importing it lazily keeps static crawls light
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
 
-    def _setup_selenium(self):
         chrome_options = Options()
         chrome_options.add_argument('--headless')
         chrome_options.add_argument('--no-sandbox')
@@ -84,17 +124,18 @@ class SSRScraper:
         chrome_options.add_argument('--disable-gpu')
         chrome_options.add_argument(f'user-agent={self.headers["User-Agent"]}')
         
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver.set_page_load_timeout(self.timeout)
+        driver = webdriver.Chrome(options=chrome_options)
+        driver.set_page_load_timeout(self.timeout)
+        return driver
 
     def _get_with_selenium(self, url: str) -> Optional[str]:
+        from selenium.common.exceptions import TimeoutException
+
         try:
-            self.driver.get(url)
-            WebDriverWait(self.driver, self.timeout).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-            time.sleep(2)
-            return self.driver.page_source
+            with self.driver_pool.acquire() as driver:
+                driver.get(url)
+                wait_for_stable_dom(driver, self.dom_settle_timeout)
+                return driver.page_source
         except TimeoutException:
             self.logger.error(f"Selenium timeout on URL: {url}")
             return None
@@ -102,119 +143,218 @@ class SSRScraper:
             self.logger.error(f"Selenium error on URL {url}: {str(e)}")
             return None
 
-    def _get_with_requests(self, url: str) -> Optional[str]:
+    def _request_headers(self, url: str) -> Dict:
+        headers = dict(self.headers)
+        page = self.crawl_state.page(url) if self.crawl_state else None
+        if page and page["html_hash"]:
+            if page["etag"]:
+                headers["If-None-Match"] = page["etag"]
+            if page["last_modified"]:
+                headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def _get_with_requests(self, url: str) -> FetchResult:
         try:
-            response = self.session.get(url, headers=self.headers, timeout=self.timeout)
+            response = self.session.get(url, headers=self._request_headers(url), timeout=self.timeout)
+            if response.status_code == 304:
+                return FetchResult(None, not_modified=True)
             response.raise_for_status()
-            return response.text
+            return FetchResult(
+                response.text,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Request error on URL {url}: {str(e)}")
+            return FetchResult(None)
+
+    def _static_page(self, html: Optional[str], url: str) -> Optional[ExtractedPage]:
+        """
+        The extracted static page, or None when it has too little text and needs a browser.
+        """
+        if not html:
             return None
+        page = self._extract_page(html, url)
+        return page if len(page.text) >= self.min_static_text_chars else None
 
-    def _extract_text(self, html: str) -> str:
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        for element in soup(["script", "style", "nav", "footer", "header"]):
-            element.decompose()
-        
-        text = soup.get_text(separator=' ')
-        text = ' '.join(text.split())
-        return text
+    @timed("scraper.fetch")
+    def _fetch(self, url: str) -> FetchResult:
+        if self.render_mode == "selenium":
+            return FetchResult(self._get_with_selenium(url))
+        result = self._get_with_requests(url)
+        if result.not_modified or self.render_mode != "hybrid":
+            return result
+        page = self._static_page(result.html, url)
+        if page is None:
+            self.logger.info(f"Static HTML too thin, rendering with browser: {url}")
+            return result._replace(html=self._get_with_selenium(url))
+        return result._replace(page=page)
 
-    def _extract_links(self, html: str, base_url: str) -> List[str]:
-        soup = BeautifulSoup(html, 'html.parser')
-        base_domain = urlparse(base_url).netloc
-        
-        links = []
-        for link in soup.find_all('a', href=True):
-            url = urljoin(base_url, link['href'])
-            if urlparse(url).netloc == base_domain:
-                links.append(url)
-        
-        return list(set(links))
-    
+    @timed("scraper.extract")
+    def _extract_page(self, html: str, url: str):
+        return extract_page(html, url, backend=self.html_backend)
 
     def _create_langchain_documents(self, text: str, url: str, token: str) -> List[Document]:
         timestamp = datetime.now().isoformat()
         
         # Split text into chunks
-        texts = self.text_splitter.split_text(text)
+        texts = (self.parallel_chunker or self.chunker).split_text(text)
+        keep = [True] * len(texts)
+        if self.deduplicator:
+            keep = self.deduplicator.filter_chunks(urlparse(url).netloc, url, texts)
         
-        # Create documents with metadata
-        if "trakx" in url:
-            token = "trakx"
-        elif "bidnow" in url:
-            token = "bidnow"
-        else:
-            token = "unknown"  # Optional: handle cases where no match is found
+        # Create documents with metadata; infer the token from the URL when not given
+        if not token:
+            if "trakx" in url:
+                token = "trakx"
+            elif "bidnow" in url:
+                token = "bidnow"
+            else:
+                token = "unknown"  # Optional: handle cases where no match is found
 
 
         documents = [
             Document(
                 page_content=chunk,
                 metadata={ 
-                    '_id': str(uuid.uuid4()), 
+                    '_id': make_chunk_id(url, position, chunk), 
                     "source": url, 
                     "timestamp": timestamp,
-                    "token": token
+                    "token": token,
+                    "position": position
                 }
             )
-            for chunk in texts
+            for position, chunk in enumerate(texts)
+            if keep[position]
         ]
         
         return documents
 
 
     def _save_documents(self, documents: List[Document], url: str):
-        filename = os.path.join(self.artifacts_dir, f"{uuid.uuid4()}.json")
-        
-        with open(filename, 'w', encoding='utf-8') as file:
-            json.dump([doc.dict() for doc in documents], file, ensure_ascii=False, indent=4)
+        if not self.artifact_writer:
+            return
+        self.artifact_writer.write([
+            {"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents
+        ])
+        self.logger.info(f"Saved {len(documents)} documents from {url} to {self.artifact_writer.filename}")
 
-        self.logger.info(f"Saved {len(documents)} documents to {filename}")
+    def _save_removed(self, url: str, token: str):
+        if self.artifact_writer:
+            self.artifact_writer.write([removed_record(url, token)])
 
 
+    def _process_page(self, fetched: FetchResult, url: str, token: str) -> Dict:
+        """
+        Turns a fetched page into documents, skipping pages whose content did not change.
+
+        With a crawl state, a 304 answer or an unchanged HTML/text hash returns no
+        documents and `unchanged=True`; links are still returned so the crawl can
+        continue through unchanged pages. A page the deduplicator leaves without
+        content of its own returns `removed=True`, and a removal record is saved
+        so its previously stored chunks get deleted.
+        """
+        previous = self.crawl_state.page(url) if self.crawl_state else None
+        if fetched.not_modified and previous:
+            return {'documents': [], 'links': previous['links'], 'unchanged': True}
+
+        html_hash = hashlib.sha256(fetched.html.encode("utf-8")).hexdigest()
+        if previous and previous['html_hash'] == html_hash:
+            self.crawl_state.record_page(url, fetched.etag, fetched.last_modified, html_hash, None, previous['links'])
+            return {'documents': [], 'links': previous['links'], 'unchanged': True}
+
+        text_content, links = fetched.page or self._extract_page(fetched.html, url)
+        text_hash = content_hash(text_content)
+        if previous and previous['text_hash'] == text_hash:
+            self.crawl_state.record_page(url, fetched.etag, fetched.last_modified, html_hash, text_hash, links)
+            return {'documents': [], 'links': links, 'unchanged': True}
+
+        if self.deduplicator:
+            text_content = self.deduplicator.filter_page(urlparse(url).netloc, url, text_content)
+            if text_content is None:
+                self.logger.info(f"Skipping {url}: nothing left after removing content repeated across the site")
+                self._save_removed(url, token)
+                self._invalidate_orphaned(url)
+                if self.crawl_state:
+                    self.crawl_state.record_page(url, fetched.etag, fetched.last_modified, html_hash, text_hash, links)
+                return {'documents': [], 'links': links, 'unchanged': False, 'removed': True}
+
+        documents = self._create_langchain_documents(text_content, url, token)
+        # Every chunk repeats another page's: chunks stored for this page earlier must go
+        removed = bool(self.deduplicator and text_content.strip() and not documents)
+        if removed:
+            self._save_removed(url, token)
+        else:
+            self._save_documents(documents, url)
+        if self.deduplicator:
+            self._invalidate_orphaned(url)
+        if self.crawl_state:
+            self.crawl_state.record_page(url, fetched.etag, fetched.last_modified, html_hash, text_hash, links)
+        return {'documents': documents, 'links': links, 'unchanged': False, 'removed': removed}
+
+    def _invalidate_orphaned(self, url: str):
+        # Pages that lost content to a fingerprint this page just released must claim it again
+        orphaned = self.deduplicator.take_orphaned(urlparse(url).netloc)
+        if orphaned and self.crawl_state:
+            self.logger.info(f"Re-processing {len(orphaned)} pages whose repeated content {url} no longer holds")
+            self.crawl_state.invalidate(orphaned)
+
+    def _begin_dedup(self, start_url: str):
+        if self.deduplicator:
+            self.deduplicator.reset_stats(urlparse(start_url).netloc)
+
+    def _finish_dedup(self, start_url: str):
+        if self.deduplicator:
+            self.dedup_stats = self.deduplicator.stats(urlparse(start_url).netloc)
+            self.logger.info(f"Deduplication for {start_url}: {self.dedup_stats}")
+
+    def _mark_failed(self, url: str):
+        self.failed_urls.add(url)
+        if self.crawl_state:
+            self.crawl_state.record_failure(url)
+
     def scrape_url(self, url: str, depth: int = 0, token: str = "") -> Dict:
         if url in self.visited_urls or url in self.failed_urls:
             return {}
+
+        if self.crawl_state and self.crawl_state.retry_blocked(url):
+            self.failed_urls.add(url)
+            return {}
         
         self.visited_urls.add(url)
         
         for attempt in range(self.max_retries):
             try:
-                html = (self._get_with_selenium(url) if self.use_selenium 
-                    else self._get_with_requests(url))
+                fetched = self._fetch(url)
                 
-                if not html:
+                if not fetched.html and not fetched.not_modified:
                     continue
                 
-                text_content = self._extract_text(html)
-                links = self._extract_links(html, url)
-                documents = self._create_langchain_documents(text_content, url, token)
+                result = self._process_page(fetched, url, token)
 
-                for doc in documents:
+                for doc in result['documents']:
                     print(f"Extracted Document: {doc.page_content}\n")
-                self._save_documents(documents, url)
                 
-                return {
-                    'documents': documents,
-                    'links': links,
-                    'depth': depth
-                }
+                result['depth'] = depth
+                return result
                 
             except Exception as e:
                 self.logger.error(f"Attempt {attempt + 1} failed for URL {url}: {str(e)}")
                 time.sleep(1)
         
-        self.failed_urls.add(url)
+        self._mark_failed(url)
         return {}
 
 
     def scrape_site(self, start_url: str, max_depth: int = 2) -> List[Document]:
         self.logger.info(f"Starting scrape of {start_url}")
+        self._begin_dedup(start_url)
         
         all_documents = []
         to_scrape = [(start_url, 0)]  
+        if self.crawl_state:
+            to_scrape, visited = self.crawl_state.begin(start_url, start_url)
+            self.visited_urls.update(visited)
         
         with ThreadPoolExecutor(max_workers=self.concurrent_requests) as executor:
             while to_scrape and len(self.visited_urls) < self.max_pages:
@@ -237,6 +377,8 @@ class SSRScraper:
                     url, depth = future_to_url[future]
                     try:
                         result = future.result()
+                        if self.crawl_state:
+                            self.crawl_state.mark_visited(start_url, url)
                         
                         if result and 'documents' in result and 'links' in result:
                             all_documents.extend(result['documents'])
@@ -247,6 +389,8 @@ class SSRScraper:
                                     if link not in self.visited_urls and link not in self.failed_urls
                                 ]
                                 to_scrape.extend(new_urls)
+                                if self.crawl_state:
+                                    self.crawl_state.enqueue(start_url, new_urls)
                         else:
                             self.logger.warning(f"Unexpected result format from {url}: {result}")
                     
@@ -255,13 +399,165 @@ class SSRScraper:
                         self.failed_urls.add(url) 
             
             self.logger.info(f"Scraping completed. Processed {len(self.visited_urls)} URLs")
+        self._finish_dedup(start_url)
+
+        if self.crawl_state:
+            self.crawl_state.finish(start_url)
         
         return all_documents
 
 
-    def cleanup(self):
-        if self.use_selenium:
+    @timed("scraper.fetch")
+    async def _fetch_async(self, client: httpx.AsyncClient, url: str) -> FetchResult:
+        if self.render_mode == "selenium":
+            return FetchResult(await asyncio.to_thread(self._get_with_selenium, url))
+        try:
+            response = await client.get(url, headers=self._request_headers(url))
+            if response.status_code == 304:
+                return FetchResult(None, not_modified=True)
+            response.raise_for_status()
+            result = FetchResult(
+                response.text,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
+        except httpx.HTTPError as e:
+            self.logger.error(f"Request error on URL {url}: {str(e)}")
+            result = FetchResult(None)
+        if self.render_mode != "hybrid":
+            return result
+        page = await asyncio.to_thread(self._static_page, result.html, url)
+        if page is None:
+            self.logger.info(f"Static HTML too thin, rendering with browser: {url}")
+            return result._replace(html=await asyncio.to_thread(self._get_with_selenium, url))
+        return result._replace(page=page)
+
+    async def _scrape_url_async(self, client: httpx.AsyncClient, url: str, depth: int, token: str,
+                                global_limit: asyncio.Semaphore, host_limits: Dict,
+                                host_next_slot: Dict, host_locks: Dict) -> Dict:
+        host = urlparse(url).netloc
+        if self.crawl_state and self.crawl_state.retry_blocked(url):
+            self.failed_urls.add(url)
+            return {'url': url, 'depth': depth}
+
+        async with global_limit, host_limits[host]:
+            for attempt in range(self.max_retries):
+                # Space out request starts on the same host by per_host_delay
+                async with host_locks[host]:
+                    loop = asyncio.get_running_loop()
+                    wait = host_next_slot[host] - loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    host_next_slot[host] = loop.time() + self.per_host_delay
+
+                try:
+                    fetched = await self._fetch_async(client, url)
+                    if not fetched.html and not fetched.not_modified:
+                        await asyncio.sleep(1)
+                        continue
+
+                    result = await asyncio.to_thread(self._process_page, fetched, url, token)
+                    result['url'] = url
+                    result['depth'] = depth
+                    return result
+                except Exception as e:
+                    self.logger.error(f"Attempt {attempt + 1} failed for URL {url}: {str(e)}")
+                    await asyncio.sleep(1)
+
+        self._mark_failed(url)
+        return {'url': url, 'depth': depth}
+
+    async def crawl_site_async(self, start_url: str, max_depth: int = 2, token: str = "") -> AsyncIterator[Dict]:
+        """
+        Crawls `start_url` with asyncio and yields each page's result as soon as it is processed.
+
+        The frontier is a FIFO deque deduplicated at enqueue time. At most
+        `concurrent_requests` pages are fetched at once, at most
+        `per_host_concurrency` per host, and request starts on one host are spaced
+        by `per_host_delay` seconds. `max_pages` and `max_depth` mean the same as in
+        `scrape_site`.
+
+        Yields:
+            Dict: `url`, `depth` and, for successful pages, `documents` and `links`.
+        """
+        self.logger.info(f"Starting async scrape of {start_url}")
+        self._begin_dedup(start_url)
+        start = time.perf_counter()
+
+        frontier = deque([(start_url, 0)])
+        if self.crawl_state:
+            resumed, visited = self.crawl_state.begin(start_url, start_url)
+            frontier = deque(resumed)
+            self.visited_urls.update(visited)
+        seen = {url for url, _ in frontier} | self.visited_urls | self.failed_urls
+        global_limit = asyncio.Semaphore(self.concurrent_requests)
+        host_limits = defaultdict(lambda: asyncio.Semaphore(self.per_host_concurrency))
+        host_locks = defaultdict(asyncio.Lock)
+        host_next_slot = defaultdict(float)
+        in_flight = set()
+        processed = 0
+
+        async with httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.concurrent_requests * 2),
+        ) as client:
             try:
-                self.driver.quit()
-            except Exception as e:
-                self.logger.error(f"Error closing Selenium driver: {str(e)}")
\ No newline at end of file
+                while frontier or in_flight:
+                    while frontier and len(in_flight) < self.concurrent_requests and len(self.visited_urls) < self.max_pages:
+                        url, depth = frontier.popleft()
+                        self.visited_urls.add(url)
+                        in_flight.add(asyncio.create_task(self._scrape_url_async(
+                            client, url, depth, token, global_limit, host_limits, host_next_slot, host_locks
+                        )))
+
+                    if not in_flight:
+                        break
+
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        try:
+                            result = task.result()
+                        except Exception as e:
+                            self.logger.error(f"Error processing page: {str(e)}")
+                            continue
+
+                        processed += 1
+                        new_urls = []
+                        if 'links' in result and result['depth'] < max_depth:
+                            for link in result['links']:
+                                if link not in seen:
+                                    seen.add(link)
+                                    new_urls.append((link, result['depth'] + 1))
+                            frontier.extend(new_urls)
+                        if self.crawl_state:
+                            self.crawl_state.enqueue(start_url, new_urls)
+                            self.crawl_state.mark_visited(start_url, result['url'])
+                        yield result
+
+                if self.crawl_state:
+                    self.crawl_state.finish(start_url)
+            finally:
+                # Consumer stopped early; do not leave fetches running in the background
+                for task in in_flight:
+                    task.cancel()
+
+        elapsed = time.perf_counter() - start
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        self.logger.info(
+            f"Async scraping completed. Processed {processed} URLs in {elapsed:.2f}s ({rate:.2f} pages/sec)"
+        )
+        self._finish_dedup(start_url)
+
+    async def scrape_site_async(self, start_url: str, max_depth: int = 2) -> List[Document]:
+        all_documents = []
+        async for result in self.crawl_site_async(start_url, max_depth):
+            all_documents.extend(result.get('documents', []))
+        return all_documents
+
+    def cleanup(self):
+        if self.driver_pool:
+            self.driver_pool.close()
+        if self.parallel_chunker:
+            self.parallel_chunker.close()
\ No newline at end of file
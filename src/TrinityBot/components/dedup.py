@@ -0,0 +1,298 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# 64-bit fingerprints in four 16-bit bands: two fingerprints within 3 bits of each
+# other agree exactly on at least one band, so near-duplicate lookup is a dict probe
+_BANDS = 4
+_BAND_BITS = 16
+
+PAGE = "page"
+BLOCK = "block"
+CHUNK = "chunk"
+
+
+def _hash64(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+
+def exact_fingerprint(text: str) -> int:
+    """64-bit hash of the lowercased, whitespace-normalized text."""
+    return int.from_bytes(_hash64(" ".join(text.lower().split()).encode("utf-8")), "big")
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    64-bit SimHash over word shingles; similar texts differ in few bits.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= shingle_size:
+        features = {" ".join(words)}
+    else:
+        features = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    digests = np.frombuffer(b"".join(_hash64(feature.encode("utf-8")) for feature in features), dtype=np.uint8)
+    bits = np.unpackbits(digests.reshape(-1, 8), axis=1)
+    majority = (bits.sum(axis=0) * 2 > len(features)).astype(np.uint8)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _to_sql(fingerprint: int) -> int:
+    # SQLite integers are signed 64-bit
+    return fingerprint - (1 << 64) if fingerprint >= (1 << 63) else fingerprint
+
+
+def _from_sql(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class _FingerprintIndex:
+    """In-memory fingerprint -> owner map with banded lookup for near matches."""
+
+    def __init__(self):
+        self.owners: Dict[int, str] = {}
+        self.bands: List[Dict[int, Set[int]]] = [{} for _ in range(_BANDS)]
+
+    @staticmethod
+    def _keys(fingerprint: int) -> Iterable[Tuple[int, int]]:
+        mask = (1 << _BAND_BITS) - 1
+        for band in range(_BANDS):
+            yield band, (fingerprint >> (band * _BAND_BITS)) & mask
+
+    def add(self, fingerprint: int, owner: str):
+        self.owners[fingerprint] = owner
+        for band, key in self._keys(fingerprint):
+            self.bands[band].setdefault(key, set()).add(fingerprint)
+
+    def remove(self, fingerprint: int):
+        if self.owners.pop(fingerprint, None) is None:
+            return
+        for band, key in self._keys(fingerprint):
+            members = self.bands[band].get(key)
+            if members:
+                members.discard(fingerprint)
+
+    def find(self, fingerprint: int, max_distance: int) -> Optional[Tuple[int, str]]:
+        owner = self.owners.get(fingerprint)
+        if owner is not None or max_distance == 0:
+            return (fingerprint, owner) if owner is not None else None
+        for band, key in self._keys(fingerprint):
+            for candidate in self.bands[band].get(key, ()):
+                if hamming(candidate, fingerprint) <= max_distance:
+                    return candidate, self.owners[candidate]
+        return None
+
+
+class ContentDeduplicator:
+    """
+    Suppresses repeated content within a site before it is chunked and embedded.
+
+    Every page, text block and chunk gets a 64-bit fingerprint (SimHash, or an
+    exact hash for blocks shorter than `min_simhash_words`, where a few changed
+    words such as a price would look near-identical). The first URL of a site
+    to produce a fingerprint owns it; on any other URL of that site an owned
+    block (hero text, cookie banner, menu) is cut out, a page whose remaining
+    text is within `max_distance` bits of an owned page is dropped, and an
+    owned chunk is skipped. Owners keep their content, so repeated text is
+    stored exactly once.
+
+    Ownership is persisted in SQLite so later crawls recognize boilerplate from
+    the first page on. When an owner page is re-processed, fingerprints it no
+    longer produces are released for other pages to claim. The pages that had
+    content cut because of a released fingerprint are collected, so the caller
+    can have them re-processed (see `take_orphaned`).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_distance: int = 3, min_simhash_words: int = 16):
+        if max_distance >= _BANDS:
+            raise ValueError(f"max_distance must be below {_BANDS} for banded lookup")
+        self.path = path or os.getenv("DEDUP_STATE_PATH", "artifacts/dedup.sqlite3")
+        self.max_distance = max_distance
+        self.min_simhash_words = min_simhash_words
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._indexes: Dict[Tuple[str, str], _FingerprintIndex] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._orphaned: Dict[str, Set[str]] = {}
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " site TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " fingerprint INTEGER NOT NULL,"
+            " owner TEXT NOT NULL,"
+            " PRIMARY KEY (site, kind, fingerprint))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fingerprints_owner ON fingerprints(site, kind, owner)")
+        # Which pages had content cut because another page owns its fingerprint
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS suppressed ("
+            " site TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " fingerprint INTEGER NOT NULL,"
+            " url TEXT NOT NULL,"
+            " PRIMARY KEY (site, kind, fingerprint, url))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_suppressed_url ON suppressed(site, kind, url)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _index(self, site: str, kind: str) -> _FingerprintIndex:
+        index = self._indexes.get((site, kind))
+        if index is None:
+            index = self._indexes[(site, kind)] = _FingerprintIndex()
+            rows = self._connection().execute(
+                "SELECT fingerprint, owner FROM fingerprints WHERE site = ? AND kind = ?", (site, kind)
+            )
+            for fingerprint, owner in rows:
+                index.add(_from_sql(fingerprint), owner)
+        return index
+
+    def _count(self, site: str, **increments):
+        stats = self._stats.setdefault(site, {
+            "pages": 0, "pages_dropped": 0, "blocks": 0, "blocks_removed": 0,
+            "chars": 0, "chars_removed": 0, "chunks": 0, "chunks_dropped": 0,
+        })
+        for key, value in increments.items():
+            stats[key] += value
+
+    def _claim(self, site: str, kind: str, url: str, fingerprints: List[Tuple[int, int]]) -> List[bool]:
+        """
+        Returns, per (fingerprint, max_distance), whether `url` may keep that content.
+
+        Unowned fingerprints are claimed for `url`; ones `url` owned but no longer
+        produces are released, and the pages they suppressed become orphaned.
+        Must be called with the lock held.
+        """
+        index = self._index(site, kind)
+        conn = self._connection()
+        keep, claimed, current, suppressed = [], [], set(), []
+        for fingerprint, max_distance in fingerprints:
+            match = index.find(fingerprint, max_distance)
+            if match is None:
+                index.add(fingerprint, url)
+                claimed.append((site, kind, _to_sql(fingerprint), url))
+                current.add(fingerprint)
+                keep.append(True)
+            elif match[1] == url and match[0] not in current:
+                current.add(match[0])
+                keep.append(True)
+            else:
+                # Owned by another page, or repeated within this page
+                keep.append(False)
+                if match[1] != url:
+                    suppressed.append((site, kind, _to_sql(match[0]), url))
+
+        stale = [
+            _from_sql(row[0]) for row in conn.execute(
+                "SELECT fingerprint FROM fingerprints WHERE site = ? AND kind = ? AND owner = ?", (site, kind, url)
+            )
+        ]
+        stale = [fingerprint for fingerprint in stale if fingerprint not in current]
+        for fingerprint in stale:
+            index.remove(fingerprint)
+        conn.executemany(
+            "DELETE FROM fingerprints WHERE site = ? AND kind = ? AND fingerprint = ?",
+            [(site, kind, _to_sql(fingerprint)) for fingerprint in stale],
+        )
+        conn.executemany("INSERT OR REPLACE INTO fingerprints (site, kind, fingerprint, owner) VALUES (?, ?, ?, ?)",
+                         claimed)
+
+        released = [(site, kind, _to_sql(fingerprint)) for fingerprint in stale]
+        orphaned = self._orphaned.setdefault(site, set())
+        for key in released:
+            orphaned.update(row[0] for row in conn.execute(
+                "SELECT url FROM suppressed WHERE site = ? AND kind = ? AND fingerprint = ?", key
+            ))
+        conn.executemany("DELETE FROM suppressed WHERE site = ? AND kind = ? AND fingerprint = ?", released)
+        if fingerprints:
+            # An empty call only gives up ownership (a dropped page); what it lost to others still counts
+            conn.execute("DELETE FROM suppressed WHERE site = ? AND kind = ? AND url = ?", (site, kind, url))
+            conn.executemany("INSERT OR IGNORE INTO suppressed (site, kind, fingerprint, url) VALUES (?, ?, ?, ?)",
+                             suppressed)
+        conn.commit()
+        return keep
+
+    def _block_fingerprint(self, block: str) -> Tuple[int, int]:
+        if len(_WORD_RE.findall(block)) < self.min_simhash_words:
+            return exact_fingerprint(block), 0
+        return simhash(block), self.max_distance
+
+    def filter_page(self, site: str, url: str, text: str) -> Optional[str]:
+        """
+        Returns `text` without blocks owned by other pages, or None when nothing of its own is left.
+
+        Blocks are the paragraphs of extracted text (separated by blank lines).
+        The page fingerprint is taken after shared blocks are removed, so pages
+        that differ only by a little text inside heavy boilerplate are still
+        told apart, while mirrors of a page (same content, different URL) are
+        dropped.
+        """
+        with self._lock:
+            blocks = [block for block in text.split("\n\n") if block.strip()]
+            keep = self._claim(site, BLOCK, url, [self._block_fingerprint(block) for block in blocks])
+            kept = "\n\n".join(block for block, keep_block in zip(blocks, keep) if keep_block)
+            self._count(site, pages=1, chars=len(text), blocks=len(blocks), blocks_removed=keep.count(False))
+
+            if not kept or not self._claim(site, PAGE, url, [(simhash(kept), self.max_distance)])[0]:
+                # Nothing unique on the page; give up whatever it held before
+                self._claim(site, BLOCK, url, [])
+                self._claim(site, PAGE, url, [])
+                self._claim(site, CHUNK, url, [])
+                self._count(site, pages_dropped=1, chars_removed=len(text))
+                return None
+            self._count(site, chars_removed=len(text) - len(kept))
+            return kept
+
+    def filter_chunks(self, site: str, url: str, chunks: List[str]) -> List[bool]:
+        """
+        Returns, per chunk, whether to keep it: False when another page of the site owns a near-duplicate.
+        """
+        with self._lock:
+            keep = self._claim(site, CHUNK, url, [(simhash(chunk), self.max_distance) for chunk in chunks])
+            self._count(site, chunks=len(chunks), chunks_dropped=keep.count(False))
+            return keep
+
+    def take_orphaned(self, site: str) -> Set[str]:
+        """
+        Pages of `site` that had content cut for a fingerprint whose owner has since
+        released it, collected since the last call. They must be re-processed to
+        claim that content, even if they did not change.
+        """
+        with self._lock:
+            return self._orphaned.pop(site, set())
+
+    def reset_stats(self, site: str):
+        with self._lock:
+            self._stats.pop(site, None)
+
+    def stats(self, site: str) -> Dict:
+        with self._lock:
+            stats = dict(self._stats.get(site, {}))
+        if stats:
+            stats["chars_removed_ratio"] = round(stats["chars_removed"] / stats["chars"], 4) if stats["chars"] else 0.0
+            stats["chunks_dropped_ratio"] = \
+                round(stats["chunks_dropped"] / stats["chunks"], 4) if stats["chunks"] else 0.0
+        return stats
@@ -0,0 +1,108 @@
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable
+
+
+class DriverPool:
+    """
+    Bounded pool of Selenium WebDriver instances shared by scraper workers.
+
+    Drivers are created lazily up to `size`, handed to one worker at a time, and
+    quit and replaced after `max_loads` page loads to keep browser memory in check.
+    """
+
+    def __init__(self, factory: Callable, size: int = 3, max_loads: int = 50):
+        self.factory = factory
+        self.size = size
+        self.max_loads = max_loads
+        self._idle = deque()
+        self._created = 0
+        self._loads = {}
+        # Signalled whenever a driver is returned or a slot frees up after a quit
+        self._available = threading.Condition()
+        self.logger = logging.getLogger(__name__)
+
+    def _take(self):
+        with self._available:
+            while not self._idle and self._created >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.popleft()
+            self._created += 1
+
+        try:
+            driver = self.factory()
+        except Exception:
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+        self._loads[id(driver)] = 0
+        return driver
+
+    def _quit(self, driver):
+        self._loads.pop(id(driver), None)
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+        try:
+            driver.quit()
+        except Exception as e:
+            self.logger.error(f"Error closing Selenium driver: {str(e)}")
+
+    def _release(self, driver):
+        with self._available:
+            self._idle.append(driver)
+            self._available.notify()
+
+    @contextmanager
+    def acquire(self):
+        driver = self._take()
+        healthy = True
+        try:
+            yield driver
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            self._loads[id(driver)] = self._loads.get(id(driver), 0) + 1
+            if not healthy or self._loads[id(driver)] >= self.max_loads:
+                self._quit(driver)
+            else:
+                self._release(driver)
+
+    def close(self):
+        while True:
+            with self._available:
+                if not self._idle:
+                    break
+                driver = self._idle.popleft()
+            self._quit(driver)
+
+
+def wait_for_stable_dom(driver, timeout: float, poll_interval: float = 0.25, stable_polls: int = 2):
+    """
+    Waits until the document has loaded and its body size stops changing.
+
+    Returns as soon as `stable_polls` consecutive polls see the same size, instead
+    of sleeping a fixed amount after every load.
+    """
+    deadline = time.monotonic() + timeout
+    last_size = None
+    unchanged = 0
+    while time.monotonic() < deadline:
+        ready, size = driver.execute_script(
+            "return [document.readyState, document.body ? document.body.innerHTML.length : 0];"
+        )
+        if ready == "complete" and size == last_size and size > 0:
+            unchanged += 1
+            if unchanged >= stable_polls:
+                return True
+        else:
+            unchanged = 0
+        last_size = size
+        time.sleep(poll_interval)
+    return False
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from TrinityBot.components.embeddingcache import EmbeddingCache
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batched calls.
+
+    The first request to arrive opens a window of `max_wait_ms`; everything that
+    arrives before it closes, or until `max_batch_size` distinct texts are queued,
+    is sent as one `embed_fn` call and each caller gets its own vector back.
+    Requests for a text that is already queued or in flight share that result
+    instead of being embedded twice. Each upstream call is bounded by
+    `timeout`; a failed or timed-out batch is forgotten at once, so later
+    requests for the same text start a fresh call instead of joining a dead
+    one. Must be used from a single event loop.
+    """
+
+    def __init__(self,
+                 embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]],
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 2.0,
+                 timeout: float = 30.0):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.requests = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.texts_sent = 0
+        self.logger = logging.getLogger(__name__)
+
+    async def embed(self, text: str) -> List[float]:
+        key = EmbeddingCache.normalize(text)
+        self.requests += 1
+        future = self._pending.get(key) or self._in_flight.get(key)
+        if future is not None:
+            self.deduplicated += 1
+            # Shield so one caller timing out does not cancel the shared result for the others
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = future
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await asyncio.shield(future)
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._in_flight.update(batch)
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        # Keep a reference so the task is not garbage-collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[str, asyncio.Future]):
+        texts = list(batch)
+        self.batches += 1
+        self.texts_sent += len(texts)
+        error = None
+        try:
+            vectors = await asyncio.wait_for(self.embed_fn(texts), self.timeout)
+        except asyncio.TimeoutError:
+            error = asyncio.TimeoutError(f"Batched embedding timed out after {self.timeout}s")
+        except Exception as e:
+            error = e
+        finally:
+            # Forget the keys before resolving the waiters so a retry starts a fresh call
+            self._forget(batch)
+
+        if error is not None:
+            self.logger.warning(f"Batched embedding of {len(texts)} queries failed: {str(error)}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for text, vector in zip(texts, vectors):
+            if not batch[text].done():
+                batch[text].set_result(vector)
+
+    def _forget(self, batch: Dict[str, asyncio.Future]):
+        for text, future in batch.items():
+            if self._in_flight.get(text) is future:
+                del self._in_flight[text]
+
+    def stats(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "deduplicated": self.deduplicated,
+            "batches": self.batches,
+            "texts_sent": self.texts_sent,
+            "average_batch_size": round(self.texts_sent / self.batches, 2) if self.batches else 0.0,
+            "calls_saved": self.requests - self.batches,
+        }
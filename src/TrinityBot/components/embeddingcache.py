@@ -0,0 +1,214 @@
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from typing import List, Optional, Callable, Dict, Awaitable
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model, normalized-text hash).
+
+    Vectors are stored as packed float32 blobs in SQLite running in WAL mode, so
+    several uvicorn workers and pipeline processes can share one file. Lookups
+    are read-only: access times are buffered in memory and written in batches of
+    `touch_batch` (or every `touch_interval` seconds) with a short busy timeout,
+    dropped rather than waited for when another writer holds the lock. Entries
+    are evicted least-recently-used once this process has seen the cache grow
+    `evict_slack` past `max_entries`, not on every write.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 200_000, touch_batch: int = 512,
+                 touch_interval: float = 30.0, touch_timeout: float = 0.05, evict_slack: float = 0.1):
+        self.path = path or os.getenv("EMBEDDING_CACHE_PATH", "artifacts/embedding_cache.sqlite3")
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self.touch_timeout = touch_timeout
+        self.evict_slack = evict_slack
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._last_touch_flush = time.monotonic()
+        self.logger = logging.getLogger(__name__)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        conn.commit()
+        # Upper bound on the row count as seen from this process, refreshed on eviction
+        self._entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _touch_connection(self) -> sqlite3.Connection:
+        # Separate connection with a short busy timeout: access times are not worth waiting for
+        conn = getattr(self._local, "touch_conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.touch_timeout)
+            self._local.touch_conn = conn
+        return conn
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    @classmethod
+    def make_key(cls, model: str, text: str) -> str:
+        digest = hashlib.sha256(cls.normalize(text).encode("utf-8")).hexdigest()
+        return f"{model}:{digest}"
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        keys = [self.make_key(model, text) for text in texts]
+        conn = self._connection()
+        found: Dict[str, List[float]] = {}
+
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+
+        results = [found.get(key) for key in keys]
+        with self._lock:
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        if found:
+            self._touch(found)
+        return results
+
+    def _touch(self, keys):
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                self._touched[key] = now
+            if len(self._touched) < self.touch_batch and \
+                    time.monotonic() - self._last_touch_flush < self.touch_interval:
+                return
+        self.flush_access_times()
+
+    def flush_access_times(self):
+        """
+        Writes buffered access times. Best effort: if the database stays locked
+        past `touch_timeout`, they are dropped and the entries just age sooner.
+        """
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_touch_flush = time.monotonic()
+        if not touched:
+            return
+        conn = self._touch_connection()
+        try:
+            conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                             [(at, key) for key, at in touched.items()])
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            self.logger.warning(f"Dropped {len(touched)} embedding cache access times: {str(e)}")
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        now = time.time()
+        rows = [
+            (self.make_key(model, text), model, array("f", embedding).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, model, vector, last_access) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+        with self._lock:
+            self._entries += len(rows)
+            evict = self._entries > self.max_entries * (1 + self.evict_slack)
+        if evict:
+            self._evict()
+
+    def _evict(self):
+        # Recent hits must count before choosing what to drop
+        self.flush_access_times()
+        conn = self._connection()
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            conn.commit()
+            self.logger.info(f"Evicted {count - self.max_entries} embedding cache entries")
+        with self._lock:
+            self._entries = min(count, self.max_entries)
+
+    def get_or_compute(self, model: str, texts: List[str],
+                       compute: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Returns embeddings for `texts`, calling `compute` only for the ones not cached.
+        """
+        results = self.get_many(model, texts)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = compute(missing_texts)
+            for i, embedding in zip(missing, computed):
+                results[i] = embedding
+            try:
+                self.put_many(model, missing_texts, computed)
+            except sqlite3.Error as e:
+                self.logger.warning(f"Could not write to embedding cache: {str(e)}")
+        return results
+
+    async def aget_or_compute(self, model: str, texts: List[str],
+                              compute: Callable[[List[str]], Awaitable[List[List[float]]]]) -> List[List[float]]:
+        """
+        Async counterpart of `get_or_compute`; SQLite access runs in a worker thread.
+        """
+        results = await asyncio.to_thread(self.get_many, model, texts)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = await compute(missing_texts)
+            for i, embedding in zip(missing, computed):
+                results[i] = embedding
+            try:
+                await asyncio.to_thread(self.put_many, model, missing_texts, computed)
+            except sqlite3.Error as e:
+                self.logger.warning(f"Could not write to embedding cache: {str(e)}")
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
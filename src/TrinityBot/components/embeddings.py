@@ -0,0 +1,228 @@
+import os
+import re
+import asyncio
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from TrinityBot.utils.metrics import record_tokens
+from TrinityBot.components.ratelimiter import INTERACTIVE, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@lru_cache(maxsize=200_000)
+def _bucket(feature: str, dimension: int):
+    # Stable across processes, unlike hash(); low bit of the digest picks the sign
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return (digest >> 1) % dimension, 1.0 if digest & 1 else -1.0
+
+
+class EmbeddingProvider(ABC):
+    """
+    Interface shared by the ingest and query sides.
+
+    Providers declare their output `dimension`, how much work one request may
+    carry (`max_batch_size` inputs, `max_batch_tokens` estimated tokens) and
+    whether returned vectors are already unit-length (`normalized`). `name`
+    identifies the model in the embedding cache, so vectors from different
+    providers never mix. `priority` lets rate-limited backends serve interactive
+    queries ahead of bulk ingestion.
+    """
+
+    name: str = "base"
+    dimension: int = 0
+    max_batch_size: int = 64
+    max_batch_tokens: int = 8000
+    normalized: bool = False
+
+    @abstractmethod
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        ...
+
+    def embed(self, texts: Sequence[str], priority: str = INTERACTIVE) -> List[List[float]]:
+        texts = list(texts)
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.max_batch_size):
+            vectors.extend(self._embed(texts[start:start + self.max_batch_size]))
+        return vectors
+
+    async def aembed(self, texts: Sequence[str], priority: str = INTERACTIVE) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed, texts, priority)
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeddings from the OpenAI API (network round trip per batch).
+
+    Calls go through the model's shared `RateLimiter`, which owns retries, so
+    the client's own retry loop is disabled. Pass `client` / `async_client` to
+    reuse an application's OpenAI clients (and their connection pools); the
+    caller then owns closing them.
+    """
+
+    DIMENSIONS = {
+        "text-embedding-ada-002": 1536,
+        "text-embedding-3-small": 1536,
+        "text-embedding-3-large": 3072,
+    }
+
+    max_batch_size = 2048
+    max_batch_tokens = 8000
+    normalized = True
+
+    def __init__(self, model: str = "text-embedding-ada-002", dimension: Optional[int] = None,
+                 timeout: Optional[float] = None, client=None, async_client=None):
+        from openai import OpenAI, AsyncOpenAI
+
+        self.name = model
+        self.model = model
+        self.dimension = dimension or self.DIMENSIONS.get(model, 1536)
+        # A None timeout would disable the SDK's own; calls must never hang indefinitely
+        timeout = timeout if timeout is not None else float(os.getenv("EMBEDDING_TIMEOUT", "60"))
+        self.client = client or OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=timeout, max_retries=0)
+        self.async_client = async_client or AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"), timeout=timeout, max_retries=0
+        )
+        self.rate_limiter = get_rate_limiter(model)
+
+    @staticmethod
+    def _estimate_tokens(texts: List[str]) -> int:
+        return sum(len(text) // 4 + 1 for text in texts)
+
+    def _parse(self, raw):
+        response = raw.parse()
+        if response.usage:
+            record_tokens(self.model, prompt_tokens=response.usage.prompt_tokens)
+        return [data.embedding for data in response.data], raw.headers
+
+    def _embed(self, texts: List[str], priority: str = INTERACTIVE) -> List[List[float]]:
+        # One request, through the shared limiter
+        return self.rate_limiter.call(
+            lambda: self._parse(self.client.embeddings.with_raw_response.create(model=self.model, input=texts)),
+            tokens=self._estimate_tokens(texts),
+            priority=priority
+        )
+
+    def embed(self, texts: Sequence[str], priority: str = INTERACTIVE) -> List[List[float]]:
+        texts = list(texts)
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.max_batch_size):
+            vectors.extend(self._embed(texts[start:start + self.max_batch_size], priority))
+        return vectors
+
+    async def aembed(self, texts: Sequence[str], priority: str = INTERACTIVE) -> List[List[float]]:
+        texts = list(texts)
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.max_batch_size):
+            batch = texts[start:start + self.max_batch_size]
+
+            async def request():
+                raw = await self.async_client.embeddings.with_raw_response.create(model=self.model, input=batch)
+                return self._parse(raw)
+
+            vectors.extend(await self.rate_limiter.acall(request, tokens=self._estimate_tokens(batch), priority=priority))
+        return vectors
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    In-process CPU embeddings, no network and no model download.
+
+    With `weights_path` (an `.npz` holding a `vocab` string array and a matching
+    `vectors` matrix, e.g. distilled static word embeddings) each text is the
+    mean of its token vectors. Without weights it falls back to signed feature
+    hashing of word unigrams and bigrams into `dimension` buckets, which keeps
+    lexical similarity and is fully deterministic, useful for tests, benchmarks
+    and offline runs. Either way a batch is one vectorized NumPy computation.
+    """
+
+    max_batch_size = 1024
+    max_batch_tokens = 1_000_000
+
+    def __init__(self, dimension: int = 384, weights_path: Optional[str] = None, normalize: bool = True):
+        self.normalized = normalize
+        self.vocab = None
+        self.weights = None
+        if weights_path:
+            data = np.load(weights_path, allow_pickle=False)
+            self.weights = np.asarray(data["vectors"], dtype=np.float32)
+            self.vocab = {str(token): index for index, token in enumerate(data["vocab"])}
+            dimension = self.weights.shape[1]
+            self.name = f"local-static-{os.path.basename(weights_path)}-{dimension}"
+        else:
+            self.name = f"local-hashing-{dimension}"
+        self.dimension = dimension
+
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        return _WORD_RE.findall(text.lower())
+
+    def _hashed(self, texts: List[str]) -> np.ndarray:
+        rows, columns, values = [], [], []
+        for row, text in enumerate(texts):
+            words = self._tokenize(text)
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                column, sign = _bucket(feature, self.dimension)
+                rows.append(row)
+                columns.append(column)
+                values.append(sign)
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if rows:
+            np.add.at(matrix, (np.array(rows), np.array(columns)), np.array(values, dtype=np.float32))
+        # Sublinear term frequency so long repeated passages do not dominate
+        return np.sign(matrix) * np.log1p(np.abs(matrix))
+
+    def _static(self, texts: List[str]) -> np.ndarray:
+        rows, columns = [], []
+        for row, text in enumerate(texts):
+            for token in self._tokenize(text):
+                index = self.vocab.get(token)
+                if index is not None:
+                    rows.append(row)
+                    columns.append(index)
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if rows:
+            rows = np.array(rows)
+            np.add.at(matrix, rows, self.weights[np.array(columns)])
+            counts = np.bincount(rows, minlength=len(texts)).astype(np.float32)
+            matrix /= np.maximum(counts, 1.0)[:, None]
+        return matrix
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        matrix = self._static(texts) if self.weights is not None else self._hashed(texts)
+        if self.normalized:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1.0, norms)
+        return matrix.tolist()
+
+
+def default_embedding_provider(model: Optional[str] = None, client=None, async_client=None) -> EmbeddingProvider:
+    """
+    Build the provider selected by `EMBEDDING_PROVIDER` (`openai` or `local`).
+
+    `model` overrides `EMBEDDING_MODEL` for the OpenAI backend, whose request
+    timeout is `EMBEDDING_TIMEOUT` seconds (default 60) unless shared clients
+    are passed in; the local backend reads `LOCAL_EMBEDDING_DIM` and
+    `LOCAL_EMBEDDING_WEIGHTS`.
+    """
+    provider = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+    if provider == "local":
+        return LocalEmbeddingProvider(
+            dimension=int(os.getenv("LOCAL_EMBEDDING_DIM", "384")),
+            weights_path=os.getenv("LOCAL_EMBEDDING_WEIGHTS") or None
+        )
+    if provider == "openai":
+        return OpenAIEmbeddingProvider(
+            model=model or os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002"),
+            client=client,
+            async_client=async_client
+        )
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER `{provider}`, expected `openai` or `local`")
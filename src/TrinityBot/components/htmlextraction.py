@@ -0,0 +1,148 @@
+import re
+from html.parser import HTMLParser
+from typing import List, NamedTuple
+from urllib.parse import urljoin, urlparse, urldefrag
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # lxml is optional; the stdlib backend is always available
+    etree = None
+    lxml_html = None
+
+
+SKIP_TAGS = frozenset(["script", "style", "nav", "footer", "header"])
+
+BLOCK_TAGS = frozenset([
+    "address", "article", "aside", "blockquote", "br", "dd", "details", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "form", "h1", "h2", "h3", "h4", "h5", "h6", "hr",
+    "li", "main", "ol", "p", "pre", "section", "summary", "table", "td", "th", "tr", "ul",
+])
+
+_XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>", re.IGNORECASE)
+
+
+class ExtractedPage(NamedTuple):
+    text: str
+    links: List[str]
+
+
+class _PageBuilder:
+    """
+    Accumulates text blocks and same-domain links while a backend walks the page once.
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.base_domain = urlparse(base_url).netloc
+        self.blocks: List[str] = []
+        self.parts: List[str] = []
+        self.links = {}
+        self.skip_depth = 0
+
+    def start(self, tag: str, href=None):
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.flush()
+        if tag == "a" and href:
+            url = urldefrag(urljoin(self.base_url, href))[0]
+            if urlparse(url).netloc == self.base_domain:
+                self.links[url] = None
+
+    def end(self, tag: str):
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self.flush()
+
+    def data(self, text: str):
+        if text and not self.skip_depth:
+            self.parts.append(text)
+
+    def flush(self):
+        if self.parts:
+            block = " ".join(" ".join(self.parts).split())
+            if block:
+                self.blocks.append(block)
+            self.parts = []
+
+    def result(self) -> ExtractedPage:
+        self.flush()
+        return ExtractedPage(text="\n\n".join(self.blocks), links=list(self.links))
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, builder: _PageBuilder):
+        super().__init__(convert_charrefs=True)
+        self.builder = builder
+
+    def handle_starttag(self, tag, attrs):
+        self.builder.start(tag, dict(attrs).get("href") if tag == "a" else None)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag not in SKIP_TAGS:
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.builder.end(tag)
+
+    def handle_data(self, data):
+        self.builder.data(data)
+
+
+def _extract_stdlib(html: str, base_url: str) -> ExtractedPage:
+    builder = _PageBuilder(base_url)
+    parser = _StdlibParser(builder)
+    parser.feed(html)
+    parser.close()
+    return builder.result()
+
+
+def _extract_lxml(html: str, base_url: str) -> ExtractedPage:
+    builder = _PageBuilder(base_url)
+    if not html.strip():
+        return builder.result()
+    try:
+        # lxml rejects str input that declares an encoding, as XHTML pages often do
+        root = lxml_html.document_fromstring(_XML_DECLARATION.sub("", html, count=1))
+    except (ValueError, etree.ParserError):
+        return _extract_stdlib(html, base_url)
+    for event, element in etree.iterwalk(root, events=("start", "end")):
+        tag = element.tag if isinstance(element.tag, str) else None
+        if event == "start":
+            if tag:
+                builder.start(tag, element.get("href") if tag == "a" else None)
+                builder.data(element.text)
+        else:
+            if tag:
+                builder.end(tag)
+            # Tail text belongs to the parent, so it is read after leaving the element
+            builder.data(element.tail)
+    return builder.result()
+
+
+BACKENDS = {
+    "stdlib": _extract_stdlib,
+}
+if lxml_html is not None:
+    BACKENDS["lxml"] = _extract_lxml
+
+
+def extract_page(html: str, base_url: str, backend: str = "auto") -> ExtractedPage:
+    """
+    Parses `html` once and returns its visible text and same-domain links.
+
+    Text from script, style, nav, header and footer elements is dropped. Block-level
+    elements become paragraphs separated by blank lines, and whitespace inside a
+    paragraph is collapsed. Links are absolute, fragment-free and deduplicated.
+
+    Args:
+        html (str): Raw page HTML.
+        base_url (str): URL the page was fetched from.
+        backend (str): "lxml", "stdlib" or "auto" (lxml when installed).
+    """
+    if backend == "auto":
+        backend = "lxml" if "lxml" in BACKENDS else "stdlib"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown or unavailable HTML backend: {backend}")
+    return BACKENDS[backend](html, base_url)
@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class IngestManifest:
+    """
+    Local record of which chunk IDs are already stored in each Qdrant collection.
+
+    Chunk IDs are content-addressed, so an ID present here means the exact chunk
+    is already embedded and upserted and can be skipped.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("INGEST_MANIFEST_PATH", "artifacts/ingest_manifest.sqlite3")
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " collection TEXT NOT NULL,"
+            " point_id TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " PRIMARY KEY (collection, point_id))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(collection, source)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            " collection TEXT PRIMARY KEY,"
+            " generation INTEGER NOT NULL)"
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def known_ids(self, collection: str, point_ids: Iterable[str]) -> Set[str]:
+        point_ids = list(point_ids)
+        known = set()
+        conn = self._connection()
+        for start in range(0, len(point_ids), 500):
+            chunk = point_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT point_id FROM chunks WHERE collection = ? AND point_id IN ({placeholders})",
+                [collection, *chunk],
+            ).fetchall()
+            known.update(row[0] for row in rows)
+        return known
+
+    def ids_for_sources(self, collection: str, sources: Iterable[str]) -> Dict[str, Set[str]]:
+        conn = self._connection()
+        result = {}
+        for source in sources:
+            rows = conn.execute(
+                "SELECT point_id FROM chunks WHERE collection = ? AND source = ?", (collection, source)
+            ).fetchall()
+            result[source] = {row[0] for row in rows}
+        return result
+
+    def add(self, collection: str, entries: List[tuple]):
+        """
+        Records (point_id, source) pairs as stored in `collection`.
+        """
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO chunks (collection, point_id, source) VALUES (?, ?, ?)",
+            [(collection, point_id, source) for point_id, source in entries],
+        )
+        conn.commit()
+
+    def remove(self, collection: str, point_ids: Iterable[str]):
+        conn = self._connection()
+        conn.executemany(
+            "DELETE FROM chunks WHERE collection = ? AND point_id = ?",
+            [(collection, point_id) for point_id in point_ids],
+        )
+        conn.commit()
+
+    def clear(self, collection: str):
+        conn = self._connection()
+        conn.execute("DELETE FROM chunks WHERE collection = ?", (collection,))
+        conn.commit()
+        self.bump_generation(collection)
+
+    def generation(self, collection: str) -> int:
+        """
+        Counter that changes whenever the contents of `collection` change.
+        """
+        row = self._connection().execute(
+            "SELECT generation FROM generations WHERE collection = ?", (collection,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump_generation(self, collection: str):
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO generations (collection, generation) VALUES (?, 1)"
+            " ON CONFLICT(collection) DO UPDATE SET generation = generation + 1",
+            (collection,),
+        )
+        conn.commit()
@@ -0,0 +1,141 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+class LexicalIndex:
+    """
+    Local BM25 inverted index over chunk text, backed by SQLite FTS5.
+
+    It is kept in step with Qdrant by `QdrantDumper` on every upsert and delete,
+    and answers keyword lookups (tickers, contract names, page titles) in a few
+    milliseconds without a network round trip.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("LEXICAL_INDEX_PATH", "artifacts/lexical_index.sqlite3")
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " rowid INTEGER PRIMARY KEY,"
+            " collection TEXT NOT NULL,"
+            " point_id TEXT NOT NULL,"
+            " token TEXT,"
+            " source TEXT,"
+            " page INTEGER,"
+            " page_end INTEGER,"
+            " position INTEGER,"
+            " UNIQUE (collection, point_id));"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+            " content, tokenize = 'unicode61 remove_diacritics 2');"
+        )
+        # Indexes created before chunks carried their page span and position
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}
+        for column in ("page_end", "position"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE chunks ADD COLUMN {column} INTEGER")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, collection: str, entries: Iterable[Tuple[str, Dict]]):
+        """
+        Indexes (point_id, payload) pairs; payloads need `content` and may carry token,
+        source, page, page_end and position.
+        """
+        conn = self._connection()
+        for point_id, payload in entries:
+            point_id = str(point_id)
+            row = conn.execute(
+                "SELECT rowid FROM chunks WHERE collection = ? AND point_id = ?", (collection, point_id)
+            ).fetchone()
+            if row:
+                conn.execute("DELETE FROM chunks_fts WHERE rowid = ?", (row[0],))
+                conn.execute("DELETE FROM chunks WHERE rowid = ?", (row[0],))
+            cursor = conn.execute(
+                "INSERT INTO chunks (collection, point_id, token, source, page, page_end, position)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (collection, point_id, payload.get("token"), payload.get("source"), payload.get("page"),
+                 payload.get("page_end"), payload.get("position")),
+            )
+            conn.execute(
+                "INSERT INTO chunks_fts (rowid, content) VALUES (?, ?)",
+                (cursor.lastrowid, payload.get("content", "")),
+            )
+        conn.commit()
+
+    def delete(self, collection: str, point_ids: Iterable[str]):
+        conn = self._connection()
+        for point_id in point_ids:
+            row = conn.execute(
+                "SELECT rowid FROM chunks WHERE collection = ? AND point_id = ?", (collection, str(point_id))
+            ).fetchone()
+            if row:
+                conn.execute("DELETE FROM chunks_fts WHERE rowid = ?", (row[0],))
+                conn.execute("DELETE FROM chunks WHERE rowid = ?", (row[0],))
+        conn.commit()
+
+    def clear(self, collection: str):
+        conn = self._connection()
+        conn.execute(
+            "DELETE FROM chunks_fts WHERE rowid IN (SELECT rowid FROM chunks WHERE collection = ?)", (collection,)
+        )
+        conn.execute("DELETE FROM chunks WHERE collection = ?", (collection,))
+        conn.commit()
+
+    def count(self, collection: str) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM chunks WHERE collection = ?", (collection,)
+        ).fetchone()[0]
+
+    @staticmethod
+    def _match_expression(query: str) -> Optional[str]:
+        terms = dict.fromkeys(term.lower() for term in _TERM.findall(query))
+        if not terms:
+            return None
+        return " OR ".join(f'"{term}"' for term in terms)
+
+    def search(self, collection: str, query: str, top_k: int = 10,
+               token: Optional[str] = None) -> List[Dict]:
+        """
+        Returns the best BM25 matches as dicts with point_id, score, content, token, source,
+        page, page_end and position.
+        """
+        match = self._match_expression(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT c.point_id, -bm25(chunks_fts) AS score, chunks_fts.content, c.token, c.source, c.page,"
+            " c.page_end, c.position"
+            " FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid"
+            " WHERE chunks_fts MATCH ? AND c.collection = ?"
+        )
+        params = [match, collection]
+        if token:
+            sql += " AND c.token = ?"
+            params.append(token)
+        sql += " ORDER BY bm25(chunks_fts) LIMIT ?"
+        params.append(top_k)
+        rows = self._connection().execute(sql, params).fetchall()
+        return [
+            {"point_id": row[0], "score": row[1], "content": row[2], "token": row[3], "source": row[4],
+             "page": row[5], "page_end": row[6], "position": row[7]}
+            for row in rows
+        ]
@@ -0,0 +1,61 @@
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+
+def count_pages(pdf_path: str) -> int:
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pages(pdf_path: str, page_numbers: List[int]) -> List[Tuple[int, str]]:
+    """
+    Extracts whitespace-normalized text for the given 1-based page numbers.
+
+    Runs inside worker processes, so it opens the PDF itself rather than
+    receiving parsed objects.
+    """
+    import pdfplumber
+
+    pages = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_number in page_numbers:
+            page = pdf.pages[page_number - 1]
+            text = page.extract_text() or ""
+            pages.append((page_number, " ".join(text.split())))
+            # pdfplumber caches parsed layout objects per page; drop them as we go
+            page.flush_cache()
+    return pages
+
+
+def iter_pdf_pages(pdf_path: str,
+                   workers: Optional[int] = None,
+                   pages_per_task: int = 8,
+                   total_pages: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (page_number, text) in page order while extraction runs in a process pool.
+
+    At most `2 * workers` page ranges are in flight, so memory stays bounded by
+    the window rather than by the size of the PDF. Workers are spawned rather
+    than forked: this runs inside the API server, whose threads (and the locks
+    they hold) a forked child would inherit.
+    """
+    workers = workers or os.cpu_count() or 1
+    total_pages = total_pages if total_pages is not None else count_pages(pdf_path)
+    ranges = (
+        list(range(start, min(start + pages_per_task, total_pages + 1)))
+        for start in range(1, total_pages + 1, pages_per_task)
+    )
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        in_flight = deque()
+        for page_numbers in ranges:
+            in_flight.append(executor.submit(extract_pages, pdf_path, page_numbers))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
@@ -0,0 +1,77 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+
+class PdfJobStore:
+    """
+    Status of background PDF ingestion jobs, kept in SQLite so any worker can report it.
+    """
+
+    FIELDS = ("job_id", "filename", "token", "status", "pages_total", "pages_done",
+              "chunks_inserted", "chunks_failed", "error", "created_at", "updated_at")
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("PDF_JOBS_PATH", "artifacts/pdf_jobs.sqlite3")
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " filename TEXT NOT NULL,"
+            " token TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " pages_total INTEGER,"
+            " pages_done INTEGER NOT NULL DEFAULT 0,"
+            " chunks_inserted INTEGER NOT NULL DEFAULT 0,"
+            " chunks_failed INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, filename: str, token: str) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO jobs (job_id, filename, token, status, created_at, updated_at)"
+            " VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, filename, token, now, now),
+        )
+        conn.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        if not fields:
+            return
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        conn = self._connection()
+        conn.execute(
+            f"UPDATE jobs SET {columns}, updated_at = ? WHERE job_id = ?",
+            (*fields.values(), time.time(), job_id),
+        )
+        conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            f"SELECT {', '.join(self.FIELDS)} FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return dict(zip(self.FIELDS, row)) if row else None
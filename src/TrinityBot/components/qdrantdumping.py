@@ -1,126 +1,429 @@
 import os
-import uuid
+import time
 import logging
-from typing import List, Dict
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
+from typing import List, Dict, Iterable, Tuple, Optional, Callable, Set
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct
-import pdfplumber
-from openai import OpenAI
+from qdrant_client.models import PointStruct, PointIdsList, PayloadSchemaType
+from TrinityBot.components.embeddingcache import EmbeddingCache
+from TrinityBot.components.ingestmanifest import IngestManifest
+from TrinityBot.components.lexicalindex import LexicalIndex
+from TrinityBot.components.artifacts import is_removed_record
+from TrinityBot.components.vectorindex import VectorIndexConfig
+from TrinityBot.components.embeddings import EmbeddingProvider, default_embedding_provider
+from TrinityBot.components.ratelimiter import BULK, classify_error, max_bulk_concurrency
+from TrinityBot.components.pdfextraction import iter_pdf_pages, count_pages
+from TrinityBot.components.chunking import Chunk, TextChunker, default_chunker
+from TrinityBot.utils.hashing import make_chunk_id
+from TrinityBot.utils.metrics import timed
 from dotenv import load_dotenv
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 class QdrantDumper:
-    def __init__(self, collection_name: str, embedding_model: str = "text-embedding-ada-002"):
+    def __init__(self,
+                 collection_name: str,
+                 embedding_model: Optional[str] = None,
+                 embedding_batch_size: int = 64,
+                 max_batch_tokens: int = 8000,
+                 max_concurrent_batches: Optional[int] = None,
+                 upsert_batch_size: int = 256,
+                 embedding_cache: EmbeddingCache = None,
+                 manifest: IngestManifest = None,
+                 lexical_index: LexicalIndex = None,
+                 pdf_workers: Optional[int] = None,
+                 pdf_pages_per_batch: int = 16,
+                 index_config: VectorIndexConfig = None,
+                 embedding_provider: EmbeddingProvider = None,
+                 qdrant_client: QdrantClient = None,
+                 chunker: TextChunker = None):
         self.collection_name = collection_name
-        self.embedding_model = embedding_model
+        self.embedding_provider = embedding_provider or default_embedding_provider(embedding_model)
+        self.embedding_model = self.embedding_provider.name
+        self.embedding_batch_size = min(embedding_batch_size, self.embedding_provider.max_batch_size)
+        self.max_batch_tokens = min(max_batch_tokens, self.embedding_provider.max_batch_tokens)
+        # The rate limiter gates concurrency; the pool only has to be able to reach its ceiling
+        self.max_concurrent_batches = max_concurrent_batches or max_bulk_concurrency()
+        self.upsert_batch_size = upsert_batch_size
+        self.embedding_cache = embedding_cache or EmbeddingCache()
+        self.manifest = manifest or IngestManifest()
+        self.lexical_index = lexical_index or LexicalIndex()
+        self.pdf_workers = pdf_workers
+        self.pdf_pages_per_batch = pdf_pages_per_batch
+        self.index_config = index_config or VectorIndexConfig.load()
+        self.index_config.vector_size = self.embedding_provider.dimension
 
         qdrant_url = os.getenv("QDRANT_URL")
         qdrant_api_key = os.getenv("QDRANT_API_KEY")
-        self.qdrant_client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
+        self.qdrant_client = qdrant_client or QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
 
-        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        self.chunker = chunker or default_chunker()
 
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
         self._ensure_collection_exists()
+        self._backfill_lexical_index()
 
     def _ensure_collection_exists(self):
-        try:
-            collection_info = self.qdrant_client.get_collection(self.collection_name)
+        # Errors from the existence check propagate: treating a transient failure as
+        # "missing" and recreating the collection would wipe every stored chunk
+        if self.qdrant_client.collection_exists(self.collection_name):
             self.logger.info(f"Collection `{self.collection_name}` already exists.")
-        except Exception:
-            self.logger.info(f"Collection `{self.collection_name}` not found. Creating it now.")
-            self.qdrant_client.recreate_collection(
+            self._check_vector_size()
+        else:
+            config = self.index_config
+            self.logger.info(
+                f"Collection `{self.collection_name}` not found. Creating it now "
+                f"(m={config.hnsw_m}, ef_construct={config.hnsw_ef_construct}, "
+                f"quantization={config.quantization}, on_disk={config.on_disk})."
+            )
+            self.qdrant_client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config={"size": 1536, "distance": "Cosine"}
+                vectors_config=config.vectors_config(),
+                hnsw_config=config.hnsw_config(),
+                quantization_config=config.quantization_config()
             )
+            # A fresh collection holds nothing the manifest may still list
+            self.manifest.clear(self.collection_name)
+            self.lexical_index.clear(self.collection_name)
+        self._ensure_payload_indexes()
 
-    def _get_embeddings(self, texts):
-        response = client.embeddings.create(model=self.embedding_model, input=texts)
-        return [data.embedding for data in response.data]
-    
+    def _check_vector_size(self):
+        vectors = self.qdrant_client.get_collection(self.collection_name).config.params.vectors
+        size = getattr(vectors, "size", None)
+        if size is not None and size != self.embedding_provider.dimension:
+            raise ValueError(
+                f"Collection `{self.collection_name}` stores {size}-d vectors but embedding provider "
+                f"`{self.embedding_provider.name}` produces {self.embedding_provider.dimension}-d vectors; "
+                f"use a separate collection per provider"
+            )
 
-    def dump_documents(self, documents: List[Dict]):
-        for document in documents:
+    def _ensure_payload_indexes(self):
+        # Keyword indexes let token/source filters run inside Qdrant instead of post-filtering
+        for field_name in ("token", "source"):
             try:
-                content = document.get("page_content")
-                metadata = document.get("metadata", {})
-                document_id = metadata.get("_id")
-                token = metadata.get("token")
-                source = metadata.get("source")
-
-                if not content or not document_id or not token or not source:
-                    self.logger.warning(f"Skipping document due to missing required fields: {document}")
-                    continue
-
-                payload = {
-                    "id": document_id,
-                    "content": content,
-                    "token": token,
-                    "source": source
-                }
-
-                embedding = self._get_embeddings([content])[0]
-
-                point = PointStruct(
-                    id=document_id,  
-                    vector=embedding,
-                    payload=payload
+                self.qdrant_client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=PayloadSchemaType.KEYWORD
                 )
+            except Exception as e:
+                self.logger.warning(f"Could not create payload index on `{field_name}`: {str(e)}")
 
-                self.qdrant_client.upsert(
+    def _backfill_lexical_index(self):
+        # Chunks ingested before the lexical index existed are known to the manifest
+        # and would never be re-upserted, so index them once from Qdrant itself
+        if self.lexical_index.count(self.collection_name):
+            return
+        try:
+            offset = None
+            indexed = 0
+            while True:
+                points, offset = self.qdrant_client.scroll(
                     collection_name=self.collection_name,
-                    points=[point]
+                    limit=256,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False
                 )
+                self.lexical_index.upsert(self.collection_name, [(point.id, point.payload) for point in points])
+                indexed += len(points)
+                if offset is None:
+                    break
+            if indexed:
+                self.logger.info(f"Backfilled lexical index with {indexed} chunks")
+        except Exception as e:
+            self.logger.warning(f"Could not backfill lexical index: {str(e)}")
+
+    @timed("dumper.embed")
+    def _get_embeddings(self, texts):
+        return self.embedding_cache.get_or_compute(self.embedding_model, texts, self._create_embeddings)
 
-                self.logger.info(f"Inserted document with ID: {document_id}")
+    def _create_embeddings(self, texts):
+        return self.embedding_provider.embed(texts, priority=BULK)
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # Roughly four characters per token for English text with ada-002.
+        return max(1, len(text) // 4)
+
+    def _make_batches(self, items: List[Tuple[str, str, Dict]]) -> Iterable[List[Tuple[str, str, Dict]]]:
+        batch, batch_tokens = [], 0
+        for item in items:
+            tokens = self._estimate_tokens(item[1])
+            if batch and (len(batch) >= self.embedding_batch_size
+                          or batch_tokens + tokens > self.max_batch_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(item)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _embed_batch(self, batch: List[Tuple[str, str, Dict]]) -> List[PointStruct]:
+        try:
+            embeddings = self._get_embeddings([content for _, content, _ in batch])
+            return [
+                PointStruct(id=point_id, vector=embedding, payload=payload)
+                for (point_id, _, payload), embedding in zip(batch, embeddings)
+            ]
+        except Exception as e:
+            if classify_error(e)[1]:
+                # Still rate limited after the throttle's retries: per-chunk calls would only add load.
+                # The chunks stay out of the manifest and their pages are reported as incomplete,
+                # so the next run picks them up again.
+                self.logger.error(f"Batch of {len(batch)} chunks deferred, rate limit persisted: {str(e)}")
+                return []
+            self.logger.warning(f"Batch of {len(batch)} chunks failed ({str(e)}), retrying one by one")
+
+        # Fall back to per-chunk calls so one bad chunk does not sink the whole batch
+        points = []
+        for point_id, content, payload in batch:
+            try:
+                embedding = self._get_embeddings([content])[0]
+                points.append(PointStruct(id=point_id, vector=embedding, payload=payload))
             except Exception as e:
-                self.logger.error(f"Error inserting document: {str(e)}")
+                self.logger.error(f"Error embedding chunk {point_id}: {str(e)}")
+        return points
 
-    def dump_pdf(self, pdf_path, token):
+    def _upsert_points(self, points: List[PointStruct]) -> int:
         try:
-            documents = []
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_number, page in enumerate(pdf.pages, start=1):
-                    text = page.extract_text() or ""
-                    text = " ".join(text.split())
-                    metadata = {
-                        "_id": str(uuid.uuid4()),
-                        "source": os.path.basename(pdf_path),
-                        "page": page_number,
-                        "token": token,
-                    }
-
-                    chunks = self.text_splitter.split_text(text)
-                    for chunk in chunks:
-                        documents.append(Document(page_content=chunk, metadata=metadata))
-
-            for document in documents:
-                embedding = self._get_embeddings([document.page_content])[0]
-                payload = {
-                    "_id": document.metadata["_id"],
-                    "source": document.metadata["source"],
-                    "page": document.metadata["page"],
-                    "token": document.metadata["token"],
-                    "content": document.page_content, 
-                }
-                point = PointStruct(
-                    id=document.metadata["_id"],
-                    vector=embedding,
-                    payload=payload
-                )
-                self.qdrant_client.upsert(
-                    collection_name=self.collection_name,
-                    points=[point]
-                )
-                self.logger.info(f"Inserted chunk with ID: {document.metadata['_id']}")
+            self.qdrant_client.upsert(collection_name=self.collection_name, points=points)
+            inserted = points
+        except Exception as e:
+            self.logger.warning(f"Bulk upsert of {len(points)} points failed ({str(e)}), retrying one by one")
+            inserted = []
+            for point in points:
+                try:
+                    self.qdrant_client.upsert(collection_name=self.collection_name, points=[point])
+                    inserted.append(point)
+                except Exception as e:
+                    self.logger.error(f"Error inserting document {point.id}: {str(e)}")
+
+        self.manifest.add(self.collection_name, [(point.id, point.payload["source"]) for point in inserted])
+        self.lexical_index.upsert(self.collection_name, [(point.id, point.payload) for point in inserted])
+        return len(inserted)
+
+    def _delete_points(self, point_ids: List[str]) -> int:
+        if not point_ids:
+            return 0
+        try:
+            self.qdrant_client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=point_ids)
+            )
+        except Exception as e:
+            self.logger.error(f"Error deleting {len(point_ids)} stale points: {str(e)}")
+            return 0
+        self.manifest.remove(self.collection_name, point_ids)
+        self.lexical_index.delete(self.collection_name, point_ids)
+        return len(point_ids)
+
+    def _filter_known(self, items: List[Tuple[str, str, Dict]]) -> Tuple[List[Tuple[str, str, Dict]], int]:
+        known = self.manifest.known_ids(self.collection_name, [item[0] for item in items])
+        return [item for item in items if item[0] not in known], len(known)
+
+    def _stale_ids(self, sources: Iterable[str], current_ids: Set[str]) -> List[str]:
+        return [
+            point_id
+            for ids in self.manifest.ids_for_sources(self.collection_name, sources).values()
+            for point_id in ids
+            if point_id not in current_ids
+        ]
+
+    def _finish_sync(self, stats: Dict):
+        if stats["inserted"] or stats["deleted"]:
+            # Lets answer caches in other processes notice the collection changed
+            self.manifest.bump_generation(self.collection_name)
+
+    def _sync(self, items: List[Tuple[str, str, Dict]], removed_sources: Iterable[str] = ()) -> Dict:
+        """
+        Ingests only items the manifest does not know yet and deletes points of the
+        same sources that are no longer present, and all points of `removed_sources`.
+
+        Sources missing from `items` altogether are left untouched, so a page that
+        failed to scrape this run keeps its previous chunks. So does a source whose
+        new chunks were not all stored (e.g. deferred by the rate limiter); it is
+        listed under `incomplete_sources` so the caller can have it re-processed.
+        """
+        items = list({item[0]: item for item in items}.values())
+        current_ids = {item[0] for item in items}
+        sources = {item[2]["source"] for item in items} | set(removed_sources)
+        new_items, known = self._filter_known(items)
+        stale_ids = self._stale_ids(sources, current_ids)
+
+        self.logger.info(
+            f"{len(items)} chunks: {known} unchanged, {len(new_items)} new or changed, "
+            f"{len(stale_ids)} stale"
+        )
+        stats = self._ingest(new_items)
+        incomplete = set()
+        if stats["failed"]:
+            stored = self.manifest.known_ids(self.collection_name, [item[0] for item in new_items])
+            incomplete = {item[2]["source"] for item in new_items if item[0] not in stored}
+            stale_ids = self._stale_ids(sources - incomplete, current_ids)
+        stats["unchanged"] = known
+        stats["deleted"] = self._delete_points(stale_ids)
+        stats["incomplete_sources"] = sorted(incomplete)
+        self._finish_sync(stats)
+        return stats
+
+    def _ingest(self, items: List[Tuple[str, str, Dict]]) -> Dict:
+        """
+        Embeds (id, content, payload) items in concurrent batches and upserts them in bulk.
+
+        Returns:
+            Dict: Counts of inserted and failed chunks, elapsed seconds and chunks/sec.
+        """
+        start = time.perf_counter()
+        inserted = 0
+        pending: List[PointStruct] = []
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_batches) as executor:
+            futures = [executor.submit(self._embed_batch, batch) for batch in self._make_batches(items)]
+            for future in as_completed(futures):
+                pending.extend(future.result())
+                while len(pending) >= self.upsert_batch_size:
+                    inserted += self._upsert_points(pending[:self.upsert_batch_size])
+                    pending = pending[self.upsert_batch_size:]
+
+        if pending:
+            inserted += self._upsert_points(pending)
+
+        elapsed = time.perf_counter() - start
+        throughput = inserted / elapsed if elapsed > 0 else 0.0
+        stats = {
+            "inserted": inserted,
+            "failed": len(items) - inserted,
+            "seconds": round(elapsed, 3),
+            "chunks_per_sec": round(throughput, 2),
+        }
+        self.logger.info(
+            f"Inserted {inserted}/{len(items)} chunks in {elapsed:.2f}s ({throughput:.2f} chunks/sec)"
+        )
+        self.logger.info(f"Embedding cache: {self.embedding_cache.stats()}")
+        return stats
+
+    def _document_items(self, documents: List[Dict]) -> List[Tuple[str, str, Dict]]:
+        items = []
+        for document in documents:
+            content = document.get("page_content")
+            metadata = document.get("metadata", {})
+            document_id = metadata.get("_id")
+            token = metadata.get("token")
+            source = metadata.get("source")
+
+            if not content or not document_id or not token or not source:
+                self.logger.warning(f"Skipping document due to missing required fields: {document}")
+                continue
+
+            payload = {
+                "id": document_id,
+                "content": content,
+                "token": token,
+                "source": source
+            }
+            if metadata.get("position") is not None:
+                payload["position"] = metadata["position"]
+            items.append((document_id, content, payload))
+        return items
+
+    @staticmethod
+    def _split_removed(documents: List[Dict]) -> Tuple[List[Dict], Set[str]]:
+        removed = {document["metadata"]["source"] for document in documents if is_removed_record(document)}
+        return [document for document in documents if not is_removed_record(document)], removed
+
+    def dump_documents(self, documents: List[Dict]):
+        documents, removed = self._split_removed(documents)
+        return self._sync(self._document_items(documents), removed)
+
+    def _pdf_item(self, position: int, chunk: Chunk, source: str, token: str) -> Tuple[str, str, Dict]:
+        chunk_id = make_chunk_id(source, position, chunk.text)
+        payload = {
+            "_id": chunk_id,
+            "source": source,
+            "page": chunk.start,
+            "page_end": chunk.end,
+            "position": position,
+            "token": token,
+            "content": chunk.text,
+        }
+        return chunk_id, chunk.text, payload
+
+    def _pdf_items(self, pages: Iterable[Tuple[int, str]], source: str, token: str) -> List[Tuple[str, str, Dict]]:
+        return [
+            self._pdf_item(position, chunk, source, token)
+            for position, chunk in enumerate(self.chunker.iter_chunks(pages))
+        ]
+
+    @timed("dumper.dump_pdf")
+    def dump_pdf(self, pdf_path, token, source: Optional[str] = None,
+                 progress: Optional[Callable[[Dict], None]] = None):
+        """
+        Extracts, embeds and upserts a PDF page batch by page batch.
+
+        Pages are extracted in a process pool and chunked as one stream, so
+        chunks run across page breaks and record the page span they cover
+        (`page` to `page_end`). Chunks are embedded and upserted every
+        `pdf_pages_per_batch` pages, before later pages are held in memory.
+        `progress`, if given, receives the running counts after every batch.
+
+        Args:
+            pdf_path (str): Path of the PDF on disk.
+            token (str): Token the document belongs to.
+            source (str): File name of the document; defaults to the file's base name. Chunks are
+                stored under the source `<token>/<name>`, so one file uploaded for two tokens
+                is kept, and replaced, separately for each.
+            progress (Callable): Optional callback for progress updates.
+        """
+        try:
+            source = f"{token}/{source or os.path.basename(pdf_path)}"
+            total_pages = count_pages(pdf_path)
+            stats = {
+                "pages_total": total_pages, "pages_done": 0, "inserted": 0,
+                "failed": 0, "unchanged": 0, "deleted": 0,
+            }
+            current_ids = set()
+            start = time.perf_counter()
+
+            pages_read = 0
+
+            def read_pages():
+                nonlocal pages_read
+                for page in iter_pdf_pages(pdf_path, workers=self.pdf_workers, total_pages=total_pages):
+                    pages_read += 1
+                    yield page
+
+            def flush(items):
+                current_ids.update(item[0] for item in items)
+                new_items, known = self._filter_known(items)
+                batch_stats = self._ingest(new_items)
+                stats["inserted"] += batch_stats["inserted"]
+                stats["failed"] += batch_stats["failed"]
+                stats["unchanged"] += known
+                stats["pages_done"] = pages_read
+                if progress:
+                    progress(dict(stats))
+
+            items = []
+            for position, chunk in enumerate(self.chunker.iter_chunks(read_pages())):
+                items.append(self._pdf_item(position, chunk, source, token))
+                if pages_read - stats["pages_done"] >= self.pdf_pages_per_batch:
+                    flush(items)
+                    items = []
+            if items or stats["pages_done"] < pages_read:
+                flush(items)
 
-            return {"message": "PDF processed and inserted into Qdrant successfully."}
+            if not stats["failed"]:
+                # Otherwise the previous version stays searchable until an upload stores every chunk
+                stats["deleted"] = self._delete_points(self._stale_ids([source], current_ids))
+            self._finish_sync(stats)
+            elapsed = time.perf_counter() - start
+            stats["seconds"] = round(elapsed, 3)
+            stats["chunks_per_sec"] = round(stats["inserted"] / elapsed, 2) if elapsed > 0 else 0.0
+            if progress:
+                progress(dict(stats))
+            return {"message": "PDF processed and inserted into Qdrant successfully.", **stats}
         except Exception as e:
             self.logger.error(f"Error processing PDF: {str(e)}")
             return {"message": f"Error processing PDF: {str(e)}"}
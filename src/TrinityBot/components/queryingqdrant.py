@@ -1,62 +1,438 @@
 from fastapi import APIRouter, HTTPException
-from qdrant_client.models import Filter
-from qdrant_client import QdrantClient
-from openai import OpenAI
+from qdrant_client.models import Filter, FieldCondition, MatchValue, ScoredPoint
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from openai import OpenAI, AsyncOpenAI
+from TrinityBot.components.embeddingcache import EmbeddingCache
+from TrinityBot.components.answercache import AnswerCache
+from TrinityBot.components.ingestmanifest import IngestManifest
+from TrinityBot.components.lexicalindex import LexicalIndex
+from TrinityBot.components.contextpacking import ContextPacker
+from TrinityBot.components.vectorindex import VectorIndexConfig
+from TrinityBot.components.embeddings import EmbeddingProvider, default_embedding_provider
+from TrinityBot.components.embeddingbatcher import EmbeddingBatcher
+from TrinityBot.components.ratelimiter import INTERACTIVE, get_rate_limiter
+from TrinityBot.utils.metrics import timed, record_tokens
+from TrinityBot.utils.tokens import count_tokens
 import os
+import time
+import asyncio
+from typing import Optional, List, Dict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 load_dotenv()
 
 
+SYSTEM_PROMPT = (
+    "You are a knowledgeable assistant specializing in Web3, blockchain, cryptocurrencies, tokens, and related topics."
+    "Greet the user with a short message and respond to their questions with informative and accurate answers. "
+    "Answers should be concise, clear, and tailored to the user's query, and don't be repititive." 
+    "You provide clear, short, concise, to the point and human-like answers tailored to the user's query. "
+    "Do not use phrases like 'according to the context' or 'based on my knowledge'; instead, provide direct and informative answers. "
+    "Focus solely on the information available in the context, and avoid unnecessary speculation or verbose explanations. "
+    "Your goal is to educate and assist users in understanding blockchain and cryptocurrency topics."
+)
+
+
+def build_messages(query: str, documents: list, packer: Optional[ContextPacker] = None):
+    if packer:
+        context, _ = packer.pack(documents)
+    else:
+        context = "\n".join([doc.payload.get("content", "") for doc in documents])
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"Context:\n{context}\n\nQuestion: {query}\n\nProvide a clear and precise answer from the context, solely on the provided context."
+        }
+    ]
+
+
+def record_usage(response=None, messages=None, completion: Optional[str] = None, model: str = "gpt-4o"):
+    # Streams only report usage when the server honours `include_usage`; estimate otherwise
+    usage = getattr(response, "usage", None)
+    if usage:
+        record_tokens(model, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+    elif messages is not None:
+        prompt_tokens = sum(count_tokens(message["content"], model) for message in messages)
+        record_tokens(model, prompt_tokens, count_tokens(completion or "", model))
+
+
+def completion_tokens_estimate(messages: list, max_tokens: int = 150, model: str = "gpt-4o") -> int:
+    """Tokens a completion counts against the TPM limit: the prompt plus the full `max_tokens`."""
+    return sum(count_tokens(message["content"], model) for message in messages) + max_tokens
+
+
+def describe_sources(documents: list):
+    return [
+        {
+            "source": doc.payload.get("source"),
+            "token": doc.payload.get("token"),
+            "page": doc.payload.get("page"),
+            "page_end": doc.payload.get("page_end"),
+            "score": doc.score,
+        }
+        for doc in documents
+    ]
+
+
+def token_filter(token: Optional[str]) -> Optional[Filter]:
+    if not token:
+        return None
+    return Filter(must=[FieldCondition(key="token", match=MatchValue(value=token))])
+
+
+def fuse_results(dense: list, sparse: List[Dict], top_k: int, k: int = 60) -> List[ScoredPoint]:
+    """
+    Merges dense Qdrant hits and BM25 hits with reciprocal-rank fusion.
+
+    Each list contributes 1 / (k + rank) per document; the fused value replaces
+    `score` on the returned points. Sparse-only hits are built from the payload
+    stored in the lexical index, so they need no extra Qdrant round trip.
+    """
+    scores: Dict[str, float] = {}
+    points: Dict[str, ScoredPoint] = {}
+    for rank, point in enumerate(dense, start=1):
+        point_id = str(point.id)
+        scores[point_id] = scores.get(point_id, 0.0) + 1.0 / (k + rank)
+        points[point_id] = point
+    for rank, hit in enumerate(sparse, start=1):
+        point_id = hit["point_id"]
+        scores[point_id] = scores.get(point_id, 0.0) + 1.0 / (k + rank)
+        if point_id not in points:
+            points[point_id] = ScoredPoint(
+                id=point_id,
+                version=0,
+                score=hit["score"],
+                payload={key: hit[key] for key in ("content", "token", "source", "page", "page_end", "position")
+                         if hit.get(key) is not None}
+            )
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [
+        ScoredPoint(id=points[point_id].id, version=points[point_id].version,
+                    score=scores[point_id], payload=points[point_id].payload)
+        for point_id in ranked
+    ]
+
+
+def default_answer_cache(collection_name: str) -> AnswerCache:
+    manifest = IngestManifest()
+    return AnswerCache(
+        max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+        ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+        similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+        generation_fn=lambda: manifest.generation(collection_name)
+    )
+
+
 class Chatbot:
-    def __init__(self, collection_name: str, embedding_model: str = "text-embedding-ada-002"):
-        self.qdrant_client = QdrantClient(
+    def __init__(self, collection_name: str, embedding_model: Optional[str] = None,
+                 embedding_cache: EmbeddingCache = None,
+                 answer_cache: AnswerCache = None,
+                 lexical_index: LexicalIndex = None,
+                 hybrid: bool = True,
+                 candidate_multiplier: int = 3,
+                 context_packer: ContextPacker = None,
+                 index_config: VectorIndexConfig = None,
+                 embedding_provider: EmbeddingProvider = None,
+                 qdrant_client=None):
+        self.qdrant_client = qdrant_client or QdrantClient(
             url=os.getenv("QDRANT_URL"),
             api_key=os.getenv("QDRANT_API_KEY")
         )
         self.collection_name = collection_name
-        self.embedding_model = embedding_model
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.embedding_provider = embedding_provider or default_embedding_provider(embedding_model)
+        self.embedding_model = self.embedding_provider.name
+        # Retries are owned by the shared rate limiter
+        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        self.rate_limiter = get_rate_limiter("gpt-4o")
+        self.embedding_cache = embedding_cache or EmbeddingCache()
+        self.answer_cache = answer_cache or default_answer_cache(collection_name)
+        self.lexical_index = (lexical_index or LexicalIndex()) if hybrid else None
+        self.candidate_multiplier = candidate_multiplier
+        self.context_packer = context_packer or ContextPacker(
+            max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "1500"))
+        )
+        self.index_config = index_config or VectorIndexConfig.load()
+        self._executor = ThreadPoolExecutor(max_workers=4)
 
+    @timed("chatbot.embed")
     def _get_embeddings(self, query: str):
-        response = self.openai_client.embeddings.create(
-            model=self.embedding_model, input=[query]
-        )
-        return response.data[0].embedding
+        return self.embedding_cache.get_or_compute(
+            self.embedding_model, [query], self._create_embeddings
+        )[0]
 
-    def search_qdrant(self, query: str, top_k: int = 5):
-        embedding = self._get_embeddings(query)
-        results = self.qdrant_client.search(
+    def _create_embeddings(self, texts):
+        return self.embedding_provider.embed(texts)
+
+    @timed("chatbot.search")
+    def search_qdrant(self, query: str, top_k: int = 5, embedding=None, token: Optional[str] = None,
+                      hnsw_ef: Optional[int] = None, exact: bool = False):
+        search_params = self.index_config.search_params(hnsw_ef, exact)
+        if not self.lexical_index:
+            if embedding is None:
+                embedding = self._get_embeddings(query)
+            return self.qdrant_client.search(
+                collection_name=self.collection_name,
+                query_vector=embedding,
+                query_filter=token_filter(token),
+                search_params=search_params,
+                limit=top_k
+            )
+
+        candidates = top_k * self.candidate_multiplier
+        # The BM25 lookup runs while the query is embedded and searched in Qdrant
+        sparse_future = self._executor.submit(
+            self.lexical_index.search, self.collection_name, query, candidates, token
+        )
+        if embedding is None:
+            embedding = self._get_embeddings(query)
+        dense = self.qdrant_client.search(
             collection_name=self.collection_name,
             query_vector=embedding,
-            limit=top_k
+            query_filter=token_filter(token),
+            search_params=search_params,
+            limit=candidates
         )
-        return results
+        return fuse_results(dense, sparse_future.result(), top_k)
+
+    def _complete(self, messages: list, **kwargs):
+        def request():
+            raw = self.openai_client.chat.completions.with_raw_response.create(
+                model="gpt-4o",
+                messages=messages,
+                max_tokens=150,
+                temperature=0.7,
+                **kwargs
+            )
+            return raw.parse(), raw.headers
 
+        return self.rate_limiter.call(request, tokens=completion_tokens_estimate(messages), priority=INTERACTIVE)
+
+    @timed("chatbot.generate")
     def generate_response(self, query: str, documents: list):
-        context = "\n".join([doc.payload.get("content", "") for doc in documents])
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a knowledgeable assistant specializing in Web3, blockchain, cryptocurrencies, tokens, and related topics."
-                    "Greet the user with a short message and respond to their questions with informative and accurate answers. "
-                    "Answers should be concise, clear, and tailored to the user's query, and don't be repititive." 
-                    "You provide clear, short, concise, to the point and human-like answers tailored to the user's query. "
-                    "Do not use phrases like 'according to the context' or 'based on my knowledge'; instead, provide direct and informative answers. "
-                    "Focus solely on the information available in the context, and avoid unnecessary speculation or verbose explanations. "
-                    "Your goal is to educate and assist users in understanding blockchain and cryptocurrency topics."
-                )
-            },
-            {
-                "role": "user",
-                "content": f"Context:\n{context}\n\nQuestion: {query}\n\nProvide a clear and precise answer from the context, solely on the provided context."
-            }
-        ]
+        messages = build_messages(query, documents, self.context_packer)
         
-        response = self.openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            max_tokens=150,
-            temperature=0.7
+        response = self._complete(messages)
+        record_usage(response)
+        return response.choices[0].message.content.strip()
+
+    def answer(self, query: str, top_k: int = 5, token: Optional[str] = None):
+        """
+        Answers `query` through the answer cache, falling back to search and generation.
+        With `token`, retrieval and caching are limited to that token's documents.
+
+        Returns:
+            Optional[Dict]: `answer`, `sources` and `cached` ("exact", "semantic" or None),
+            or None when nothing relevant was found.
+        """
+        entry = self.answer_cache.lookup_exact(query, scope=token)
+        if entry:
+            return {"answer": entry["answer"], "sources": entry["sources"], "cached": "exact"}
+
+        start = time.perf_counter()
+        embedding = self._get_embeddings(query)
+        entry = self.answer_cache.lookup_similar(embedding, scope=token)
+        if entry:
+            return {"answer": entry["answer"], "sources": entry["sources"], "cached": "semantic"}
+
+        results = self.search_qdrant(query, top_k=top_k, embedding=embedding, token=token)
+        if not results:
+            return None
+        response = self.generate_response(query, results)
+        sources = describe_sources(results)
+        self.answer_cache.store(query, embedding, response, sources, time.perf_counter() - start, scope=token)
+        return {"answer": response, "sources": sources, "cached": None}
+
+    @timed("chatbot.generate_stream")
+    def generate_response_stream(self, query: str, documents: list):
+        """
+        Yields the completion text piece by piece as tokens arrive.
+        """
+        messages = build_messages(query, documents, self.context_packer)
+
+        stream = self._complete(messages, stream=True, stream_options={"include_usage": True})
+        pieces, usage_chunk = [], None
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage_chunk = chunk
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        record_usage(usage_chunk, messages, "".join(pieces))
+
+
+class AsyncChatbot:
+    """
+    Non-blocking variant of `Chatbot` for use inside the FastAPI event loop.
+
+    Every outbound call goes through the async OpenAI and Qdrant clients with a
+    per-request timeout, and at most `max_concurrency` queries hit the upstream
+    APIs at once.
+    """
+
+    def __init__(self, collection_name: str, embedding_model: Optional[str] = None,
+                 embedding_cache: EmbeddingCache = None,
+                 answer_cache: AnswerCache = None,
+                 lexical_index: LexicalIndex = None,
+                 hybrid: bool = True,
+                 candidate_multiplier: int = 3,
+                 context_packer: ContextPacker = None,
+                 index_config: VectorIndexConfig = None,
+                 embedding_provider: EmbeddingProvider = None,
+                 qdrant_client=None,
+                 openai_client=None,
+                 timeout: float = 30.0,
+                 max_concurrency: int = 32,
+                 embedding_batcher: EmbeddingBatcher = None):
+        self.qdrant_client = qdrant_client or AsyncQdrantClient(
+            url=os.getenv("QDRANT_URL"),
+            api_key=os.getenv("QDRANT_API_KEY"),
+            timeout=int(timeout)
         )
+        self.collection_name = collection_name
+        self.embedding_provider = embedding_provider or default_embedding_provider(embedding_model)
+        self.embedding_model = self.embedding_provider.name
+        self.timeout = timeout
+        # Retries are owned by the shared rate limiter
+        self.openai_client = openai_client or AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"), timeout=timeout, max_retries=0
+        )
+        self.rate_limiter = get_rate_limiter("gpt-4o")
+        self.embedding_cache = embedding_cache or EmbeddingCache()
+        self.answer_cache = answer_cache or default_answer_cache(collection_name)
+        self.lexical_index = (lexical_index or LexicalIndex()) if hybrid else None
+        self.candidate_multiplier = candidate_multiplier
+        self.context_packer = context_packer or ContextPacker(
+            max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "1500"))
+        )
+        self.index_config = index_config or VectorIndexConfig.load()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # Concurrent queries that miss the cache are embedded together in one call
+        self.embedding_batcher = embedding_batcher or EmbeddingBatcher(
+            self.embedding_provider.aembed,
+            max_batch_size=min(int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")), self.embedding_provider.max_batch_size),
+            max_wait_ms=float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "2")),
+            timeout=timeout
+        )
+
+    @timed("chatbot.embed")
+    async def _get_embeddings(self, query: str):
+        embeddings = await self.embedding_cache.aget_or_compute(
+            self.embedding_model, [query], self._create_embeddings
+        )
+        return embeddings[0]
+
+    async def _create_embeddings(self, texts):
+        return await self.embedding_batcher.embed_many(texts)
+
+    async def _dense_search(self, query: str, limit: int, embedding, token: Optional[str], search_params=None):
+        if embedding is None:
+            embedding = await self._get_embeddings(query)
+        return await self.qdrant_client.search(
+            collection_name=self.collection_name,
+            query_vector=embedding,
+            query_filter=token_filter(token),
+            search_params=search_params,
+            limit=limit
+        )
+
+    @timed("chatbot.search")
+    async def search_qdrant(self, query: str, top_k: int = 5, embedding=None, token: Optional[str] = None,
+                            hnsw_ef: Optional[int] = None, exact: bool = False):
+        search_params = self.index_config.search_params(hnsw_ef, exact)
+        async with self.semaphore:
+            if not self.lexical_index:
+                return await asyncio.wait_for(
+                    self._dense_search(query, top_k, embedding, token, search_params), self.timeout
+                )
+
+            candidates = top_k * self.candidate_multiplier
+            dense, sparse = await asyncio.wait_for(
+                asyncio.gather(
+                    self._dense_search(query, candidates, embedding, token, search_params),
+                    asyncio.to_thread(self.lexical_index.search, self.collection_name, query, candidates, token)
+                ),
+                self.timeout
+            )
+        return fuse_results(dense, sparse, top_k)
+
+    async def _complete(self, messages: list, **kwargs):
+        async def request():
+            raw = await self.openai_client.chat.completions.with_raw_response.create(
+                model="gpt-4o",
+                messages=messages,
+                max_tokens=150,
+                temperature=0.7,
+                **kwargs
+            )
+            return raw.parse(), raw.headers
+
+        return await self.rate_limiter.acall(request, tokens=completion_tokens_estimate(messages), priority=INTERACTIVE)
+
+    @timed("chatbot.generate")
+    async def generate_response(self, query: str, documents: list):
+        messages = build_messages(query, documents, self.context_packer)
+
+        async with self.semaphore:
+            response = await asyncio.wait_for(self._complete(messages), self.timeout)
+        record_usage(response)
         return response.choices[0].message.content.strip()
+
+    async def lookup_cached(self, query: str, token: Optional[str] = None):
+        """
+        Checks both answer cache tiers.
+
+        Returns:
+            Tuple: (cached result or None, query embedding or None).
+        """
+        entry = self.answer_cache.lookup_exact(query, scope=token)
+        if entry:
+            return {"answer": entry["answer"], "sources": entry["sources"], "cached": "exact"}, None
+
+        async with self.semaphore:
+            embedding = await asyncio.wait_for(self._get_embeddings(query), self.timeout)
+        entry = self.answer_cache.lookup_similar(embedding, scope=token)
+        if entry:
+            return {"answer": entry["answer"], "sources": entry["sources"], "cached": "semantic"}, embedding
+        return None, embedding
+
+    async def answer(self, query: str, top_k: int = 5, token: Optional[str] = None):
+        """
+        Async counterpart of `Chatbot.answer`.
+        """
+        start = time.perf_counter()
+        cached, embedding = await self.lookup_cached(query, token=token)
+        if cached:
+            return cached
+
+        results = await self.search_qdrant(query, top_k=top_k, embedding=embedding, token=token)
+        if not results:
+            return None
+        response = await self.generate_response(query, results)
+        sources = describe_sources(results)
+        self.answer_cache.store(query, embedding, response, sources, time.perf_counter() - start, scope=token)
+        return {"answer": response, "sources": sources, "cached": None}
+
+    @timed("chatbot.generate_stream")
+    async def generate_response_stream(self, query: str, documents: list):
+        """
+        Async generator over completion text pieces as tokens arrive.
+        """
+        messages = build_messages(query, documents, self.context_packer)
+
+        async with self.semaphore:
+            stream = await asyncio.wait_for(
+                self._complete(messages, stream=True, stream_options={"include_usage": True}),
+                self.timeout
+            )
+            pieces, usage_chunk = [], None
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage_chunk = chunk
+                if chunk.choices and chunk.choices[0].delta.content:
+                    pieces.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        record_usage(usage_chunk, messages, "".join(pieces))
@@ -0,0 +1,329 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Callable, Awaitable, Dict, Optional, Tuple, Any
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset durations such as `20ms`, `1s` or `6m0s` into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def classify_error(error: Exception) -> Tuple[bool, bool, Optional[float]]:
+    """
+    Returns (retryable, throttled, retry_after_seconds) for an API exception.
+    """
+    status = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = parse_duration(headers.get("retry-after-ms") and f"{headers.get('retry-after-ms')}ms") \
+        or parse_duration(headers.get("retry-after"))
+    if status == 429:
+        # An exhausted billing quota will not recover by waiting
+        if getattr(error, "code", None) == "insufficient_quota":
+            return False, False, None
+        return True, True, retry_after
+    if status is not None:
+        return status >= 500 or status in (408, 409), False, retry_after
+    # Connection errors and timeouts carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "TimeoutError",
+                                    "ConnectError", "ReadTimeout"), False, None
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, reserve: float = 0.0) -> float:
+        # Requests larger than the whole bucket still go through once it is full
+        amount = min(amount, max(self.capacity - reserve, 1.0))
+        missing = amount + reserve - self.level
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, amount: float):
+        self.level -= amount
+
+    def set_limit(self, per_minute: float):
+        if per_minute > 0 and per_minute != self.capacity:
+            self.capacity = float(per_minute)
+            self.rate = per_minute / 60.0
+            self.level = min(self.level, self.capacity)
+
+
+class RateLimiter:
+    """
+    Client-side throttle for one OpenAI model, shared by every caller in the process.
+
+    Two token buckets track requests/min and tokens/min and are corrected from
+    the `x-ratelimit-*` response headers. Interactive callers go first: bulk
+    callers wait while any interactive caller is waiting and may not dip into
+    the last `bulk_reserve` fraction of either bucket. Bulk concurrency adapts
+    AIMD-style, growing by one slot per window of successes and halving on every
+    429. Failed calls are retried with full-jitter exponential backoff; bulk
+    callers keep retrying 429s for up to `max_throttle_wait` seconds so
+    throttling never drops work.
+    """
+
+    def __init__(self,
+                 name: str,
+                 requests_per_minute: float = 3000,
+                 tokens_per_minute: float = 1_000_000,
+                 bulk_reserve: float = 0.2,
+                 initial_concurrency: int = 4,
+                 min_concurrency: int = 1,
+                 max_concurrency: int = 32,
+                 max_retries: int = 6,
+                 interactive_max_retries: int = 2,
+                 base_delay: float = 0.5,
+                 max_delay: float = 60.0,
+                 max_throttle_wait: float = 900.0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.bulk_reserve = bulk_reserve
+        self.concurrency_limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.interactive_max_retries = interactive_max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_throttle_wait = max_throttle_wait
+        self.blocked_until = 0.0
+        self.bulk_in_flight = 0
+        self.interactive_waiting = 0
+        self.throttled = 0
+        self.retries = 0
+        self._cond = threading.Condition()
+        self.logger = logging.getLogger(__name__)
+
+    def _try_acquire(self, tokens: float, priority: str) -> Optional[float]:
+        """Take capacity and return 0, or return how long to wait (None: until a release)."""
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        request_reserve = token_reserve = 0.0
+        if priority == BULK:
+            if self.interactive_waiting:
+                return 0.01
+            if self.bulk_in_flight >= max(self.min_concurrency, int(self.concurrency_limit)):
+                return None
+            request_reserve = self.requests.capacity * self.bulk_reserve
+            token_reserve = self.tokens.capacity * self.bulk_reserve
+
+        wait = max(self.requests.wait_time(1, request_reserve), self.tokens.wait_time(tokens, token_reserve))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        if priority == BULK:
+            self.bulk_in_flight += 1
+        return 0.0
+
+    def acquire(self, tokens: float, priority: str = BULK):
+        with self._cond:
+            if priority == INTERACTIVE:
+                self.interactive_waiting += 1
+            try:
+                while True:
+                    wait = self._try_acquire(tokens, priority)
+                    if wait == 0.0:
+                        return
+                    self._cond.wait(timeout=min(wait, 1.0) if wait is not None else 1.0)
+            finally:
+                if priority == INTERACTIVE:
+                    self.interactive_waiting -= 1
+
+    async def aacquire(self, tokens: float, priority: str = INTERACTIVE):
+        with self._cond:
+            if priority == INTERACTIVE:
+                self.interactive_waiting += 1
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(tokens, priority)
+                if wait == 0.0:
+                    return
+                await asyncio.sleep(min(wait, 1.0) if wait is not None else 0.05)
+        finally:
+            with self._cond:
+                if priority == INTERACTIVE:
+                    self.interactive_waiting -= 1
+
+    def update_from_headers(self, headers):
+        if not headers:
+            return
+        now = time.monotonic()
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            try:
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if limit:
+                    bucket.set_limit(float(limit))
+                if remaining is not None:
+                    bucket.refill(now)
+                    bucket.level = min(bucket.level, float(remaining))
+                    if float(remaining) <= 0:
+                        reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}")) or 1.0
+                        self.blocked_until = max(self.blocked_until, now + reset)
+            except (TypeError, ValueError):
+                continue
+
+    def release(self, priority: str, throttled: bool = False, headers=None, retry_after: Optional[float] = None):
+        with self._cond:
+            if priority == BULK:
+                self.bulk_in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.concurrency_limit = max(float(self.min_concurrency), self.concurrency_limit / 2)
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            elif priority == BULK:
+                # One extra slot per concurrency_limit successes: additive increase per window
+                self.concurrency_limit = min(float(self.max_concurrency),
+                                             self.concurrency_limit + 1.0 / self.concurrency_limit)
+            self.update_from_headers(headers)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        return max(delay, retry_after or 0.0)
+
+    def _should_retry(self, error: Exception, priority: str, attempt: int, started: float):
+        retryable, throttled, retry_after = classify_error(error)
+        if not retryable:
+            return False, throttled, retry_after
+        if throttled and priority == BULK:
+            return time.monotonic() - started < self.max_throttle_wait, throttled, retry_after
+        limit = self.interactive_max_retries if priority == INTERACTIVE else self.max_retries
+        return attempt < limit, throttled, retry_after
+
+    def call(self, request: Callable[[], Tuple[Any, Any]], tokens: float, priority: str = BULK):
+        """
+        Run `request` (returning `(result, response_headers)`) under the throttle, retrying transient errors.
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            self.acquire(tokens, priority)
+            try:
+                result, headers = request()
+            except Exception as e:
+                retry, throttled, retry_after = self._should_retry(e, priority, attempt, started)
+                self.release(priority, throttled, getattr(getattr(e, "response", None), "headers", None), retry_after)
+                if not retry:
+                    raise
+                delay = self._backoff(attempt, retry_after)
+                self.retries += 1
+                self.logger.warning(f"{self.name} {priority} call failed ({str(e)}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.release(priority, headers=headers)
+            return result
+
+    async def acall(self, request: Callable[[], Awaitable[Tuple[Any, Any]]], tokens: float,
+                    priority: str = INTERACTIVE):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            await self.aacquire(tokens, priority)
+            try:
+                result, headers = await request()
+            except asyncio.CancelledError:
+                self.release(priority)
+                raise
+            except Exception as e:
+                retry, throttled, retry_after = self._should_retry(e, priority, attempt, started)
+                self.release(priority, throttled, getattr(getattr(e, "response", None), "headers", None), retry_after)
+                if not retry:
+                    raise
+                delay = self._backoff(attempt, retry_after)
+                self.retries += 1
+                self.logger.warning(f"{self.name} {priority} call failed ({str(e)}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.release(priority, headers=headers)
+            return result
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "requests_available": round(self.requests.level, 1),
+                "requests_per_minute": self.requests.capacity,
+                "tokens_available": round(self.tokens.level),
+                "tokens_per_minute": self.tokens.capacity,
+                "bulk_concurrency_limit": round(self.concurrency_limit, 2),
+                "bulk_in_flight": self.bulk_in_flight,
+                "throttled": self.throttled,
+                "retries": self.retries,
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter_stats() -> Dict[str, Dict]:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+def max_bulk_concurrency() -> int:
+    """
+    Ceiling on concurrent bulk calls per model (`OPENAI_MAX_BULK_CONCURRENCY`).
+
+    Worker pools that feed a limiter are sized to this, so the limiter's
+    adaptive window, not the pool, decides how many calls are in flight.
+    """
+    return int(os.getenv("OPENAI_MAX_BULK_CONCURRENCY", "32"))
+
+
+def get_rate_limiter(name: str) -> RateLimiter:
+    """
+    Process-wide limiter for one model, so ingestion and the chatbot share its quota.
+
+    Starting limits come from `OPENAI_RPM` / `OPENAI_TPM`; response headers
+    replace them with the account's real limits after the first call.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = RateLimiter(
+                name,
+                requests_per_minute=float(os.getenv("OPENAI_RPM", "3000")),
+                tokens_per_minute=float(os.getenv("OPENAI_TPM", "1000000")),
+                max_concurrency=max_bulk_concurrency()
+            )
+        return limiter
@@ -0,0 +1,156 @@
+import os
+import logging
+from typing import Optional
+
+import yaml
+from qdrant_client.models import (
+    VectorParams,
+    Distance,
+    HnswConfigDiff,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    SearchParams,
+    QuantizationSearchParams,
+)
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = (None, "scalar", "binary")
+
+
+class VectorIndexConfig:
+    """
+    Storage and search settings for the Qdrant collection.
+
+    Creation-time settings (HNSW graph shape, quantization, on-disk storage) only
+    apply when the collection is created; search-time settings (`hnsw_ef`,
+    rescoring, oversampling) apply per query and can be overridden per call.
+    """
+
+    def __init__(self,
+                 vector_size: int = 1536,
+                 distance: str = "Cosine",
+                 hnsw_m: int = 16,
+                 hnsw_ef_construct: int = 100,
+                 hnsw_on_disk: bool = False,
+                 on_disk: bool = False,
+                 quantization: Optional[str] = None,
+                 quantile: float = 0.99,
+                 quantization_always_ram: bool = True,
+                 hnsw_ef: Optional[int] = None,
+                 rescore: bool = True,
+                 oversampling: float = 2.0):
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization `{quantization}`, expected one of {QUANTIZATION_MODES}")
+        self.vector_size = vector_size
+        self.distance = distance
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construct = hnsw_ef_construct
+        self.hnsw_on_disk = hnsw_on_disk
+        self.on_disk = on_disk
+        self.quantization = quantization
+        self.quantile = quantile
+        self.quantization_always_ram = quantization_always_ram
+        self.hnsw_ef = hnsw_ef
+        self.rescore = rescore
+        self.oversampling = oversampling
+
+    @classmethod
+    def from_dict(cls, config: Optional[dict]) -> "VectorIndexConfig":
+        config = dict(config or {})
+        hnsw = config.pop("hnsw", {}) or {}
+        quantization = config.pop("quantization", None)
+        if isinstance(quantization, dict):
+            quantization = dict(quantization)
+            config["quantization"] = quantization.pop("type", None)
+            for key in ("quantile", "always_ram", "rescore", "oversampling"):
+                if key in quantization:
+                    config["quantization_always_ram" if key == "always_ram" else key] = quantization[key]
+        else:
+            config["quantization"] = quantization
+        for key, target in (("m", "hnsw_m"), ("ef_construct", "hnsw_ef_construct"),
+                            ("on_disk", "hnsw_on_disk"), ("ef", "hnsw_ef")):
+            if key in hnsw:
+                config[target] = hnsw[key]
+        return cls(**config)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "VectorIndexConfig":
+        """Read the `vector_index` section of the pipeline config, falling back to defaults."""
+        path = path or os.getenv("PIPELINE_CONFIG", "config.yaml")
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config = yaml.safe_load(f) or {}
+            return cls.from_dict(config.get("vector_index"))
+        except Exception as e:
+            logger.warning(f"Could not read vector index config from {path}, using defaults: {str(e)}")
+            return cls()
+
+    def vectors_config(self) -> VectorParams:
+        return VectorParams(
+            size=self.vector_size,
+            distance=Distance(self.distance),
+            on_disk=self.on_disk
+        )
+
+    def hnsw_config(self) -> HnswConfigDiff:
+        return HnswConfigDiff(
+            m=self.hnsw_m,
+            ef_construct=self.hnsw_ef_construct,
+            on_disk=self.hnsw_on_disk
+        )
+
+    def quantization_config(self):
+        if self.quantization == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8,
+                quantile=self.quantile,
+                always_ram=self.quantization_always_ram
+            ))
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(
+                always_ram=self.quantization_always_ram
+            ))
+        return None
+
+    def search_params(self, hnsw_ef: Optional[int] = None, exact: bool = False) -> Optional[SearchParams]:
+        hnsw_ef = hnsw_ef or self.hnsw_ef
+        quantization = None
+        if self.quantization:
+            # Quantized scores are approximate: fetch extra candidates and rescore with the original vectors
+            quantization = QuantizationSearchParams(
+                ignore=exact,
+                rescore=self.rescore,
+                oversampling=self.oversampling
+            )
+        if not (hnsw_ef or exact or quantization):
+            return None
+        return SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
+
+    def estimate_memory(self, num_vectors: int) -> dict:
+        """Rough RAM/disk footprint in bytes for `num_vectors` points, for capacity planning."""
+        original = num_vectors * self.vector_size * 4
+        if self.quantization == "scalar":
+            quantized = num_vectors * self.vector_size
+        elif self.quantization == "binary":
+            quantized = num_vectors * ((self.vector_size + 7) // 8)
+        else:
+            quantized = 0
+        # Layer 0 keeps 2*m links per point, upper layers add a small fraction on top
+        graph = int(num_vectors * self.hnsw_m * 2 * 4 * 1.1)
+        ram = quantized if (quantized and self.quantization_always_ram) else 0
+        ram += 0 if self.on_disk else original
+        ram += 0 if self.hnsw_on_disk else graph
+        return {
+            "vectors": num_vectors,
+            "original_vectors_bytes": original,
+            "quantized_vectors_bytes": quantized,
+            "hnsw_graph_bytes": graph,
+            "ram_bytes": ram,
+            "disk_bytes": original + quantized + graph,
+        }
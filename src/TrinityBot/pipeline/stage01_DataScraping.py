@@ -1,44 +1,48 @@
 import os
-import json
-from datetime import datetime
-from urllib.parse import urlparse
+import yaml
 from dotenv import load_dotenv
 from TrinityBot.components.datascraping import SSRScraper
+from TrinityBot.components.crawlstate import CrawlState
+from TrinityBot.components.dedup import ContentDeduplicator
+from TrinityBot.components.artifacts import ArtifactStore
 
 load_dotenv()
 
 artifacts_dir = os.getenv("SCRAPPED_DATA_DIRECTORY", "artifacts/ScrappedData")
-os.makedirs(artifacts_dir, exist_ok=True)
-
-urls_to_scrape = {
-    "trakx": "https://token.trakx.io/",
-    "bidnow": "https://www.bidnow.my/"
-}
-
-scraper = SSRScraper(
-    use_selenium=True,
-    max_pages=5,
-    concurrent_requests=3,
-    chunk_size=1000,
-    chunk_overlap=200
-)
-
-try:
-    for token, url in urls_to_scrape.items():
-        print(f"Starting scrape for URL: {url} (Token: {token})")
-        
-        documents = scraper.scrape_site(
-            start_url=url,
-            max_depth=1
-        )
-        
-        filename = os.path.join(
-            artifacts_dir,
-            f"{token}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        )
-        with open(filename, "w", encoding="utf-8") as file:
-            json.dump([doc.dict() for doc in documents], file, ensure_ascii=False, indent=4)
-        
-        print(f"Scraped data saved to {filename}")
-finally:
-    scraper.cleanup()
+
+
+def main():
+    artifact_store = ArtifactStore(artifacts_dir)
+
+    with open(os.getenv("PIPELINE_CONFIG", "config.yaml"), "r", encoding="utf-8") as f:
+        scrape_config = dict(yaml.safe_load(f)["scrape_config"])
+
+    urls_to_scrape = scrape_config.pop("urls_to_scrape")
+    max_depth = scrape_config.pop("max_depth", 1)
+
+    scraper = SSRScraper(
+        **scrape_config,
+        crawl_state=CrawlState(),
+        deduplicator=ContentDeduplicator()
+    )
+
+    try:
+        for token, url in urls_to_scrape.items():
+            print(f"Starting scrape for URL: {url} (Token: {token})")
+
+            with artifact_store.writer(token) as writer:
+                scraper.artifact_writer = writer
+                documents = scraper.scrape_site(
+                    start_url=url,
+                    max_depth=max_depth
+                )
+
+            print(f"Scraped {len(documents)} documents to {os.path.join(artifacts_dir, writer.filename)}")
+            print(f"Deduplication: {scraper.dedup_stats}")
+    finally:
+        scraper.cleanup()
+
+
+# Chunking workers are spawned processes, which import this module again
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,48 @@
 import os
-import json
-from typing import List, Dict
 from TrinityBot.components.qdrantdumping import QdrantDumper
+from TrinityBot.components.artifacts import ArtifactStore
+from TrinityBot.components.crawlstate import CrawlState
 from dotenv import load_dotenv
 
 load_dotenv()
 
 artifacts_dir = os.getenv("SCRAPPED_DATA_DIRECTORY", "artifacts/ScrappedData")
+batch_size = int(os.getenv("DUMP_BATCH_SIZE", "500"))
 
 qdrant_dumper = QdrantDumper(
     collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
 )
 
-def load_scraped_data(directory: str) -> List[Dict]:
-    documents = []
-    for filename in os.listdir(directory):
-        if filename.endswith(".json"):
-            filepath = os.path.join(directory, filename)
-            with open(filepath, "r", encoding="utf-8") as file:
-                data = json.load(file)
-                if isinstance(data, list):
-                    documents.extend(data)
-                else:
-                    documents.append(data)
-    return documents
-
 
 def main():
     print("Starting Qdrant dumping process...")
-    documents = load_scraped_data(artifacts_dir)
-    print(f"Loaded {len(documents)} documents: {documents[:2]}")  
-    if documents:
-        print(f"Loaded {len(documents)} documents from {artifacts_dir}")
-        qdrant_dumper.dump_documents(documents)
-        print("All documents have been successfully dumped to Qdrant.")
-    else:
+    artifact_store = ArtifactStore(artifacts_dir)
+    pending = artifact_store.pending_files()
+    if not pending:
         print("No documents found to dump.")
+        return
+
+    crawl_state = CrawlState()
+    print(f"Found {len(pending)} new artifact files in {artifacts_dir}")
+    for filename in pending:
+        loaded = 0
+        incomplete = set()
+        # Documents are streamed in batches so memory stays flat as the corpus grows
+        for documents in artifact_store.iter_batches(filename, batch_size=batch_size):
+            loaded += len(documents)
+            stats = qdrant_dumper.dump_documents(documents)
+            incomplete.update(stats.get("incomplete_sources", []))
+            print(f"{filename}: dumped batch of {len(documents)} documents: {stats}")
+        if incomplete:
+            # Left pending so the next run retries the chunks that were not stored,
+            # and the pages are re-extracted on the next crawl even if unchanged
+            crawl_state.invalidate(incomplete)
+            print(f"Kept {filename} pending: {len(incomplete)} pages were not fully stored")
+            continue
+        artifact_store.mark_consumed(filename)
+        print(f"Finished {filename} ({loaded} documents)")
+
+    print("All documents have been successfully dumped to Qdrant.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,433 @@
+import time
+import queue
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from TrinityBot.components.qdrantdumping import QdrantDumper
+from TrinityBot.components.datascraping import SSRScraper
+from TrinityBot.components.crawlstate import CrawlState
+from TrinityBot.components.dedup import ContentDeduplicator
+from TrinityBot.components.artifacts import ArtifactStore, removed_record
+from TrinityBot.components.ratelimiter import max_bulk_concurrency
+
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+        self._lock = threading.Lock()
+
+    def record(self, busy: float, queue_depth: int, items: int = 1):
+        with self._lock:
+            self.items += items
+            self.busy_seconds += busy
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+            self._depth_total += queue_depth
+            self._depth_samples += 1
+
+    def add_items(self, items: int = 1):
+        with self._lock:
+            self.items += items
+
+    def as_dict(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "max_queue_depth": self.max_queue_depth,
+            "mean_queue_depth": round(self._depth_total / self._depth_samples, 2) if self._depth_samples else 0.0,
+        }
+
+
+class _Replacement:
+    """
+    Stale chunk ids of one re-crawled page. They are deleted only once every new
+    chunk of the page is stored, so a failure midway keeps the old chunks searchable.
+    """
+
+    def __init__(self, source: str, token: str, stale_ids: List[str], pending: int):
+        self.source = source
+        self.token = token
+        self.stale_ids = stale_ids
+        self.pending = pending
+        self.failed = False
+
+    @property
+    def complete(self) -> bool:
+        return self.pending == 0 and not self.failed
+
+
+class _Aborted(Exception):
+    """Raised inside a stage worker once another stage has failed."""
+
+
+class _Stage:
+    """
+    A pool of worker threads reading one input queue. When the last worker exits,
+    one end marker per downstream worker is put on the output queue.
+
+    A worker that raises sets the shared `abort` event. Every other worker then
+    leaves its next (or current) blocking get or put, so no stage waits forever
+    on a queue nobody reads, and the error is kept for the pipeline to raise.
+    """
+
+    # How often a worker blocked on a queue checks the abort event
+    _POLL_SECONDS = 0.1
+
+    def __init__(self, name: str, workers: int, target: Callable, in_queue: queue.Queue,
+                 out_queue: Optional[queue.Queue], downstream_workers: int, abort: threading.Event):
+        self.stats = StageStats(name, workers)
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.downstream_workers = downstream_workers
+        self.abort = abort
+        self.error: Optional[Exception] = None
+        self._remaining = workers
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self.threads = [
+            threading.Thread(target=self._run, args=(target,), name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def _run(self, target: Callable):
+        try:
+            target(self)
+        except _Aborted:
+            pass
+        except Exception as e:
+            self.logger.error(f"Stage {self.stats.name} worker failed, aborting the pipeline: {str(e)}")
+            with self._lock:
+                self.error = self.error or e
+            self.abort.set()
+        finally:
+            with self._lock:
+                self._remaining -= 1
+                last = self._remaining == 0
+            if last and self.out_queue is not None:
+                try:
+                    for _ in range(self.downstream_workers):
+                        self.emit(_DONE)
+                except _Aborted:
+                    pass
+
+    def get(self, timeout: Optional[float] = None):
+        depth = self.in_queue.qsize()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            if self.abort.is_set():
+                raise _Aborted()
+            wait = self._POLL_SECONDS if deadline is None else min(self._POLL_SECONDS, deadline - time.monotonic())
+            try:
+                item = self.in_queue.get(timeout=max(wait, 0))
+                break
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+        with self.stats._lock:
+            self.stats.max_queue_depth = max(self.stats.max_queue_depth, depth)
+        return item, depth
+
+    def emit(self, item):
+        # Blocks while the downstream queue is full, which is the backpressure
+        while True:
+            if self.abort.is_set():
+                raise _Aborted()
+            try:
+                self.out_queue.put(item, timeout=self._POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+
+class StreamingPipeline:
+    """
+    Runs crawl -> prepare -> embed -> upsert in one process, connected by bounded queues.
+
+    Crawl workers fetch, extract and chunk pages (one target site at a time per
+    worker). The prepare stage drops chunks the manifest already knows and packs
+    new chunks into embedding batches. Stale chunks of a re-crawled page are
+    deleted once all of its new chunks are upserted.
+    Embed workers call the embedding API concurrently and the upsert stage writes
+    bulk upserts. Embedding starts with the first crawled page, so wall time
+    approaches the slowest stage rather than the sum of the stages.
+    """
+
+    def __init__(self,
+                 dumper: QdrantDumper,
+                 targets: Dict[str, str],
+                 max_depth: int = 1,
+                 scraper_options: Optional[Dict] = None,
+                 crawl_workers: int = 2,
+                 embed_workers: Optional[int] = None,
+                 upsert_workers: int = 1,
+                 queue_size: int = 64,
+                 flush_interval: float = 1.0,
+                 artifact_store: Optional[ArtifactStore] = None,
+                 crawl_state: Optional[CrawlState] = None,
+                 deduplicator: Optional[ContentDeduplicator] = None):
+        self.dumper = dumper
+        self.targets = targets
+        self.max_depth = max_depth
+        self.scraper_options = scraper_options or {}
+        self.crawl_workers = crawl_workers
+        self.embed_workers = embed_workers or max_bulk_concurrency()
+        self.upsert_workers = upsert_workers
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.artifact_store = artifact_store
+        self.crawl_state = crawl_state
+        self.deduplicator = deduplicator
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._counts = {"pages": 0, "unchanged_pages": 0, "chunks": 0, "unchanged_chunks": 0,
+                        "inserted": 0, "deleted": 0}
+        self._artifacts: List[Tuple[str, str]] = []
+        self._replacements: List[_Replacement] = []
+        self._dedup: Dict[str, Dict] = {}
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self._counts[key] += value
+
+    def _crawl(self, stage: _Stage):
+        while True:
+            target, depth = stage.get()
+            if target is _DONE:
+                return
+            token, url = target
+            start = time.perf_counter()
+            scraper = SSRScraper(crawl_state=self.crawl_state, deduplicator=self.deduplicator,
+                                 **self.scraper_options)
+            writer = self.artifact_store.writer(token) if self.artifact_store else None
+            scraper.artifact_writer = writer
+            try:
+                asyncio.run(self._crawl_site(scraper, stage, url, token))
+            except _Aborted:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error crawling {url}: {str(e)}")
+            finally:
+                scraper.cleanup()
+                if scraper.dedup_stats:
+                    with self._lock:
+                        self._dedup[token] = scraper.dedup_stats
+                if writer:
+                    writer.close()
+                    with self._lock:
+                        self._artifacts.append((token, writer.filename))
+            stage.stats.record(time.perf_counter() - start, depth, items=0)
+
+    async def _crawl_site(self, scraper: SSRScraper, stage: _Stage, url: str, token: str):
+        async for page in scraper.crawl_site_async(url, max_depth=self.max_depth, token=token):
+            if 'documents' not in page:
+                continue
+            stage.stats.add_items()
+            self._count(pages=1, unchanged_pages=1 if page.get('unchanged') else 0)
+            if page.get('removed'):
+                # Nothing of its own left after deduplication; prepare deletes what it had stored
+                await asyncio.to_thread(stage.emit, [removed_record(page['url'], token)])
+            elif page['documents']:
+                documents = [
+                    {"page_content": doc.page_content, "metadata": doc.metadata} for doc in page['documents']
+                ]
+                await asyncio.to_thread(stage.emit, documents)
+
+    def _settle(self, replacements: List[_Replacement], stored: bool):
+        """
+        Records that the chunks behind `replacements` (one entry per chunk) were
+        stored or given up on, and deletes the stale ids of pages that are complete.
+        """
+        ready = []
+        with self._lock:
+            for replacement in replacements:
+                replacement.pending -= 1
+                replacement.failed = replacement.failed or not stored
+                if replacement.complete:
+                    ready.extend(replacement.stale_ids)
+        if ready:
+            self._count(deleted=self.dumper._delete_points(ready))
+
+    def _prepare(self, stage: _Stage):
+        dumper = self.dumper
+        batch, owners, batch_tokens = [], [], 0
+
+        def flush():
+            nonlocal batch, owners, batch_tokens
+            if batch:
+                stage.emit((batch, owners))
+                batch, owners, batch_tokens = [], [], 0
+
+        while True:
+            try:
+                documents, depth = stage.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # Crawling is slow right now; do not hold a partial batch back
+                flush()
+                continue
+            if documents is _DONE:
+                break
+
+            start = time.perf_counter()
+            documents, removed = dumper._split_removed(documents)
+            items = dumper._document_items(documents)
+            new_items, known = dumper._filter_known(items)
+            stale_ids = dumper._stale_ids({item[2]["source"] for item in items} | removed,
+                                          {item[0] for item in items})
+            self._count(chunks=len(items), unchanged_chunks=known)
+            if not new_items:
+                # Nothing to write first: the page only lost chunks
+                self._count(deleted=dumper._delete_points(stale_ids))
+            if not items:
+                stage.stats.record(time.perf_counter() - start, depth)
+                continue
+            replacement = _Replacement(items[0][2]["source"], items[0][2]["token"], stale_ids, len(new_items))
+            self._replacements.append(replacement)
+
+            for item in new_items:
+                tokens = dumper._estimate_tokens(item[1])
+                if batch and (len(batch) >= dumper.embedding_batch_size
+                              or batch_tokens + tokens > dumper.max_batch_tokens):
+                    flush()
+                batch.append(item)
+                owners.append(replacement)
+                batch_tokens += tokens
+            stage.stats.record(time.perf_counter() - start, depth)
+        flush()
+
+    def _embed(self, stage: _Stage):
+        while True:
+            message, depth = stage.get()
+            if message is _DONE:
+                return
+            batch, owners = message
+            start = time.perf_counter()
+            points = self.dumper._embed_batch(batch)
+            stage.stats.record(time.perf_counter() - start, depth, items=len(batch))
+            embedded = {point.id for point in points}
+            failed = [owner for item, owner in zip(batch, owners) if item[0] not in embedded]
+            if failed:
+                self._settle(failed, stored=False)
+            if points:
+                by_id = {item[0]: owner for item, owner in zip(batch, owners)}
+                stage.emit((points, [by_id[point.id] for point in points]))
+
+    def _upsert(self, stage: _Stage):
+        pending, owners = [], []
+
+        def flush(points, replacements):
+            start = time.perf_counter()
+            inserted = self.dumper._upsert_points(points)
+            self._count(inserted=inserted)
+            if inserted == len(points):
+                self._settle(replacements, stored=True)
+            else:
+                stored = self.dumper.manifest.known_ids(self.dumper.collection_name, [point.id for point in points])
+                for point, replacement in zip(points, replacements):
+                    self._settle([replacement], stored=point.id in stored)
+            return time.perf_counter() - start
+
+        while True:
+            try:
+                message, depth = stage.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if pending:
+                    stage.stats.record(flush(pending, owners), 0, items=len(pending))
+                    pending, owners = [], []
+                continue
+            if message is _DONE:
+                break
+            pending.extend(message[0])
+            owners.extend(message[1])
+            size = self.dumper.upsert_batch_size
+            while len(pending) >= size:
+                stage.stats.record(flush(pending[:size], owners[:size]), depth, items=size)
+                pending, owners = pending[size:], owners[size:]
+        if pending:
+            stage.stats.record(flush(pending, owners), 0, items=len(pending))
+
+    def run(self) -> Dict:
+        """
+        Runs all stages to completion.
+
+        Returns:
+            Dict: Overall counts, wall time and per-stage items, busy time and queue depths.
+
+        Raises:
+            RuntimeError: When a stage worker failed; the other stages are stopped
+                and crawled artifacts are left unconsumed.
+        """
+        start = time.perf_counter()
+        abort = threading.Event()
+        targets_q = queue.Queue()
+        pages_q = queue.Queue(maxsize=self.queue_size)
+        batches_q = queue.Queue(maxsize=self.queue_size)
+        points_q = queue.Queue(maxsize=self.queue_size)
+
+        for token, url in self.targets.items():
+            targets_q.put((token, url))
+        for _ in range(self.crawl_workers):
+            targets_q.put(_DONE)
+
+        stages = [
+            _Stage("crawl", self.crawl_workers, self._crawl, targets_q, pages_q, 1, abort),
+            _Stage("prepare", 1, self._prepare, pages_q, batches_q, self.embed_workers, abort),
+            _Stage("embed", self.embed_workers, self._embed, batches_q, points_q, self.upsert_workers, abort),
+            _Stage("upsert", self.upsert_workers, self._upsert, points_q, None, 0, abort),
+        ]
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+        if self._counts["inserted"] or self._counts["deleted"]:
+            self.dumper.manifest.bump_generation(self.dumper.collection_name)
+        # Pages whose chunks were not all stored (rate limited, failed, or aborted)
+        incomplete = [replacement for replacement in self._replacements if not replacement.complete]
+        if incomplete and self.crawl_state:
+            # Their crawl state already matches the page; forget it so the next crawl re-extracts them
+            self.crawl_state.invalidate({replacement.source for replacement in incomplete})
+        failed = next((stage for stage in stages if stage.error is not None), None)
+        if failed:
+            raise RuntimeError(f"Pipeline aborted, stage {failed.stats.name} failed: {str(failed.error)}") \
+                from failed.error
+        if self.artifact_store:
+            # Artifacts holding unstored chunks stay pending for the stage 2 dumper
+            retry_tokens = {replacement.token for replacement in incomplete}
+            for token, filename in self._artifacts:
+                if token not in retry_tokens:
+                    self.artifact_store.mark_consumed(filename)
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            **self._counts,
+            "wall_seconds": round(elapsed, 3),
+            "chunks_per_sec": round(self._counts["inserted"] / elapsed, 2) if elapsed > 0 else 0.0,
+            "stages": {stage.stats.name: stage.stats.as_dict() for stage in stages},
+        }
+        if self._dedup:
+            stats["dedup"] = dict(self._dedup)
+        if incomplete:
+            stats["incomplete_pages"] = len(incomplete)
+        self.logger.info(f"Pipeline finished in {elapsed:.2f}s: {stats}")
+        return stats
@@ -0,0 +1,17 @@
+import uuid
+import hashlib
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def make_chunk_id(source: str, position, content: str) -> str:
+    """
+    Builds a deterministic Qdrant point ID from a chunk's source, position and content.
+
+    The same chunk always maps to the same UUID, so re-ingesting unchanged data
+    overwrites points instead of duplicating them.
+    """
+    digest = hashlib.sha256(f"{source}\x00{position}\x00{content_hash(content)}".encode("utf-8")).hexdigest()
+    return str(uuid.UUID(digest[:32]))
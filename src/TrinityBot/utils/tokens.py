@@ -0,0 +1,110 @@
+import re
+import logging
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rough stand-in for BPE tokens: words, numbers and single punctuation marks
+_APPROX_TOKEN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_WORD_CHAR = re.compile(r"\w", re.UNICODE)
+_SPACE_CHAR = re.compile(r"\s", re.UNICODE)
+# Character classes of `_APPROX_TOKEN`: a token is a run of word characters or one other non-space character
+_SPACE, _WORD, _OTHER = 0, 1, 2
+
+
+def _char_class(char: str) -> int:
+    if _WORD_CHAR.match(char):
+        return _WORD
+    return _SPACE if _SPACE_CHAR.match(char) else _OTHER
+
+
+_ASCII_CLASSES = np.array([_char_class(chr(code)) for code in range(128)], dtype=np.int8)
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken is optional and downloads its vocabularies on first use
+        logger.warning(f"tiktoken unavailable ({str(e)}); using approximate token counts")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(_APPROX_TOKEN.findall(text))
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _approximate_starts(text: str) -> np.ndarray:
+    # Same offsets as the starts of `_APPROX_TOKEN` matches, from character classes instead of match objects
+    codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    if not len(codes):
+        return np.zeros(0, dtype=np.int64)
+    classes = _ASCII_CLASSES[np.minimum(codes, 127)]
+    wide = codes > 127
+    if wide.any():
+        unique, inverse = np.unique(codes[wide], return_inverse=True)
+        classes[wide] = np.array([_char_class(chr(code)) for code in unique.tolist()], dtype=np.int8)[inverse]
+    words = classes == _WORD
+    starts = classes == _OTHER
+    starts[0] |= words[0]
+    starts[1:] |= words[1:] & ~words[:-1]
+    return np.flatnonzero(starts)
+
+
+def _encoded_starts(encoding, text: str) -> np.ndarray:
+    # Same offsets as `Encoding.decode_with_offsets`, without its per-byte Python loop
+    token_bytes = encoding.decode_tokens_bytes(encoding.encode(text, disallowed_special=()))
+    if not token_bytes:
+        return np.zeros(0, dtype=np.int64)
+    lengths = np.fromiter(map(len, token_bytes), dtype=np.int64, count=len(token_bytes))
+    data = np.frombuffer(b"".join(token_bytes), dtype=np.uint8)
+    # Every byte but a UTF-8 continuation byte starts a character
+    leads = (data & 0xC0) != 0x80
+    chars_before = np.concatenate(([0], np.cumsum(leads)))
+    byte_starts = np.cumsum(lengths) - lengths
+    # A token starting inside a character belongs to that character
+    return np.maximum(chars_before[byte_starts] - ~leads[byte_starts], 0)
+
+
+def token_starts(text: str, model: str = "gpt-4o") -> np.ndarray:
+    """
+    Character offset where each token of `text` begins, from a single tokenization, as an integer array.
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return _approximate_starts(text)
+    return _encoded_starts(encoding, text)
+
+
+def token_spans(text: str, model: str = "gpt-4o") -> List[Tuple[int, int]]:
+    """
+    Character (start, end) offsets of each token in `text`.
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return [match.span() for match in _APPROX_TOKEN.finditer(text)]
+    decoded, offsets = encoding.decode_with_offsets(encoding.encode(text, disallowed_special=()))
+    ends = offsets[1:] + [len(decoded)]
+    return list(zip(offsets, ends))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding(model)
+    if encoding is None:
+        spans = token_spans(text, model)
+        return text if len(spans) <= max_tokens else text[:spans[max_tokens - 1][1]]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
@@ -0,0 +1,11 @@
+from qdrant_client import QdrantClient
+
+from benchmarks.bench_suite import COLLECTION, build_dumper
+
+
+def test_suite_dumper_builds_with_default_provider(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "bench")
+    monkeypatch.setenv("EMBEDDING_PROVIDER", "openai")
+    dumper = build_dumper(QdrantClient(location=":memory:"), str(tmp_path))
+    assert dumper.collection_name == COLLECTION
+    assert dumper.qdrant_client.collection_exists(COLLECTION)
@@ -0,0 +1,62 @@
+from TrinityBot.components.chunking import ParallelChunker, TextChunker
+from TrinityBot.utils.tokens import _APPROX_TOKEN, _approximate_starts, _encoded_starts, count_tokens
+
+
+def sentence(word, words=9):
+    return " ".join([word] * words) + "."
+
+
+def test_chunks_respect_budget_and_count_tokens_once():
+    text = "\n\n".join(" ".join(sentence(f"w{p}{s}") for s in range(7)) for p in range(20))
+    text += "\n\n" + " ".join(["runon"] * 500)
+    chunks = TextChunker(max_tokens=64, overlap_tokens=12).chunk_text(text)
+    assert all(chunk.tokens == count_tokens(chunk.text) <= 64 for chunk in chunks)
+    # The run-on tail is cut on tokens, overlapping by `overlap_tokens`
+    assert chunks[-1].text.split()[-1] == "runon"
+
+
+def test_overlap_repeats_sentences_but_not_paragraphs():
+    paragraph = " ".join(sentence(f"s{i}") for i in range(12))
+    chunker = TextChunker(max_tokens=40, overlap_tokens=10)
+    chunks = chunker.chunk_text(f"{paragraph}\n\n{paragraph.replace('s', 't')}")
+    # Each sentence is 10 tokens: four per chunk, the last one repeated in the next
+    assert chunks[0].text.endswith(sentence("s3")) and chunks[1].text.startswith(sentence("s3"))
+    first_of_second = next(chunk for chunk in chunks if "t0" in chunk.text)
+    assert first_of_second.text.startswith(sentence("t0"))
+
+
+def test_segments_stream_with_page_labels():
+    pages = [(page, " ".join(sentence(f"p{page}x{i}") for i in range(5))) for page in range(1, 4)]
+    chunks = list(TextChunker(max_tokens=32, overlap_tokens=8).iter_chunks(pages))
+    assert chunks[0].start == 1 and chunks[-1].end == 3
+    assert any(chunk.start != chunk.end for chunk in chunks)
+    assert all(chunk.tokens <= 32 for chunk in chunks)
+
+
+def test_split_many_in_processes_matches_inline():
+    chunker = TextChunker(max_tokens=32, overlap_tokens=8)
+    texts = [" ".join(sentence(f"d{d}s{i}") for i in range(d + 3)) for d in range(6)]
+    pool = ParallelChunker(chunker, 2)
+    try:
+        assert pool.split_many(texts) == [chunker.split_text(text) for text in texts]
+        assert pool.split_text(texts[-1]) == chunker.split_text(texts[-1])
+    finally:
+        pool.close()
+
+
+def test_token_offsets_match_the_tokenizers():
+    text = "Déjà vu, 数据 and ☃… “quoted” snake_case 3.14\n\n\ud800 end"
+    assert _approximate_starts(text).tolist() == [match.start() for match in _APPROX_TOKEN.finditer(text)]
+
+    class ByteEncoding:
+        # Two-byte tokens, so multi-byte characters are split across tokens
+        def encode(self, text, disallowed_special=()):
+            data = text.encode("utf-8")
+            return [data[i:i + 2] for i in range(0, len(data), 2)]
+
+        def decode_tokens_bytes(self, tokens):
+            return tokens
+
+    offsets = _encoded_starts(ByteEncoding(), "aé€b")
+    # Same as tiktoken's decode_with_offsets: a token starting mid-character points at that character
+    assert offsets.tolist() == [0, 1, 2, 3]
@@ -0,0 +1,37 @@
+from TrinityBot.components.datascraping import FetchResult, SSRScraper
+
+RICH = "<html><body><p>" + "Plenty of static text. " * 40 + "</p><a href='/next'>next</a></body></html>"
+THIN = "<html><body><div id='app'></div></body></html>"
+
+
+def hybrid_scraper(static_html, rendered_html=RICH):
+    scraper = SSRScraper(render_mode="hybrid", max_retries=1)
+    calls = {"extract": 0, "browser": 0}
+    extract = scraper._extract_page
+
+    def counting_extract(html, url):
+        calls["extract"] += 1
+        return extract(html, url)
+
+    def browser(url):
+        calls["browser"] += 1
+        return rendered_html
+
+    scraper._extract_page = counting_extract
+    scraper._get_with_requests = lambda url: FetchResult(static_html)
+    scraper._get_with_selenium = browser
+    return scraper, calls
+
+
+def test_hybrid_static_page_is_extracted_once():
+    scraper, calls = hybrid_scraper(RICH)
+    result = scraper.scrape_url("http://127.0.0.1/page", token="t")
+    assert result["documents"] and result["links"] == ["http://127.0.0.1/next"]
+    assert calls == {"extract": 1, "browser": 0}
+
+
+def test_hybrid_thin_page_is_rendered():
+    scraper, calls = hybrid_scraper(THIN)
+    result = scraper.scrape_url("http://127.0.0.1/page", token="t")
+    assert result["documents"]
+    assert calls == {"extract": 2, "browser": 1}
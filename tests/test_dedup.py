@@ -0,0 +1,31 @@
+from TrinityBot.components.dedup import ContentDeduplicator
+
+SITE = "example.com"
+HERO = "Welcome to Example, the fastest way to trade tokens with zero fees and instant settlement worldwide today"
+A_BODY = "Page A explains staking rewards, lockup periods and how payouts are calculated for every validator"
+B_BODY = "Page B lists supported wallets, hardware devices and browser extensions that can connect to the app"
+
+
+def test_released_block_orphans_pages_that_lost_it(tmp_path):
+    dedup = ContentDeduplicator(str(tmp_path / "dedup.sqlite3"))
+    assert HERO in dedup.filter_page(SITE, "/a", f"{HERO}\n\n{A_BODY}")
+    assert HERO not in dedup.filter_page(SITE, "/b", f"{HERO}\n\n{B_BODY}")
+    assert dedup.take_orphaned(SITE) == set()
+
+    # /a drops the hero block, so /b has to be re-processed to claim it
+    dedup.filter_page(SITE, "/a", A_BODY)
+    assert dedup.take_orphaned(SITE) == {"/b"}
+    assert dedup.take_orphaned(SITE) == set()
+    assert HERO in dedup.filter_page(SITE, "/b", f"{HERO}\n\n{B_BODY}")
+
+
+def test_dropped_page_keeps_its_suppression_record(tmp_path):
+    dedup = ContentDeduplicator(str(tmp_path / "dedup.sqlite3"))
+    dedup.filter_page(SITE, "/a", f"{HERO}\n\n{A_BODY}")
+    # A mirror of /a is dropped outright
+    assert dedup.filter_page(SITE, "/mirror", f"{HERO}\n\n{A_BODY}") is None
+
+    # Persisted: a new instance sees the same ownership
+    dedup = ContentDeduplicator(str(tmp_path / "dedup.sqlite3"))
+    dedup.filter_page(SITE, "/a", B_BODY)
+    assert dedup.take_orphaned(SITE) == {"/mirror"}
@@ -0,0 +1,91 @@
+import threading
+
+from TrinityBot.components.driverpool import DriverPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_waiter_wakes_when_driver_is_recycled():
+    created = []
+
+    def factory():
+        created.append(FakeDriver())
+        return created[-1]
+
+    pool = DriverPool(factory, size=1, max_loads=1)
+    first_holding = threading.Event()
+    release_first = threading.Event()
+    results = []
+
+    def first():
+        with pool.acquire():
+            first_holding.set()
+            release_first.wait(5)
+        results.append("first")
+
+    def second():
+        first_holding.wait(5)
+        with pool.acquire():
+            results.append("second")
+
+    threads = [threading.Thread(target=first, daemon=True), threading.Thread(target=second, daemon=True)]
+    for thread in threads:
+        thread.start()
+    first_holding.wait(5)
+    release_first.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert sorted(results) == ["first", "second"]
+    # The first driver hit max_loads and was replaced rather than handed on
+    assert len(created) == 2 and created[0].quit_called
+
+
+def test_waiter_wakes_when_unhealthy_driver_is_discarded():
+    pool = DriverPool(FakeDriver, size=1, max_loads=10)
+    holding = threading.Event()
+    fail = threading.Event()
+    acquired = []
+
+    def failing():
+        try:
+            with pool.acquire():
+                holding.set()
+                fail.wait(5)
+                raise RuntimeError("browser crashed")
+        except RuntimeError:
+            pass
+
+    def waiting():
+        holding.wait(5)
+        with pool.acquire() as driver:
+            acquired.append(driver)
+
+    threads = [threading.Thread(target=failing, daemon=True), threading.Thread(target=waiting, daemon=True)]
+    for thread in threads:
+        thread.start()
+    holding.wait(5)
+    fail.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert len(acquired) == 1
+
+
+def test_idle_drivers_are_reused():
+    pool = DriverPool(FakeDriver, size=2, max_loads=10)
+    with pool.acquire() as first:
+        pass
+    with pool.acquire() as second:
+        pass
+    assert first is second
+    pool.close()
+    assert first.quit_called
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from TrinityBot.components.embeddingbatcher import EmbeddingBatcher
+
+
+def test_timed_out_batch_does_not_poison_later_requests():
+    calls = []
+    hang = {"value": True}
+
+    async def embed_fn(texts):
+        calls.append(list(texts))
+        if hang["value"]:
+            await asyncio.sleep(3600)
+        return [[float(len(text))] for text in texts]
+
+    async def scenario():
+        batcher = EmbeddingBatcher(embed_fn, max_wait_ms=1, timeout=0.05)
+        for _ in range(3):
+            with pytest.raises(asyncio.TimeoutError):
+                await batcher.embed("what is trakx")
+        assert not batcher._in_flight and not batcher._pending
+        hang["value"] = False
+        return await batcher.embed("what is trakx")
+
+    assert asyncio.run(scenario()) == [13.0]
+    # Every attempt reached upstream instead of joining the stuck call
+    assert len(calls) == 4
+
+
+def test_failed_batch_is_retried_fresh():
+    attempts = []
+
+    async def embed_fn(texts):
+        attempts.append(texts)
+        if len(attempts) == 1:
+            raise RuntimeError("upstream error")
+        return [[1.0] for _ in texts]
+
+    async def scenario():
+        batcher = EmbeddingBatcher(embed_fn, max_wait_ms=1)
+        with pytest.raises(RuntimeError):
+            await batcher.embed("hello")
+        return await batcher.embed("hello")
+
+    assert asyncio.run(scenario()) == [1.0]
+
+
+def test_concurrent_identical_texts_share_one_call():
+    calls = []
+
+    async def embed_fn(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    async def scenario():
+        batcher = EmbeddingBatcher(embed_fn, max_wait_ms=5)
+        return await asyncio.gather(batcher.embed("a"), batcher.embed("a"), batcher.embed("bb"))
+
+    assert asyncio.run(scenario()) == [[1.0], [1.0], [2.0]]
+    assert len(calls) == 1 and sorted(calls[0]) == ["a", "bb"]
@@ -0,0 +1,52 @@
+import sqlite3
+
+from TrinityBot.components.embeddingcache import EmbeddingCache
+
+
+def last_access(path, model, text):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT last_access FROM embeddings WHERE key = ?",
+                            (EmbeddingCache.make_key(model, text),)).fetchone()[0]
+
+
+def test_lookups_are_read_only_until_flushed(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, touch_batch=3, touch_interval=3600)
+    cache.put_many("m", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    before = last_access(path, "m", "a")
+
+    assert cache.get_many("m", ["a", "x"]) == [[1.0], None]
+    assert last_access(path, "m", "a") == before
+
+    cache.get_many("m", ["b", "c"])
+    assert last_access(path, "m", "a") > before
+
+
+def test_lookup_does_not_wait_for_a_writer(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, touch_batch=1)
+    cache.put_many("m", ["a"], [[1.0]])
+    writer = sqlite3.connect(path)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        # The access-time write hits the lock and is dropped instead of blocking
+        assert cache.get_many("m", ["a"]) == [[1.0]]
+    finally:
+        writer.rollback()
+        writer.close()
+
+
+def test_evicts_least_recently_used_past_slack(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, max_entries=10, evict_slack=0.5, touch_batch=1000)
+    cache.put_many("m", [f"t{i}" for i in range(10)], [[float(i)] for i in range(10)])
+    cache.get_many("m", ["t0"])
+    cache.put_many("m", [f"u{i}" for i in range(5)], [[0.0]] * 5)
+    # 15 entries: within the slack, nothing evicted yet
+    assert all(result is not None for result in cache.get_many("m", ["t1", "u4"]))
+
+    cache.put_many("m", ["v"], [[0.0]])
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 10
+    # Recently read entries survive, the oldest untouched ones go
+    assert cache.get_many("m", ["t0", "t1", "u4", "v"]) == [[0.0], [1.0], [0.0], [0.0]]
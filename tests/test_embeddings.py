@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+from TrinityBot.components.embeddings import (
+    LocalEmbeddingProvider, OpenAIEmbeddingProvider, default_embedding_provider,
+)
+
+
+class FakeRaw:
+    def __init__(self, texts):
+        self.headers = {}
+        self.texts = texts
+
+    def parse(self):
+        return SimpleNamespace(usage=None, data=[SimpleNamespace(embedding=[float(len(text))]) for text in self.texts])
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.requests = []
+        self.with_raw_response = self
+
+    def create(self, model, input):
+        self.requests.append(list(input))
+        return FakeRaw(input)
+
+
+@pytest.mark.parametrize("backend", ["openai", "local"])
+def test_default_provider_builds(monkeypatch, backend):
+    monkeypatch.setenv("EMBEDDING_PROVIDER", backend)
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    provider = default_embedding_provider()
+    assert provider.dimension > 0
+
+
+def test_openai_provider_batches_through_embed(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    provider = OpenAIEmbeddingProvider()
+    provider.client = SimpleNamespace(embeddings=FakeEmbeddings())
+    provider.max_batch_size = 2
+
+    assert provider.embed(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+    assert provider.client.embeddings.requests == [["a", "bb"], ["ccc"]]
+
+
+def test_local_provider_is_deterministic():
+    first, second = LocalEmbeddingProvider(dimension=32), LocalEmbeddingProvider(dimension=32)
+    assert first.embed(["hello world"]) == second.embed(["hello world"])
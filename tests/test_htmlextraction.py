@@ -0,0 +1,20 @@
+import pytest
+
+from TrinityBot.components.htmlextraction import BACKENDS, extract_page
+
+XHTML = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-strict.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml"><body><p>Café menu</p><a href="/about">About</a></body></html>
+"""
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_xhtml_with_encoding_declaration(backend):
+    page = extract_page(XHTML, "http://127.0.0.1/", backend=backend)
+    assert "Café menu" in page.text
+    assert page.links == ["http://127.0.0.1/about"]
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_comment_only_document(backend):
+    assert extract_page("<!-- nothing here -->", "http://127.0.0.1/", backend=backend).text == ""
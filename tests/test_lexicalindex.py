@@ -0,0 +1,31 @@
+import sqlite3
+
+from TrinityBot.components.lexicalindex import LexicalIndex
+from TrinityBot.components.queryingqdrant import fuse_results
+
+
+def test_sparse_only_hits_keep_page_span_and_position(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    index.upsert("docs", [
+        ("a", {"content": "vesting schedule", "token": "t", "source": "s.pdf", "page": 3, "page_end": 4, "position": 7}),
+        ("b", {"content": "vesting cliff", "token": "t", "source": "http://127.0.0.1/"}),
+    ])
+
+    fused = {str(point.id): point.payload for point in fuse_results([], index.search("docs", "vesting"), top_k=2)}
+
+    assert fused["a"] == {"content": "vesting schedule", "token": "t", "source": "s.pdf",
+                          "page": 3, "page_end": 4, "position": 7}
+    assert fused["b"] == {"content": "vesting cliff", "token": "t", "source": "http://127.0.0.1/"}
+
+
+def test_existing_index_gains_new_columns(tmp_path):
+    path = str(tmp_path / "lexical.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE chunks (rowid INTEGER PRIMARY KEY, collection TEXT NOT NULL, point_id TEXT NOT NULL,"
+                 " token TEXT, source TEXT, page INTEGER, UNIQUE (collection, point_id))")
+    conn.commit()
+    conn.close()
+
+    index = LexicalIndex(path)
+    index.upsert("docs", [("a", {"content": "vesting", "page": 1, "page_end": 2, "position": 0})])
+    assert index.search("docs", "vesting")[0]["page_end"] == 2
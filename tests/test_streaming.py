@@ -0,0 +1,199 @@
+import logging
+import threading
+
+import pytest
+
+from qdrant_client.models import PointStruct
+
+from TrinityBot.components import qdrantdumping
+from TrinityBot.components.artifacts import removed_record
+from TrinityBot.components.chunking import TextChunker
+from TrinityBot.components.crawlstate import CrawlState
+from TrinityBot.components.ingestmanifest import IngestManifest
+from TrinityBot.components.qdrantdumping import QdrantDumper
+from TrinityBot.pipeline.streaming import _DONE, StreamingPipeline
+
+
+class FakeQdrant:
+    def __init__(self):
+        self.points = {}
+
+    def upsert(self, collection_name, points):
+        for point in points:
+            self.points[point.id] = point
+
+    def delete(self, collection_name, points_selector):
+        for point_id in points_selector.points:
+            self.points.pop(point_id, None)
+
+
+class FakeLexicalIndex:
+    def upsert(self, collection, entries):
+        pass
+
+    def delete(self, collection, point_ids):
+        pass
+
+
+def make_dumper(tmp_path, embed):
+    dumper = QdrantDumper.__new__(QdrantDumper)
+    dumper.logger = logging.getLogger("test")
+    dumper.collection_name = "test"
+    dumper.manifest = IngestManifest(str(tmp_path / "manifest.sqlite3"))
+    dumper.qdrant_client = FakeQdrant()
+    dumper.lexical_index = FakeLexicalIndex()
+    dumper.embedding_batch_size = 2
+    dumper.max_batch_tokens = 8000
+    dumper.upsert_batch_size = 2
+    dumper.max_concurrent_batches = 1
+    dumper.embedding_cache = type("Cache", (), {"stats": lambda self: {}})()
+    dumper._get_embeddings = embed
+    return dumper
+
+
+def page(source, chunks):
+    return [
+        {"page_content": text, "metadata": {"_id": f"{source}#{text}", "token": "t", "source": source}}
+        for text in chunks
+    ]
+
+
+class ScriptedPipeline(StreamingPipeline):
+    """Feeds prepared pages instead of crawling."""
+
+    def __init__(self, dumper, pages, **kwargs):
+        super().__init__(dumper, {"t": "http://127.0.0.1/"}, flush_interval=0.05, **kwargs)
+        self.pages = pages
+
+    def _crawl(self, stage):
+        while True:
+            target, _ = stage.get()
+            if target is _DONE:
+                return
+            for documents in self.pages:
+                stage.emit(documents)
+
+
+def test_stale_chunks_survive_failed_replacement(tmp_path):
+    def embed(texts):
+        if any("new" in text for text in texts):
+            raise RuntimeError("embedding failed")
+        return [[1.0] for _ in texts]
+
+    dumper = make_dumper(tmp_path, embed)
+    old = page("http://127.0.0.1/a", ["old 1", "old 2"])
+    dumper._upsert_points([PointStruct(id=item[0], vector=[1.0], payload=item[2])
+                           for item in dumper._document_items(old)])
+
+    stats = ScriptedPipeline(dumper, [page("http://127.0.0.1/a", ["new 1", "new 2"])]).run()
+
+    assert stats["inserted"] == 0 and stats["deleted"] == 0
+    assert set(dumper.qdrant_client.points) == {"http://127.0.0.1/a#old 1", "http://127.0.0.1/a#old 2"}
+
+
+def test_stale_chunks_deleted_after_replacement_stored(tmp_path):
+    dumper = make_dumper(tmp_path, lambda texts: [[1.0] for _ in texts])
+    old = page("http://127.0.0.1/a", ["old 1", "keep"])
+    dumper._upsert_points([PointStruct(id=item[0], vector=[1.0], payload=item[2])
+                           for item in dumper._document_items(old)])
+
+    stats = ScriptedPipeline(dumper, [page("http://127.0.0.1/a", ["keep", "new 1", "new 2", "new 3"])]).run()
+
+    assert stats["inserted"] == 3 and stats["deleted"] == 1
+    assert set(dumper.qdrant_client.points) == {
+        "http://127.0.0.1/a#keep", "http://127.0.0.1/a#new 1", "http://127.0.0.1/a#new 2", "http://127.0.0.1/a#new 3",
+    }
+
+
+def test_unstored_pages_are_recrawled(tmp_path):
+    def embed(texts):
+        if any("deferred" in text for text in texts):
+            raise RuntimeError("rate limited")
+        return [[1.0] for _ in texts]
+
+    dumper = make_dumper(tmp_path, embed)
+    crawl_state = CrawlState(str(tmp_path / "crawl_state.sqlite3"))
+    for url in ("http://127.0.0.1/a", "http://127.0.0.1/b"):
+        crawl_state.record_page(url, "etag", None, "html", "text", [])
+
+    pages = [page("http://127.0.0.1/a", ["stored"]), page("http://127.0.0.1/b", ["deferred"])]
+    stats = ScriptedPipeline(dumper, pages, crawl_state=crawl_state).run()
+
+    assert stats["inserted"] == 1 and stats["incomplete_pages"] == 1
+    assert crawl_state.page("http://127.0.0.1/a")["text_hash"] == "text"
+    assert crawl_state.page("http://127.0.0.1/b")["text_hash"] is None
+    assert crawl_state.page("http://127.0.0.1/b")["etag"] is None
+
+
+def test_sync_keeps_stale_chunks_of_incomplete_sources(tmp_path):
+    def embed(texts):
+        if any("deferred" in text for text in texts):
+            raise RuntimeError("rate limited")
+        return [[1.0] for _ in texts]
+
+    dumper = make_dumper(tmp_path, embed)
+    dumper._sync(dumper._document_items(page("http://127.0.0.1/a", ["old a"]) + page("http://127.0.0.1/b", ["old b"])))
+
+    stats = dumper._sync(dumper._document_items(page("http://127.0.0.1/a", ["new a"])
+                                                 + page("http://127.0.0.1/b", ["deferred"])))
+
+    assert stats["incomplete_sources"] == ["http://127.0.0.1/b"]
+    assert set(dumper.qdrant_client.points) == {"http://127.0.0.1/a#new a", "http://127.0.0.1/b#old b"}
+
+
+def test_removed_page_loses_stored_chunks(tmp_path):
+    dumper = make_dumper(tmp_path, lambda texts: [[1.0] for _ in texts])
+    dumper.dump_documents(page("http://127.0.0.1/a", ["a 1", "a 2"]) + page("http://127.0.0.1/b", ["b 1"]))
+
+    stats = ScriptedPipeline(dumper, [[removed_record("http://127.0.0.1/a", "t")]]).run()
+    assert stats["deleted"] == 2
+    assert set(dumper.qdrant_client.points) == {"http://127.0.0.1/b#b 1"}
+
+    stats = dumper.dump_documents([removed_record("http://127.0.0.1/b", "t")])
+    assert stats["deleted"] == 1 and not dumper.qdrant_client.points
+
+
+def test_pdf_uploaded_under_two_tokens_is_kept_for_both(tmp_path, monkeypatch):
+    pages = [(1, "Vesting schedule. " * 40), (2, "Token supply. " * 40)]
+    monkeypatch.setattr(qdrantdumping, "count_pages", lambda path: len(pages))
+    monkeypatch.setattr(qdrantdumping, "iter_pdf_pages", lambda path, workers=None, total_pages=None: iter(pages))
+    dumper = make_dumper(tmp_path, lambda texts: [[1.0] for _ in texts])
+    dumper.chunker = TextChunker(max_tokens=64, overlap_tokens=8)
+    dumper.pdf_workers = 1
+    dumper.pdf_pages_per_batch = 1
+
+    first = dumper.dump_pdf("/tmp/whitepaper.pdf", "trakx")
+    second = dumper.dump_pdf("/tmp/whitepaper.pdf", "bidnow")
+
+    assert first["inserted"] == second["inserted"] > 0 and second["unchanged"] == second["deleted"] == 0
+    tokens = [point.payload["token"] for point in dumper.qdrant_client.points.values()]
+    assert tokens.count("trakx") == tokens.count("bidnow") == first["inserted"]
+    assert {point.payload["source"] for point in dumper.qdrant_client.points.values()} == {
+        "trakx/whitepaper.pdf", "bidnow/whitepaper.pdf",
+    }
+
+
+@pytest.mark.parametrize("stage", ["embed", "upsert"])
+def test_failing_stage_aborts_run(tmp_path, stage):
+    dumper = make_dumper(tmp_path, lambda texts: [[1.0] for _ in texts])
+
+    def fail(*args):
+        raise ValueError(f"{stage} broke")
+
+    setattr(dumper, "_embed_batch" if stage == "embed" else "_upsert_points", fail)
+    pages = [page(f"http://127.0.0.1/{i}", [f"chunk {i} {j}" for j in range(4)]) for i in range(50)]
+    pipeline = ScriptedPipeline(dumper, pages, queue_size=1)
+    outcome = {}
+
+    def run():
+        try:
+            pipeline.run()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "run() hung after a stage failed"
+    assert isinstance(outcome.get("error"), RuntimeError)
+    assert f"{stage} broke" in str(outcome["error"])